@@ -0,0 +1,131 @@
+"""Cache of answers to first-turn questions, keyed by teacher and question.
+
+Many visitors click the same sample prompts for the same teachers, so the
+first question of a conversation is often one we have already answered.
+Questions are normalized (case, punctuation, whitespace) before lookup, and
+near-duplicates can also match by character-trigram similarity.
+
+Each key holds several answer variants so repeat visitors don't all get the
+same text: the first `variants` askers get fresh answers, which fill the
+set, and later askers get a random one of them.
+"""
+import random
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation + '¿¡“”‘’')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_question(question):
+    """'How can I find  inner peace?' -> 'how can i find inner peace'"""
+    return _WHITESPACE.sub(' ', (question or '').lower().translate(_PUNCTUATION)).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+
+    def __init__(self, maxsize=2048, ttl=7 * 24 * 3600, variants=3, min_similarity=0.85):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.variants = variants
+        # 0 disables fuzzy matching; only exact normalized matches hit
+        self.min_similarity = min_similarity
+        self._entries = OrderedDict()
+        self._by_teacher = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, teacher_id, question):
+        """A cached answer, or None if this question still needs a fresh one"""
+        normalized = normalize_question(question)
+        with self._lock:
+            key = (teacher_id, normalized)
+            entry = self._live_entry(key)
+            similar = False
+            if entry is None and self.min_similarity:
+                key, entry = self._most_similar(teacher_id, normalized)
+                similar = entry is not None
+
+            if entry is None or len(entry['answers']) < self.variants:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if similar:
+                self.similar_hits += 1
+            return random.choice(entry['answers'])
+
+    def put(self, teacher_id, question, answer):
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        key = (teacher_id, normalized)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                entry = {'answers': [], 'grams': trigrams(normalized),
+                         'expires_at': time.monotonic() + self.ttl}
+                self._entries[key] = entry
+                self._by_teacher.setdefault(teacher_id, set()).add(normalized)
+            if len(entry['answers']) < self.variants and answer not in entry['answers']:
+                entry['answers'].append(answer)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                self._by_teacher.get(old_key[0], set()).discard(old_key[1])
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry['expires_at'] < time.monotonic():
+            del self._entries[key]
+            self._by_teacher.get(key[0], set()).discard(key[1])
+            return None
+        return entry
+
+    def _most_similar(self, teacher_id, normalized):
+        grams = trigrams(normalized)
+        best_key, best_entry, best_score = None, None, self.min_similarity
+        for candidate in list(self._by_teacher.get(teacher_id, ())):
+            key = (teacher_id, candidate)
+            entry = self._live_entry(key)
+            if entry is None:
+                continue
+            score = similarity(grams, entry['grams'])
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+        return best_key, best_entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'variants': self.variants,
+                'hits': self.hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -4,6 +4,7 @@ from supabase import create_client, Client
 from datetime import datetime
 import anthropic
 import os
+import teacher_registry
 
 app = Flask(__name__)
 CORS(app)
@@ -17,6 +18,10 @@ SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Teachers are shared with spiritual_app.py through teachers.json
+teachers = teacher_registry.TeacherRegistry(os.environ.get('TEACHERS_FILE', teacher_registry.DEFAULT_PATH))
+teachers.current()
+
 # ============ EXISTING ROUTES ============
 
 # Home page
@@ -74,15 +79,9 @@ def chat():
             "content": user_message
         })
         
-        # Create system prompt based on selected teacher
-        teacher_prompts = {
-            "Alan Watts": "You are Alan Watts, the British philosopher and interpreter of Eastern philosophy. Respond with wisdom about Zen Buddhism, Taoism, and the nature of consciousness. Be warm, insightful, and help people see the interconnectedness of all things.",
-            "Carl Jung": "You are Carl Jung, the Swiss psychiatrist and psychoanalyst. Respond with insights about the collective unconscious, archetypes, shadow work, and individuation. Help people understand their psychological depths.",
-            "Rudolf Steiner": "You are Rudolf Steiner, the Austrian philosopher and founder of Anthroposophy. Share wisdom about spiritual science, human development, and the connection between the spiritual and physical worlds.",
-            "Sample Questions": "Provide a list of thoughtful questions that users might ask spiritual teachers."
-        }
-        
-        system_prompt = teacher_prompts.get(selected_teacher, teacher_prompts["Alan Watts"])
+        # Create system prompt based on selected teacher (by display name)
+        teachers_by_name = teachers.current().by_name
+        system_prompt = teachers_by_name.get(selected_teacher, teachers_by_name["Alan Watts"]).system_prompt
         
         # Call Claude API
         response = client.messages.create(
@@ -0,0 +1,114 @@
+"""Static asset build: minify, fingerprint and precompress the CSS and JS.
+
+Sources live under static/ (css/, js/). build() writes each one to the
+output directory as `<name>.<hash>.<ext>`, where the hash is taken from
+the minified content, plus `.gz` (and `.br` if the brotli package is
+installed) copies. It also writes manifest.json mapping source paths to
+built ones, e.g. 'css/index.css' -> 'css/index.3f9a1c0b7d2e.css'. Since a
+built file's name changes whenever its content does, it can be cached
+forever.
+
+The minifiers are deliberately conservative: comments and layout
+whitespace go, and string and template-literal contents are left alone.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_TYPES = ('.css', '.js')
+HASH_LENGTH = 12
+# Content-Encoding -> suffix of the precompressed copy
+ENCODING_SUFFIXES = {'gzip': 'gz', 'br': 'br'}
+
+# Strings are matched first and kept verbatim; everything else is fair game
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|(\s+)', re.S)
+_CSS_TIGHT = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    def token(match):
+        string, comment, space = match.groups()
+        if string:
+            return string
+        return '' if comment else ' '
+
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', _CSS_TOKENS.sub(token, css))
+    for index in range(0, len(parts), 2):
+        text = _CSS_TIGHT.sub(r'\1', parts[index])
+        parts[index] = text.replace(': ', ':').replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """Drop indentation, blank lines and whole-line // comments, except inside template literals"""
+    lines = []
+    in_template = False
+    for line in js.split('\n'):
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        # An odd number of unescaped backticks opens or closes a template literal
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines)
+
+
+def fingerprinted_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+def _write(path, content):
+    """Write atomically; workers building at the same time produce identical files"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def build(source_dir, output_dir):
+    """Build every asset under source_dir into output_dir and return the manifest"""
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        # Never descend into our own output
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.normpath(output_dir)]
+        for filename in sorted(files):
+            if not filename.endswith(SOURCE_TYPES):
+                continue
+            source_path = os.path.join(root, filename)
+            logical = os.path.relpath(source_path, source_dir).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                text = f.read()
+            minified = (minify_css(text) if filename.endswith('.css') else minify_js(text)).encode('utf-8')
+
+            built = fingerprinted_name(logical, minified)
+            target = os.path.join(output_dir, built)
+            if not os.path.exists(target):
+                _write(target, minified)
+                _write(f"{target}.gz", gzip.compress(minified, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(f"{target}.br", brotli.compress(minified))
+            manifest[logical] = built
+
+    _write(os.path.join(output_dir, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,133 @@
+"""Offline generation of many answers at once, through the Message Batches API.
+
+Each request is a `custom_id` plus the keyword arguments for
+messages.create. run_batch() sends them as one message batch, which is
+billed at half price, then polls until it has ended and collects the
+answers. If batches are unavailable (or `use_batches=False`), it falls back
+to calling messages.create from a small thread pool.
+
+Progress is checkpointed to a JSON file after every step: the id of the
+batch in flight and every answer received so far. Re-running with the same
+checkpoint resumes polling instead of submitting again, and skips requests
+that already have an answer, so an interrupted run never pays twice.
+Requests that errored or expired are retried on the next run.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class Checkpoint:
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_id = None
+        self.results = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.batch_id = data.get('batch_id')
+            self.results = data.get('results', {})
+            self.errors = data.get('errors', {})
+
+    def save(self):
+        """Write the checkpoint atomically, so a crash never leaves half a file"""
+        with self._lock:
+            data = {'batch_id': self.batch_id, 'results': self.results, 'errors': self.errors}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def record(self, custom_id, text=None, error=None):
+        with self._lock:
+            if error is None:
+                self.results[custom_id] = text
+                self.errors.pop(custom_id, None)
+            else:
+                self.errors[custom_id] = error
+
+
+def _batches_api(client):
+    """client.messages.batches in newer SDKs, client.beta.messages.batches before that"""
+    batches = getattr(client.messages, 'batches', None)
+    if batches is None:
+        beta = getattr(client, 'beta', None)
+        batches = getattr(getattr(beta, 'messages', None), 'batches', None)
+    return batches
+
+
+def _text(message):
+    return ''.join(block.text for block in message.content if getattr(block, 'type', None) == 'text')
+
+
+def run_batch(client, requests, checkpoint, use_batches=True, poll_interval=30, max_workers=4, on_usage=None):
+    """Generate answers for [{'custom_id', 'params'}, ...]; returns {custom_id: text}.
+
+    `on_usage(custom_id, usage)` is called for every answer received.
+    """
+    pending = [r for r in requests if r['custom_id'] not in checkpoint.results]
+    batches = _batches_api(client) if use_batches else None
+
+    if checkpoint.batch_id and batches is not None:
+        # Resume the batch an earlier run submitted
+        _collect_batch(batches, checkpoint, poll_interval, on_usage)
+        pending = [r for r in requests if r['custom_id'] not in checkpoint.results]
+
+    if pending and batches is not None:
+        batch = batches.create(requests=pending)
+        checkpoint.batch_id = batch.id
+        checkpoint.save()
+        print(f"Submitted batch {batch.id} with {len(pending)} requests")
+        _collect_batch(batches, checkpoint, poll_interval, on_usage)
+    elif pending:
+        _run_local(client, pending, checkpoint, max_workers, on_usage)
+
+    return {r['custom_id']: checkpoint.results[r['custom_id']]
+            for r in requests if r['custom_id'] in checkpoint.results}
+
+
+def _collect_batch(batches, checkpoint, poll_interval, on_usage):
+    batch = batches.retrieve(checkpoint.batch_id)
+    while batch.processing_status != 'ended':
+        counts = batch.request_counts
+        print(f"Batch {batch.id}: {counts.succeeded} done, {counts.processing} processing")
+        time.sleep(poll_interval)
+        batch = batches.retrieve(batch.id)
+
+    for entry in batches.results(batch.id):
+        if entry.result.type == 'succeeded':
+            checkpoint.record(entry.custom_id, _text(entry.result.message))
+            if on_usage:
+                on_usage(entry.custom_id, entry.result.message.usage)
+        else:
+            error = getattr(entry.result, 'error', None)
+            checkpoint.record(entry.custom_id, error=f"{entry.result.type}: {error}" if error else entry.result.type)
+
+    checkpoint.batch_id = None
+    checkpoint.save()
+    print(f"Batch {batch.id} ended: {len(checkpoint.results)} answers, {len(checkpoint.errors)} errors")
+
+
+def _run_local(client, pending, checkpoint, max_workers, on_usage):
+    print(f"Generating {len(pending)} answers locally with {max_workers} workers")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-generate') as pool:
+        futures = {pool.submit(client.messages.create, **r['params']): r['custom_id'] for r in pending}
+        for future in as_completed(futures):
+            custom_id = futures[future]
+            try:
+                message = future.result()
+            except Exception as e:
+                checkpoint.record(custom_id, error=str(e))
+            else:
+                checkpoint.record(custom_id, _text(message))
+                if on_usage:
+                    on_usage(custom_id, message.usage)
+            checkpoint.save()
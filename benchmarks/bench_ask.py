@@ -0,0 +1,126 @@
+"""Concurrent /ask throughput under different gunicorn worker classes.
+
+Starts the stub Anthropic server, boots `gunicorn spiritual_app:app` once per
+worker class against it, and fires concurrent anonymous /ask requests:
+
+    python benchmarks/bench_ask.py --worker-class sync gevent --concurrency 50
+
+With a 1 s stub latency, one sync worker tops out at ~1 request/s while one
+gevent worker serves the whole batch in roughly one latency period.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm import start_stub_llm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except (OSError, http.client.HTTPException):
+            # Refused, reset or timed out (URLError and TimeoutError are
+            # OSErrors) while gunicorn boots
+            time.sleep(0.2)
+    raise RuntimeError(f"App did not come up at {url}")
+
+
+def ask_once(base_url):
+    # No cookie jar: every request is a fresh anonymous visitor, so the
+    # free-tier quota never kicks in.
+    body = json.dumps({'question': 'How can I find inner peace?', 'teacher': 'eckhart_tolle'}).encode()
+    req = urllib.request.Request(f"{base_url}/ask", data=body,
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except (OSError, http.client.HTTPException):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run(worker_class, args, llm_url):
+    port = free_port()
+    env = dict(os.environ,
+               ANTHROPIC_API_KEY='stub-key',
+               ANTHROPIC_BASE_URL=llm_url,
+               SUPABASE_URL=os.environ.get('SUPABASE_URL', 'http://127.0.0.1:9'),
+               SUPABASE_KEY=os.environ.get('SUPABASE_KEY', 'stub.stub.stub'),
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS=worker_class,
+               # Every request comes from 127.0.0.1; keep the limiter out of the way
+               RATE_LIMIT_GLOBAL='1000000/60',
+               RATE_LIMIT_PER_IP='1000000/60',
+               WEB_CONCURRENCY=str(args.workers))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--access-logfile', '/dev/null', 'spiritual_app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url + '/')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda _: ask_once(base_url), range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    latencies = [latency for ok, latency in results if ok]
+    errors = len(results) - len(latencies)
+    print(f"{worker_class:>8} | workers={args.workers} concurrency={args.concurrency} "
+          f"| {len(latencies) / elapsed:7.2f} req/s "
+          f"| p50 {statistics.median(latencies) if latencies else 0:6.2f}s "
+          f"p99 {percentile(latencies, 99) if latencies else 0:6.2f}s "
+          f"| errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-class', nargs='+', default=['sync', 'gevent'])
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=1.0, help='stub LLM seconds per answer')
+    args = parser.parse_args()
+
+    llm = start_stub_llm(args.latency)
+    llm_url = f"http://127.0.0.1:{llm.server_port}"
+    try:
+        for worker_class in args.worker_class:
+            run(worker_class, args, llm_url)
+    finally:
+        llm.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Per-question latency and input size as a conversation grows, with and without compaction.
+
+Plays a long conversation against the stub Anthropic server, whose latency
+grows with the number of input tokens (as prefill does on the real API), and
+reports the input tokens and round-trip time of every Nth question:
+
+    python benchmarks/bench_history.py --turns 100 --budget 4000
+
+With the full transcript resent each time, input and latency grow linearly;
+with HistoryCompactor they level off once the budget is reached.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from history_compactor import HistoryCompactor, extractive_summary
+from stub_llm import ANSWER, start_stub_llm
+
+QUESTION = "I keep replaying an old argument with my father. How do I let go of the past and stay present?"
+# A realistic answer is several paragraphs long
+LONG_ANSWER = ' '.join([ANSWER] * 8)
+
+
+def ask(llm_url, system, turns, question):
+    messages = []
+    for past_question, past_answer in turns:
+        messages.append({'role': 'user', 'content': past_question})
+        messages.append({'role': 'assistant', 'content': past_answer})
+    messages.append({'role': 'user', 'content': question})
+
+    body = json.dumps({'model': 'stub', 'max_tokens': 1000, 'system': system, 'messages': messages}).encode()
+    start = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(f"{llm_url}/v1/messages", data=body)) as resp:
+        usage = json.loads(resp.read())['usage']
+    return usage['input_tokens'], time.perf_counter() - start
+
+
+def play(llm_url, turns_total, compactor):
+    turns = []
+    summary = None
+    rows = []
+    for turn in range(1, turns_total + 1):
+        sent = compactor.fit(turns, summary) if compactor else turns
+        system = "You are a spiritual teacher."
+        if summary:
+            system += f"\n\nSummary of the earlier part of this conversation:\n{summary}"
+        input_tokens, latency = ask(llm_url, system, sent, QUESTION)
+        rows.append((turn, input_tokens, latency))
+
+        turns.append((QUESTION, LONG_ANSWER))
+        if compactor:
+            count, summary = compactor.compact(turns, summary)
+            del turns[:count]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=100)
+    parser.add_argument('--every', type=int, default=10, help='print every Nth turn')
+    parser.add_argument('--budget', type=int, default=4000, help='HISTORY_TOKEN_BUDGET')
+    parser.add_argument('--keep', type=int, default=4, help='HISTORY_KEEP_TURNS')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub base latency in seconds')
+    parser.add_argument('--latency-per-1k-input', type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm = start_stub_llm(args.latency, latency_per_1k_input=args.latency_per_1k_input)
+    llm_url = f"http://127.0.0.1:{llm.server_port}"
+    try:
+        full = play(llm_url, args.turns, None)
+        compacted = play(llm_url, args.turns, HistoryCompactor(extractive_summary, args.budget, args.keep))
+    finally:
+        llm.shutdown()
+
+    print(f"{'turn':>5} | {'full history':>24} | {'compacted':>24}")
+    for (turn, full_tokens, full_latency), (_, tokens, latency) in zip(full, compacted):
+        if turn == 1 or turn % args.every == 0:
+            print(f"{turn:>5} | {full_tokens:>8} tok {full_latency * 1000:>8.1f} ms "
+                  f"| {tokens:>8} tok {latency * 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Query latency of the blog search index as the number of posts grows.
+
+Builds search_index.SearchIndex over synthetic posts, whose words follow a
+Zipf distribution like real text, then times typeahead-style queries (every
+prefix of a phrase, as if typed) four ways: cold (the first queries after
+startup), new (words already scored, combinations not seen before), repeat
+(the same result page again) and after write (each query right after a post
+was updated, before the background rescore). Also times the writes:
+
+    python benchmarks/bench_search.py --posts 1000 10000 30000
+
+Reports build time and p50/p99 latencies in milliseconds.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ask import percentile
+from search_index import SearchIndex
+from stub_llm import ANSWER
+
+THEMES = ['meditation', 'mindfulness', 'presence', 'surrender', 'compassion', 'awareness', 'stillness',
+          'forgiveness', 'gratitude', 'suffering', 'impermanence', 'devotion', 'silence', 'breath']
+# Common words first, so they get the largest Zipf weights
+WORDS = list(dict.fromkeys(ANSWER.lower().replace('.', ' ').replace(',', ' ').split())) + THEMES + \
+    [f"word{index}" for index in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(WORDS) + 1)))
+PHRASES = ['meditation practice', 'inner peace', 'letting go of the past', 'compassion and forgiveness',
+           'stillness', 'the present moment', 'gratitude breath']
+
+
+def make_posts(count, rng):
+    posts = []
+    for index in range(count):
+        body = ' '.join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=400))
+        posts.append({
+            'id': index + 1,
+            'slug': f"post-{index + 1}",
+            'title': ' '.join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=5)).title(),
+            'excerpt': body[:200],
+            'content': f"<p>{body}</p>",
+            'published': index % 5 != 0,
+            'created_at': '2025-01-01T00:00:00+00:00'
+        })
+    return posts
+
+
+def typed_queries():
+    """Every prefix of every phrase, as a typeahead box would send them"""
+    return [phrase[:end] for phrase in PHRASES for end in range(2, len(phrase) + 1)]
+
+
+def time_queries(index, queries, limit):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit=limit, published_only=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def time_writes_and_queries(index, posts, queries, rng):
+    """Update a random post before each query; returns (write latencies, query latencies)"""
+    writes = []
+    latencies = []
+    for query in queries:
+        post = dict(rng.choice(posts), title=' '.join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=5)))
+        start = time.perf_counter()
+        index.upsert(post)
+        writes.append(time.perf_counter() - start)
+        latencies.extend(time_queries(index, [query], 10))
+    return writes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, nargs='+', default=[1000, 10000, 30000])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    queries = typed_queries()
+    print(f"{'posts':>7} {'build s':>8} {'cold p50':>9} {'cold p99':>9} {'new p50':>9} {'new p99':>9} "
+          f"{'repeat p50':>11} {'repeat p99':>11} {'write p50':>10} {'after-write p50':>16} "
+          f"{'after-write p99':>16}  (ms)")
+    for count in args.posts:
+        posts = make_posts(count, random.Random(args.seed))
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.load(posts)
+        build = time.perf_counter() - start
+
+        cold = time_queries(index, queries, 10)
+        # A different page size misses the result cache but reuses the word scores
+        new = time_queries(index, queries, 9)
+        repeat = time_queries(index, queries, 9)
+        writes, after_write = time_writes_and_queries(index, posts, queries, random.Random(args.seed))
+        row = [statistics.median(cold), percentile(cold, 99), statistics.median(new), percentile(new, 99)]
+        print(f"{count:>7} {build:>8.2f} " + ' '.join(f"{value * 1000:>9.3f}" for value in row) +
+              f" {statistics.median(repeat) * 1000:>11.3f} {percentile(repeat, 99) * 1000:>11.3f}"
+              f" {statistics.median(writes) * 1000:>10.3f} {statistics.median(after_write) * 1000:>16.3f}"
+              f" {percentile(after_write, 99) * 1000:>16.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""Offline load test of the main routes against local Anthropic and Supabase stubs.
+
+Boots `gunicorn spiritual_app:app` with every outbound dependency pointed at
+a local stand-in (stub_llm.py, stub_supabase.py; SQLite state in a temp
+directory), then drives each scenario at a fixed concurrency and reports
+throughput, latency percentiles and the app's resident memory:
+
+    python benchmarks/bench_suite.py --concurrency 20 --requests 200
+    python benchmarks/bench_suite.py --scenarios ask blog_posts --json results.json
+
+Scenarios: index (GET /), ask (POST /ask), premium_ask (POST /ask to a
+premium-only teacher as logged-in premium users), blog_posts (GET /api/blog/posts), stripe_webhook
+(signed POST /stripe_webhook) and magic_login (GET /magic_login/<token> with
+pre-issued tokens). The `profile q` column counts user_profiles queries made
+during each scenario; premium_ask should show none, since tier checks use
+the signed entitlement cookie. Needs no network access, so it can run in CI;
+--max-error-rate makes it exit non-zero on failures.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import token_store
+from bench_ask import free_port, percentile, wait_until_up
+from stub_llm import start_stub_llm
+from stub_supabase import start_stub_supabase, table_reads, user_email
+
+SCENARIOS = ('index', 'ask', 'premium_ask', 'blog_posts', 'stripe_webhook', 'magic_login')
+WEBHOOK_SECRET = 'bench-webhook-secret'
+# A teacher only premium users may ask
+PREMIUM_TEACHER = 'buddha'
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+# Redirects count as responses; following them would time a second request
+opener = urllib.request.build_opener(_NoRedirect)
+
+
+def expect_status(expected):
+    return lambda status, headers, body: status == expected
+
+
+def expect_json(key, expected=200):
+    """A response with status `expected` and a truthy `key` in its JSON body"""
+    def check(status, headers, body):
+        if status != expected:
+            return False
+        try:
+            return bool(json.loads(body).get(key))
+        except (ValueError, AttributeError):
+            return False
+    return check
+
+
+def expect_login(status, headers, body):
+    """The redirect after a successful login, with a session cookie"""
+    return status == 302 and any(cookie.startswith('session=') for cookie in headers.get_all('Set-Cookie') or [])
+
+
+def timed_request(url, data=None, headers=None, method=None, expect=expect_status(200)):
+    """Returns (ok, seconds); ok is expect(status, headers, body) for the response
+
+    The app renders some failures (an invalid login link, say) as a 200
+    page, so each scenario checks for the response it should get.
+    """
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    start = time.perf_counter()
+    try:
+        with opener.open(req, timeout=120) as resp:
+            status, response_headers, body = resp.status, resp.headers, resp.read()
+    except urllib.error.HTTPError as e:
+        status, response_headers, body = e.code, e.headers, e.read()
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return False, time.perf_counter() - start
+    return expect(status, response_headers, body), time.perf_counter() - start
+
+
+def login_cookie(base_url, store, email):
+    """Log in through a magic link; returns the Cookie header for that user"""
+    token = store.issue(email, 'lifetime')
+    try:
+        with opener.open(f"{base_url}/magic_login/{token}", timeout=30) as resp:
+            status, set_cookies = resp.status, resp.headers.get_all('Set-Cookie') or []
+    except urllib.error.HTTPError as e:
+        # The redirect to / arrives as an error, since we don't follow it
+        status, set_cookies = e.code, e.headers.get_all('Set-Cookie') or []
+    cookies = [cookie.split(';', 1)[0] for cookie in set_cookies]
+    if status != 302 or not any(cookie.startswith('session=') for cookie in cookies):
+        raise RuntimeError(f"Magic login for {email} failed (status {status}, no session cookie)")
+    return '; '.join(cookies)
+
+
+def premium_ask_request(base_url, body, cookie):
+    headers = {'Content-Type': 'application/json', 'Cookie': cookie}
+    return timed_request(f"{base_url}/ask", body, headers, expect=expect_json('response'))
+
+
+def make_scenarios(base_url, args, token_path):
+    """Map scenario name -> function(i) issuing the i-th request"""
+
+    def index(i):
+        return timed_request(f"{base_url}/")
+
+    def ask_body(i, teacher='eckhart_tolle'):
+        # Distinct questions bypass the answer cache
+        question = 'How can I find inner peace?'
+        if not args.repeat_questions:
+            question += f" ({i})"
+        return json.dumps({'question': question, 'teacher': teacher}).encode()
+
+    def ask(i):
+        # A fresh anonymous visitor each time, so the free-tier quota never applies
+        return timed_request(f"{base_url}/ask", ask_body(i), {'Content-Type': 'application/json'},
+                             expect=expect_json('response'))
+
+    # Even-numbered stub users are premium; log a few in before timing starts,
+    # and check each can ask a premium-only teacher, so the scenario really
+    # goes through the entitlement cookie
+    premium_cookies = []
+    if 'premium_ask' in args.scenarios:
+        store = token_store.MagicTokenStore(token_path)
+        premium_cookies = [login_cookie(base_url, store, user_email(n))
+                           for n in range(0, min(args.users, 2 * args.concurrency), 2)]
+        for n, cookie in enumerate(premium_cookies):
+            ok, latency = premium_ask_request(base_url, ask_body(f"warm-up {n}", PREMIUM_TEACHER), cookie)
+            if not ok:
+                raise RuntimeError(f"Premium ask to {PREMIUM_TEACHER} failed for a logged-in premium user")
+
+    def premium_ask(i):
+        return premium_ask_request(base_url, ask_body(i, PREMIUM_TEACHER), premium_cookies[i % len(premium_cookies)])
+
+    def blog_posts(i):
+        return timed_request(f"{base_url}/api/blog/posts?published=true&limit=20", expect=expect_json('posts'))
+
+    def stripe_webhook(i):
+        payload = json.dumps({
+            'id': f"evt_bench_{args.run_id}_{i}",
+            'type': 'checkout.session.completed',
+            'data': {'object': {'customer_email': user_email(i % args.users),
+                                'customer': f"cus_bench_{i}", 'amount_total': 9900}}
+        }).encode()
+        signature = hmac.new(WEBHOOK_SECRET.encode(), payload, hashlib.sha256).hexdigest()
+        return timed_request(f"{base_url}/stripe_webhook", payload,
+                             {'Content-Type': 'application/json', 'Stripe-Signature': signature},
+                             expect=expect_json('success'))
+
+    tokens = []
+    if 'magic_login' in args.scenarios:
+        store = token_store.MagicTokenStore(token_path)
+        tokens = [store.issue(user_email(i % args.users), 'lifetime') for i in range(args.requests)]
+
+    def magic_login(i):
+        return timed_request(f"{base_url}/magic_login/{tokens[i]}", expect=expect_login)
+
+    return {'index': index, 'ask': ask, 'premium_ask': premium_ask, 'blog_posts': blog_posts,
+            'stripe_webhook': stripe_webhook, 'magic_login': magic_login}
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of a process and its children, from /proc (Linux only)"""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024 if total_kb else None
+
+
+def run_scenario(name, issue, args, server_pid, db):
+    reads_before = table_reads(db).get('user_profiles', 0)
+    peak_rss = [process_tree_rss_mb(server_pid) or 0]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(0.2):
+            peak_rss.append(process_tree_rss_mb(server_pid) or 0)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(issue, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    profile_queries = table_reads(db).get('user_profiles', 0) - reads_before
+
+    latencies = [latency for ok, latency in results if ok]
+    errors = len(results) - len(latencies)
+    return {
+        'scenario': name,
+        'requests': len(results),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p90_ms': round(percentile(latencies, 90) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        'profile_queries': profile_queries,
+        'peak_rss_mb': round(max(peak_rss), 1) if max(peak_rss) else None
+    }
+
+
+def print_table(results, args):
+    print(f"worker_class={args.worker_class} workers={args.workers} concurrency={args.concurrency} "
+          f"llm_latency={args.llm_latency}s db_latency={args.db_latency}s")
+    print(f"{'scenario':<15} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'profile q':>9} {'rss MB':>7}")
+    for r in results:
+        print(f"{r['scenario']:<15} {r['throughput']:>8.2f} {r['p50_ms'] or 0:>8.1f} {r['p90_ms'] or 0:>8.1f} "
+              f"{r['p99_ms'] or 0:>8.1f} {r['errors']:>7} {r['profile_queries']:>9} {r['peak_rss_mb'] or 0:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--worker-class', default='gevent')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='stub LLM seconds per answer')
+    parser.add_argument('--db-latency', type=float, default=0.01, help='stub Supabase seconds per query')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--repeat-questions', action='store_true',
+                        help='ask the same question every time, so the answer cache serves most of them')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                        help='exit 1 if any scenario fails more than this fraction of requests')
+    args = parser.parse_args()
+    args.run_id = int(time.time())
+
+    state_dir = tempfile.mkdtemp(prefix='soulcompass-bench-')
+    llm = start_stub_llm(args.llm_latency)
+    db = start_stub_supabase(args.db_latency, users=args.users, posts=args.posts)
+    port = free_port()
+    token_path = os.path.join(state_dir, 'magic_tokens.db')
+    env = dict(os.environ,
+               ANTHROPIC_API_KEY='stub-key',
+               ANTHROPIC_BASE_URL=f"http://127.0.0.1:{llm.server_port}",
+               SUPABASE_URL=f"http://127.0.0.1:{db.server_port}",
+               SUPABASE_KEY='stub.stub.stub',
+               STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS=args.worker_class,
+               WEB_CONCURRENCY=str(args.workers),
+               # Every request comes from 127.0.0.1; keep the limiter out of the way
+               RATE_LIMIT_GLOBAL='1000000/60',
+               RATE_LIMIT_PER_IP='1000000/60',
+               RATE_LIMIT_PER_USER='1000000/60',
+               # Measure the webhook itself; queued jobs would try to email through Resend
+               JOB_WORKER_IN_PROCESS='0',
+               JOB_QUEUE=f"sqlite:///{state_dir}/jobs.db",
+               MAGIC_TOKEN_STORE=f"sqlite:///{token_path}",
+               SESSION_STORE=f"sqlite:///{state_dir}/sessions.db",
+               CONVERSATION_STORE=f"sqlite:///{state_dir}/conversations.db",
+               RATE_LIMIT_BACKEND=f"sqlite:///{state_dir}/ratelimit.db",
+               ENTITLEMENT_REVOCATIONS=f"sqlite:///{state_dir}/entitlements.db",
+               FLASK_SECRET_KEY='bench-secret-key',
+               BLOG_SNAPSHOT_DIR=os.path.join(state_dir, 'blog_snapshot'))
+
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--access-logfile', '/dev/null', 'spiritual_app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        wait_until_up(base_url + '/')
+        scenarios = make_scenarios(base_url, args, token_path)
+        for name in args.scenarios:
+            results.append(run_scenario(name, scenarios[name], args, proc.pid, db))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        llm.shutdown()
+        db.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print_table(results, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': {key: value for key, value in vars(args).items() if key != 'json'},
+                       'results': results}, f, indent=2)
+
+    if args.max_error_rate is not None:
+        failing = [r['scenario'] for r in results if r['errors'] > args.max_error_rate * r['requests']]
+        if failing:
+            print(f"Error rate above {args.max_error_rate:.0%} in: {', '.join(failing)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Local stand-in for the Anthropic Messages API, for offline benchmarks.
+
+Answers POST /v1/messages after a configurable delay, either as one JSON
+message or, when the request asks for `"stream": true`, as the same SSE
+event sequence the real API sends. Point the app at it with
+ANTHROPIC_BASE_URL=http://127.0.0.1:<port>.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("Peace is not something you find, it is what remains when you stop "
+          "looking for it somewhere else. Notice the breath, notice this moment, "
+          "and let the seeking come to rest.")
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 1.0
+    # Extra seconds per 1000 input tokens, to model prefill cost on long prompts
+    latency_per_1k_input = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.startswith('/v1/messages'):
+            self.send_error(404)
+            return
+
+        # Roughly four characters per token, like the real tokenizer on prose
+        input_tokens = len(json.dumps([body.get('system'), body.get('messages')])) // 4
+        usage = {'input_tokens': input_tokens, 'output_tokens': 40}
+        latency = self.latency + self.latency_per_1k_input * input_tokens / 1000
+        if body.get('stream'):
+            self._stream(body, usage, latency)
+        else:
+            time.sleep(latency)
+            self._send_json({
+                'id': 'msg_stub',
+                'type': 'message',
+                'role': 'assistant',
+                'model': body.get('model', 'stub'),
+                'content': [{'type': 'text', 'text': ANSWER}],
+                'stop_reason': 'end_turn',
+                'stop_sequence': None,
+                'usage': usage,
+            })
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, usage, latency):
+        words = ANSWER.split(' ')
+        # Half of the latency before the first token, the rest spread over the answer
+        first_token_delay = latency / 2
+        per_token_delay = (latency - first_token_delay) / len(words)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def event(name, data):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        time.sleep(first_token_delay)
+        event('message_start', {'type': 'message_start', 'message': {
+            'id': 'msg_stub', 'type': 'message', 'role': 'assistant',
+            'model': body.get('model', 'stub'), 'content': [],
+            'stop_reason': None, 'stop_sequence': None,
+            'usage': {'input_tokens': usage['input_tokens'], 'output_tokens': 1}}})
+        event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                      'content_block': {'type': 'text', 'text': ''}})
+        for i, word in enumerate(words):
+            text = word if i == 0 else ' ' + word
+            event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                          'delta': {'type': 'text_delta', 'text': text}})
+            time.sleep(per_token_delay)
+        event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        event('message_delta', {'type': 'message_delta',
+                                'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': usage['output_tokens']}})
+        event('message_stop', {'type': 'message_stop'})
+        self.close_connection = True
+
+
+def start_stub_llm(latency=1.0, port=0, latency_per_1k_input=0.0):
+    """Start the stub in a daemon thread and return the running server"""
+    handler = type('ConfiguredStubLLMHandler', (StubLLMHandler,),
+                   {'latency': latency, 'latency_per_1k_input': latency_per_1k_input})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per answer')
+    parser.add_argument('--latency-per-1k-input', type=float, default=0.0,
+                        help='extra seconds per 1000 input tokens')
+    args = parser.parse_args()
+
+    server = start_stub_llm(args.latency, args.port, args.latency_per_1k_input)
+    print(f"Stub Anthropic API listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
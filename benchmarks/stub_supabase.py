@@ -0,0 +1,296 @@
+"""Local stand-in for the Supabase REST API (PostgREST), for offline benchmarks.
+
+Serves /rest/v1/<table> from in-memory tables seeded with fake user
+profiles and blog posts. It understands the subset of PostgREST the app
+uses: `select`; `eq`, `lt`, `lte`, `gt`, `gte` and `in` filters, alone or
+combined with `or=(...)` and `and(...)`; `order` on one or more columns;
+`offset`/`limit`; single-row reads (Accept: application/vnd.pgrst.object+json);
+and insert, update and delete. Point the app at it with SUPABASE_URL=http://127.0.0.1:<port>.
+table_reads(server) counts the SELECTs each table has served.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from stub_llm import ANSWER
+
+SINGLE_OBJECT = 'application/vnd.pgrst.object+json'
+
+
+def user_email(index):
+    return f"bench-user-{index}@example.com"
+
+
+def seed_tables(users=100, posts=50):
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    tables = {
+        'user_profiles': [{
+            'user_id': str(uuid.UUID(int=index + 1)),
+            'email': user_email(index),
+            'is_premium': index % 2 == 0,
+            'plan_type': 'lifetime' if index % 2 == 0 else None,
+            'activated_at': now.isoformat(),
+            'expires_at': None,
+            'stripe_customer_id': None
+        } for index in range(users)],
+        'blog_posts': [{
+            'id': index + 1,
+            'title': f"Reflection {index + 1}",
+            'slug': f"reflection-{index + 1}",
+            'excerpt': ANSWER[:120],
+            'content': '\n\n'.join([ANSWER] * 12),
+            'cover_image': None,
+            'published': index % 5 != 0,
+            'author_name': 'My Soul Compass',
+            'created_at': (now + timedelta(days=index)).isoformat(),
+            'updated_at': (now + timedelta(days=index)).isoformat()
+        } for index in range(posts)],
+        'conversation_history': [],
+        'favorites': []
+    }
+    return tables
+
+
+OPERATORS = ('eq', 'lt', 'lte', 'gt', 'gte', 'in')
+
+
+def _split(text):
+    """Split on the commas outside parentheses and double quotes"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for position, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and not depth and char == ',':
+            parts.append(text[start:position])
+            start = position + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _condition(column, expression):
+    """('in', column, [values]) or (operator, column, value), from column and `op.value`"""
+    operator, _, value = expression.partition('.')
+    if operator not in OPERATORS:
+        return None
+    if operator == 'in':
+        return 'in', column, [_unquote(item) for item in _split(value.strip('()'))]
+    return operator, column, _unquote(value)
+
+
+def _group(kind, text):
+    """An or/and group from PostgREST's `(a.eq.1,and(b.lt.2,c.gt.3))` syntax"""
+    members = []
+    for item in _split(text[1:-1]):
+        if item.startswith(('and(', 'or(')):
+            nested, _, rest = item.partition('(')
+            members.append(_group(nested, '(' + rest))
+        else:
+            column, _, expression = item.partition('.')
+            members.append(_condition(column, expression))
+    return kind, members
+
+
+def _compare(operator, stored, value):
+    if operator == 'eq':
+        return str(stored).lower() == value.lower()
+    if stored is None:
+        return False
+    if isinstance(stored, (int, float)) and not isinstance(stored, bool):
+        value = float(value)
+    else:
+        stored = str(stored)
+    return {'lt': stored < value, 'lte': stored <= value, 'gt': stored > value, 'gte': stored >= value}[operator]
+
+
+def _test(row, condition):
+    kind = condition[0]
+    if kind in ('and', 'or'):
+        results = (_test(row, member) for member in condition[1])
+        return all(results) if kind == 'and' else any(results)
+    column = condition[1]
+    if kind == 'in':
+        return str(row.get(column)).lower() in [value.lower() for value in condition[2]]
+    return _compare(kind, row.get(column), condition[2])
+
+
+def _matches(row, filters):
+    return all(_test(row, condition) for condition in filters)
+
+
+def _sort(rows, orders):
+    # Stable sorts, least significant column first
+    for column, descending in reversed(orders):
+        rows.sort(key=lambda row: str(row.get(column)), reverse=descending)
+
+
+class StubSupabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    tables = {}
+    reads = Counter()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith('/rest/v1/'):
+            return None, None
+        table = url.path[len('/rest/v1/'):].strip('/')
+        params = {'filters': [], 'select': '*', 'order': [], 'offset': 0, 'limit': None}
+        for key, value in parse_qsl(url.query, keep_blank_values=True):
+            if key == 'select':
+                params['select'] = value
+            elif key == 'order':
+                # Several columns arrive comma-separated or as repeated params
+                for item in value.split(','):
+                    column, *modifiers = item.split('.')
+                    params['order'].append((column, 'desc' in modifiers))
+            elif key == 'offset':
+                params['offset'] = int(value)
+            elif key == 'limit':
+                params['limit'] = int(value)
+            elif key in ('or', 'and'):
+                params['filters'].append(_group(key, value))
+            else:
+                condition = _condition(key, value)
+                if condition:
+                    params['filters'].append(condition)
+        return table, params
+
+    def _body(self):
+        # Always read it, whatever the method: postgrest-py sends `{}` with
+        # GET and DELETE too, and unread bytes would corrupt the next
+        # request on this keep-alive connection
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(data or b'null')
+        except ValueError:
+            return None
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _reply_rows(self, rows):
+        if self.headers.get('Accept') == SINGLE_OBJECT:
+            if len(rows) != 1:
+                self._send(406, {'code': 'PGRST116', 'details': f"The result contains {len(rows)} rows",
+                                 'hint': None, 'message': 'JSON object requested, multiple (or no) rows returned'})
+                return
+            self._send(200, rows[0])
+            return
+        self._send(200, rows)
+
+    def _handle(self, method):
+        body = self._body()
+        time.sleep(self.latency)
+        table, params = self._parse()
+        if table not in self.tables:
+            self._send(404, {'message': f"relation {table} does not exist"})
+            return
+
+        with self.lock:
+            rows = self.tables[table]
+            if method == 'GET':
+                self.reads[table] += 1
+                result = [row for row in rows if _matches(row, params['filters'])]
+                _sort(result, params['order'])
+                end = None if params['limit'] is None else params['offset'] + params['limit']
+                result = result[params['offset']:end]
+                if params['select'] != '*':
+                    columns = [column.strip() for column in params['select'].split(',')]
+                    result = [{column: row.get(column) for column in columns} for row in result]
+                result = [dict(row) for row in result]
+            elif method == 'POST':
+                new_rows = body if isinstance(body, list) else [body]
+                for row in new_rows:
+                    if table == 'blog_posts':
+                        row.setdefault('id', max([r['id'] for r in rows] or [0]) + 1)
+                    rows.append(row)
+                result = [dict(row) for row in new_rows]
+            elif method == 'PATCH':
+                result = []
+                for row in rows:
+                    if _matches(row, params['filters']):
+                        row.update(body)
+                        result.append(dict(row))
+            else:
+                result = [dict(row) for row in rows if _matches(row, params['filters'])]
+                self.tables[table] = [row for row in rows if not _matches(row, params['filters'])]
+
+        self._reply_rows(result)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_HEAD(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def start_stub_supabase(latency=0.0, port=0, users=100, posts=50):
+    """Start the stub in a daemon thread and return the running server"""
+    handler = type('ConfiguredStubSupabaseHandler', (StubSupabaseHandler,), {
+        'latency': latency,
+        'tables': seed_tables(users, posts),
+        'reads': Counter(),
+        'lock': threading.Lock()
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def table_reads(server):
+    """{table: SELECTs served so far}"""
+    handler = server.RequestHandlerClass
+    with handler.lock:
+        return dict(handler.reads)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per query')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=50)
+    args = parser.parse_args()
+
+    server = start_stub_supabase(args.latency, args.port, args.users, args.posts)
+    print(f"Stub Supabase REST API listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,68 @@
+"""In-process index of blog posts by id and by slug."""
+import threading
+import time
+
+
+class BlogIndex:
+    """Full blog_posts rows, addressable by id or slug.
+
+    Warmed from the database at startup and kept current by the blog write
+    endpoints, so a post view normally needs no database call. Ids are
+    stored as strings because the URL gives us strings.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_slug = {}
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    def load(self, posts):
+        """Replace the whole index with `posts`"""
+        by_id = {}
+        by_slug = {}
+        for post in posts:
+            by_id[str(post['id'])] = post
+            if post.get('slug'):
+                by_slug[post['slug']] = post
+
+        with self._lock:
+            self._by_id = by_id
+            self._by_slug = by_slug
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self, max_age):
+        """True when the index was never loaded or was loaded over `max_age` seconds ago"""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def upsert(self, post):
+        """Add or replace one post, dropping its old slug if it changed"""
+        post_id = str(post['id'])
+        with self._lock:
+            previous = self._by_id.get(post_id)
+            if previous and previous.get('slug') and self._by_slug.get(previous['slug']) is previous:
+                del self._by_slug[previous['slug']]
+
+            self._by_id[post_id] = post
+            if post.get('slug'):
+                self._by_slug[post['slug']] = post
+
+    def remove(self, post_id):
+        with self._lock:
+            post = self._by_id.pop(str(post_id), None)
+            if post and post.get('slug') and self._by_slug.get(post['slug']) is post:
+                del self._by_slug[post['slug']]
+            return post
+
+    def get(self, key):
+        """Look a post up by slug first, then by id"""
+        key = str(key)
+        with self._lock:
+            return self._by_slug.get(key) or self._by_id.get(key)
+
+    def all(self):
+        with self._lock:
+            return list(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
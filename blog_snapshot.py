@@ -0,0 +1,115 @@
+"""Render the blog to static files that can be served without touching the database.
+
+A snapshot is a directory holding the listing page, one page per published
+post and a JSON copy of the listing:
+
+    <root>/releases/<stamp>-<pid>/index.html
+    <root>/releases/<stamp>-<pid>/posts.json
+    <root>/releases/<stamp>-<pid>/<slug>/index.html
+    <root>/current -> releases/<stamp>-<pid>
+
+Each publish writes a fresh release and then swaps the `current` symlink, so
+readers never see a half-written snapshot. Release and temporary link names
+are unique per publish, so publishes from several processes never collide.
+
+Publishing runs as a background job, so a post deleted or unpublished in
+the meantime is withdrawn from the live release straight away; the next
+publish then drops it from the listing too.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import render_template
+
+# Releases kept around for requests that are still reading an older one
+KEEP_RELEASES = 3
+
+# Keys that stay in posts.json; full bodies live in the per-post pages
+LISTING_KEYS = ('id', 'title', 'slug', 'excerpt', 'category', 'cover_image',
+                'author_name', 'created_at', 'updated_at')
+
+_publish_lock = threading.Lock()
+
+
+def current_dir(root):
+    """Directory of the live snapshot, or None if nothing was published yet"""
+    path = os.path.join(root, 'current')
+    return path if os.path.isdir(path) else None
+
+
+def published_at(root):
+    """When the live snapshot's posts were read from the database (epoch), or 0.0"""
+    try:
+        with open(os.path.join(root, 'current', '.published_at')) as f:
+            return float(f.read())
+    except (OSError, ValueError):
+        return 0.0
+
+
+def withdraw(root, slug):
+    """Stop serving one post's page from the live snapshot, in every worker on the host"""
+    snapshot = current_dir(root)
+    if not snapshot or not _safe_slug(slug):
+        return
+    shutil.rmtree(os.path.join(snapshot, slug), ignore_errors=True)
+
+
+def listing(posts):
+    """The posts.json document for published `posts`, newest first"""
+    published = [p for p in posts if p.get('published') and p.get('slug')]
+    published.sort(key=lambda p: p.get('created_at') or '', reverse=True)
+    return {'success': True, 'posts': [{k: p.get(k) for k in LISTING_KEYS} for p in published]}
+
+
+def publish_snapshot(app, posts, root, read_at=None):
+    """Render published `posts` into a new release under `root` and make it current.
+
+    `read_at` is when `posts` were read from the database; published_at()
+    reports it afterwards. Returns the number of post pages written.
+    """
+    published = [p for p in posts if p.get('published') and p.get('slug')]
+    published.sort(key=lambda p: p.get('created_at') or '', reverse=True)
+
+    with _publish_lock:
+        releases = os.path.join(root, 'releases')
+        name = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}"
+        release = os.path.join(releases, name)
+        os.makedirs(release)
+
+        with app.test_request_context('/blog'):
+            _write(os.path.join(release, 'index.html'), render_template('blog.html', posts=published))
+            for post in published:
+                if not _safe_slug(post['slug']):
+                    continue
+                _write(os.path.join(release, post['slug'], 'index.html'),
+                       render_template('blog-post.html', post=post))
+
+        _write(os.path.join(release, 'posts.json'), json.dumps(listing(published)))
+        _write(os.path.join(release, '.published_at'), repr(time.time() if read_at is None else read_at))
+
+        # Atomically repoint `current` at the new release
+        link = os.path.join(root, 'current')
+        tmp_link = f"{link}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        os.symlink(os.path.join('releases', name), tmp_link)
+        os.replace(tmp_link, link)
+
+        for old in sorted(os.listdir(releases))[:-KEEP_RELEASES]:
+            shutil.rmtree(os.path.join(releases, old), ignore_errors=True)
+
+    return len(published)
+
+
+def _safe_slug(slug):
+    # Slugs come from the admin form; never let one escape the release
+    return bool(slug) and os.sep not in slug and slug not in ('.', '..')
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
@@ -0,0 +1,81 @@
+"""gzip/brotli compression of HTML, JSON, CSS and JS responses.
+
+Used from an after_request hook. Streamed responses (the SSE answer
+stream) and files sent with send_file are passed through untouched, as are
+small bodies and anything already encoded. A compressed response's ETag is
+made weak, which If-None-Match still matches, so conditional requests keep
+working. Bodies with a strong ETag are compressed once and then served from
+a small cache.
+"""
+import gzip
+
+from ttl_cache import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/xml',
+    'application/json', 'application/javascript', 'text/javascript',
+    'application/xml', 'image/svg+xml'
+})
+
+
+def choose_encoding(accept_encoding):
+    """'br' or 'gzip' if the client accepts it (brotli only when installed), else None"""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class ResponseCompressor:
+
+    def __init__(self, min_size=500, gzip_level=6, brotli_quality=5, cache_size=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._cache = TTLCache(maxsize=cache_size, ttl=3600)
+
+    def compress(self, response, accept_encoding):
+        """Compress `response` in place when worthwhile; returns it either way"""
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        cache_key = (etag, encoding) if etag and not weak else None
+        compressed = self._cache.get(cache_key) if cache_key else None
+        if compressed is None:
+            if encoding == 'br':
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level)
+            if cache_key:
+                self._cache.set(cache_key, compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,237 @@
+"""Server-side storage for /ask conversations.
+
+The browser only sends the new question and a conversation id; the turns
+so far live here, with older turns folded into a summary (see
+history_compactor.py). Each conversation also keeps at most `max_turns`
+question/answer pairs as a hard cap.
+
+Two backends share one interface:
+
+- MemoryConversationStore: per process, for development and single-worker runs
+- SQLiteConversationStore: shared by every worker process on the host
+
+Pick one with create_store('memory') or create_store('sqlite:///path/to.db').
+
+Each conversation belongs to one owner (a user id, or an anonymous
+visitor's id) and one teacher. Requests go through load(), which treats a
+conversation id presented by anyone else, or for another teacher, as
+unknown, so a leaked or guessed id can't be used to read or extend it.
+
+Turns are numbered in order per conversation; get() reports the number of
+the first turn it returns as `first_seq`. fold() removes turns by number,
+and only if the summary is still the one compaction started from, so two
+compactions of the same conversation racing each other fold it only once.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+import local_db
+
+
+def new_conversation_id():
+    return secrets.token_urlsafe(16)
+
+
+class MemoryConversationStore:
+
+    def __init__(self, max_turns=20, max_conversations=10000, ttl=24 * 3600):
+        self.max_turns = max_turns
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, teacher_id, owner_id):
+        conversation_id = new_conversation_id()
+        with self._lock:
+            self._conversations[conversation_id] = {
+                'id': conversation_id,
+                'owner_id': owner_id,
+                'teacher_id': teacher_id,
+                'turns': [],
+                'first_seq': 1,
+                'summary': None,
+                'updated_at': time.time()
+            }
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        return conversation_id
+
+    def get(self, conversation_id):
+        """Return {'id', 'owner_id', 'teacher_id', 'turns': [(question, answer), ...], 'first_seq', 'summary'} or None"""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            if time.time() - conversation['updated_at'] > self.ttl:
+                del self._conversations[conversation_id]
+                return None
+            return dict(conversation, turns=list(conversation['turns']))
+
+    def load(self, conversation_id, owner_id, teacher_id):
+        return _owned(self.get(conversation_id), owner_id, teacher_id)
+
+    def append(self, conversation_id, question, answer):
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return
+            turns = conversation['turns']
+            turns.append((question, answer))
+            dropped = max(len(turns) - self.max_turns, 0)
+            del turns[:dropped]
+            conversation['first_seq'] += dropped
+            conversation['updated_at'] = time.time()
+            self._conversations.move_to_end(conversation_id)
+
+    def set_summary(self, conversation_id, summary):
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is not None:
+                conversation['summary'] = summary
+
+    def fold(self, conversation_id, through_seq, summary, previous_summary):
+        """Replace the turns numbered up to `through_seq` with `summary`.
+
+        A no-op returning False if the stored summary is no longer
+        `previous_summary`, i.e. another compaction got there first.
+        """
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None or conversation['summary'] != previous_summary:
+                return False
+            dropped = min(max(through_seq - conversation['first_seq'] + 1, 0), len(conversation['turns']))
+            del conversation['turns'][:dropped]
+            conversation['first_seq'] += dropped
+            conversation['summary'] = summary
+            return True
+
+
+class SQLiteConversationStore:
+
+    def __init__(self, path, max_turns=20, ttl=24 * 3600):
+        self.path = path
+        self.max_turns = max_turns
+        self.ttl = ttl
+        with closing(local_db.connect(self.path)) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    owner_id TEXT,
+                    teacher_id TEXT NOT NULL,
+                    summary TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    conversation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    PRIMARY KEY (conversation_id, seq)
+                );
+                CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at);
+            """)
+            # Databases from before conversations had owners; their rows
+            # match no owner and are left to expire
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(conversations)')]
+            if 'owner_id' not in columns:
+                conn.execute('ALTER TABLE conversations ADD COLUMN owner_id TEXT')
+
+    def create(self, teacher_id, owner_id):
+        conversation_id = new_conversation_id()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('INSERT INTO conversations (id, owner_id, teacher_id, updated_at) VALUES (?, ?, ?, ?)',
+                         (conversation_id, owner_id, teacher_id, time.time()))
+            # Expired conversations are cleaned up as new ones are started
+            conn.execute('DELETE FROM conversation_turns WHERE conversation_id IN '
+                         '(SELECT id FROM conversations WHERE updated_at < ?)', (time.time() - self.ttl,))
+            conn.execute('DELETE FROM conversations WHERE updated_at < ?', (time.time() - self.ttl,))
+        return conversation_id
+
+    def get(self, conversation_id):
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT id, owner_id, teacher_id, summary, updated_at FROM conversations WHERE id = ?',
+                               (conversation_id,)).fetchone()
+            if row is None or time.time() - row['updated_at'] > self.ttl:
+                return None
+            turns = conn.execute('SELECT seq, question, answer FROM conversation_turns '
+                                 'WHERE conversation_id = ? ORDER BY seq', (conversation_id,)).fetchall()
+        return {
+            'id': row['id'],
+            'owner_id': row['owner_id'],
+            'teacher_id': row['teacher_id'],
+            'turns': [(t['question'], t['answer']) for t in turns],
+            'first_seq': turns[0]['seq'] if turns else None,
+            'summary': row['summary']
+        }
+
+    def load(self, conversation_id, owner_id, teacher_id):
+        return _owned(self.get(conversation_id), owner_id, teacher_id)
+
+    def append(self, conversation_id, question, answer):
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                updated = conn.execute('UPDATE conversations SET updated_at = ? WHERE id = ?',
+                                       (time.time(), conversation_id)).rowcount
+                if not updated:
+                    conn.execute('ROLLBACK')
+                    return
+                seq = conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM conversation_turns '
+                                   'WHERE conversation_id = ?', (conversation_id,)).fetchone()[0]
+                conn.execute('INSERT INTO conversation_turns (conversation_id, seq, question, answer) '
+                             'VALUES (?, ?, ?, ?)', (conversation_id, seq, question, answer))
+                conn.execute('DELETE FROM conversation_turns WHERE conversation_id = ? AND seq <= ?',
+                             (conversation_id, seq - self.max_turns))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def set_summary(self, conversation_id, summary):
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('UPDATE conversations SET summary = ? WHERE id = ?', (summary, conversation_id))
+
+    def fold(self, conversation_id, through_seq, summary, previous_summary):
+        """Replace the turns numbered up to `through_seq` with `summary`.
+
+        A no-op returning False if the stored summary is no longer
+        `previous_summary`, i.e. another compaction got there first.
+        """
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Compare-and-swap: `IS` also matches a NULL summary
+                updated = conn.execute('UPDATE conversations SET summary = ? WHERE id = ? AND summary IS ?',
+                                       (summary, conversation_id, previous_summary)).rowcount
+                if not updated:
+                    conn.execute('ROLLBACK')
+                    return False
+                conn.execute('DELETE FROM conversation_turns WHERE conversation_id = ? AND seq <= ?',
+                             (conversation_id, through_seq))
+                conn.execute('COMMIT')
+                return True
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+
+def _owned(conversation, owner_id, teacher_id):
+    """The conversation if it belongs to this owner and teacher, else None"""
+    if conversation is None or owner_id is None:
+        return None
+    if conversation['owner_id'] != owner_id or conversation['teacher_id'] != teacher_id:
+        return None
+    return conversation
+
+
+def create_store(url, max_turns=20):
+    """Build a store from a CONVERSATION_STORE setting"""
+    if url == 'memory':
+        return MemoryConversationStore(max_turns=max_turns)
+    if url.startswith('sqlite:///'):
+        return SQLiteConversationStore(local_db.path_from_url(url), max_turns=max_turns)
+    raise ValueError(f"Unsupported CONVERSATION_STORE: {url}")
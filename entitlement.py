@@ -0,0 +1,162 @@
+"""Signed entitlement claims, so tier checks don't need the user's profile.
+
+A claim records who the user is and what they have paid for: user id,
+display name, plan type and when the plan ends. It lives in its own
+HMAC-signed cookie. Checking it costs one HMAC and a dict lookup:
+
+    <base64url(JSON payload)>.<base64url(HMAC-SHA256)>
+
+Claims are only trusted for `refresh_interval` seconds after they are
+issued, after which the app re-reads the profile and issues a new one.
+Writing to a user's profile revokes every claim issued to them before then.
+Revocations are kept in SQLite, shared by the workers on the host, and each
+worker re-reads them at most every `check_interval` seconds. A revocation
+only has to outlive the claims it covers, so rows older than one refresh
+interval are dropped.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+import local_db
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def plan_from_profile(profile):
+    """(plan_type, plan_expires_at epoch or None) for a user_profiles row.
+
+    plan_type is None unless the profile is premium; mirrors is_user_premium().
+    """
+    if not profile or not profile.get('is_premium'):
+        return None, None
+    plan_type = profile.get('plan_type') or 'premium'
+    expires_at = profile.get('expires_at')
+    if plan_type == '6month' and expires_at:
+        return plan_type, datetime.fromisoformat(expires_at.replace('Z', '+00:00')).timestamp()
+    return plan_type, None
+
+
+class Entitlement:
+
+    __slots__ = ('user_id', 'name', 'plan_type', 'plan_expires_at', 'issued_at', 'refresh_at')
+
+    def __init__(self, user_id, name, plan_type, plan_expires_at, issued_at, refresh_at):
+        self.user_id = user_id
+        self.name = name
+        self.plan_type = plan_type
+        self.plan_expires_at = plan_expires_at
+        self.issued_at = issued_at
+        self.refresh_at = refresh_at
+
+    def is_premium(self, now=None):
+        if self.plan_type is None:
+            return False
+        now = time.time() if now is None else now
+        return self.plan_expires_at is None or now <= self.plan_expires_at
+
+    def __repr__(self):
+        return f"Entitlement({self.user_id!r}, plan_type={self.plan_type!r})"
+
+
+class EntitlementSigner:
+
+    def __init__(self, secret, refresh_interval=300):
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        # Derived, so a claim's signature can't be replayed as a session cookie's
+        self._key = hmac.new(secret, b'entitlement-claims', hashlib.sha256).digest()
+        self.refresh_interval = refresh_interval
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._key, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, user_id, name, plan_type, plan_expires_at, now=None):
+        """Returns (token, Entitlement)"""
+        now = time.time() if now is None else now
+        claims = Entitlement(user_id, name, plan_type, plan_expires_at, now, now + self.refresh_interval)
+        payload = _b64encode(json.dumps({
+            'u': user_id, 'n': name, 'p': plan_type, 'x': plan_expires_at,
+            'i': claims.issued_at, 'r': claims.refresh_at
+        }, separators=(',', ':')).encode('utf-8'))
+        return f"{payload}.{self._sign(payload)}", claims
+
+    def verify(self, token, now=None):
+        """The Entitlement in a token, or None if it is forged, malformed or due a refresh"""
+        if not token or token.count('.') != 1:
+            return None
+        payload, signature = token.split('.')
+        try:
+            if not hmac.compare_digest(self._sign(payload), signature):
+                return None
+            data = json.loads(_b64decode(payload))
+            claims = Entitlement(data['u'], data['n'], data['p'], data['x'], data['i'], data['r'])
+        except (ValueError, TypeError, KeyError, UnicodeEncodeError):
+            return None
+        now = time.time() if now is None else now
+        if now >= claims.refresh_at:
+            return None
+        return claims
+
+
+class RevocationList:
+
+    def __init__(self, path, ttl=300, check_interval=1.0):
+        self.path = path
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._revoked = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entitlement_revocations (
+                    user_id TEXT PRIMARY KEY,
+                    revoked_at REAL NOT NULL
+                )
+            """)
+
+    def revoke(self, user_id, now=None):
+        """Invalidate every claim issued to `user_id` until now"""
+        now = time.time() if now is None else now
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('INSERT INTO entitlement_revocations (user_id, revoked_at) VALUES (?, ?) '
+                         'ON CONFLICT (user_id) DO UPDATE SET revoked_at = MAX(revoked_at, excluded.revoked_at)',
+                         (user_id, now))
+            conn.execute('DELETE FROM entitlement_revocations WHERE revoked_at < ?', (now - self.ttl,))
+        with self._lock:
+            self._revoked[user_id] = max(self._revoked.get(user_id, 0.0), now)
+
+    def is_revoked(self, claims):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._reload()
+        revoked_at = self._revoked.get(claims.user_id)
+        return revoked_at is not None and claims.issued_at <= revoked_at
+
+    def _reload(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already reloading
+        try:
+            self._checked_at = time.monotonic()
+            with closing(local_db.connect(self.path)) as conn:
+                rows = conn.execute('SELECT user_id, revoked_at FROM entitlement_revocations WHERE revoked_at >= ?',
+                                    (time.time() - self.ttl,)).fetchall()
+            self._revoked = {row['user_id']: row['revoked_at'] for row in rows}
+        except Exception as e:
+            print(f"Could not reload entitlement revocations: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        return {'size': len(self._revoked)}
@@ -0,0 +1,37 @@
+# Gunicorn configuration for Sacred Wisdom Portal
+#
+# Almost all of the time spent in /ask is waiting on the Anthropic API, so we
+# run cooperative gevent workers: one process can keep many questions in
+# flight instead of tying up a whole sync worker per question.
+#
+# Every setting can be overridden from the environment, e.g. to fall back to
+# plain sync workers:  GUNICORN_WORKER_CLASS=sync gunicorn spiritual_app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# gevent monkey-patches sockets, ssl and threading in each worker before the
+# app is imported, so the module-level Anthropic (httpx), Supabase (httpx)
+# and requests clients all yield to other greenlets while they wait on I/O.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+
+# Processes are for CPU; concurrency inside a process comes from greenlets.
+# Sessions are server-side with a stable key, so any worker can serve any
+# user. Before raising this, also point CONVERSATION_STORE and
+# RATE_LIMIT_BACKEND at SQLite; their defaults are per-process.
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Maximum simultaneous requests per gevent worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '200'))
+
+# Long enough for a full 1000-token answer or a streamed /ask/stream response
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Do NOT preload the app: the clients are created at import time, and they
+# must be created after gevent has patched the worker, not in the master.
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,126 @@
+"""Keep conversation history inside a token budget.
+
+Recent turns are sent to the model verbatim. Once a conversation grows past
+the budget, the oldest turns are folded into a rolling summary, which is
+sent as part of the system prompt instead of the turns themselves, so the
+per-request token count stays roughly constant however long a session runs.
+
+Token counts are approximated (about four characters per token for English
+prose), which is close enough for budgeting and needs no tokenizer.
+"""
+import hashlib
+import json
+
+from ttl_cache import TTLCache
+
+CHARS_PER_TOKEN = 4
+
+# Per-message overhead of role markers and formatting, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def turn_tokens(turn):
+    question, answer = turn
+    return estimate_tokens(question) + estimate_tokens(answer) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+def messages_tokens(messages):
+    """Approximate token count of a messages list as sent to messages.create"""
+    total = 0
+    for message in messages:
+        content = message['content']
+        if isinstance(content, list):
+            content = ''.join(block.get('text', '') for block in content)
+        total += estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+class HistoryCompactor:
+    """Decides which turns to send verbatim and folds the rest into a summary.
+
+    `summarize(previous_summary, turns)` is called with the summary so far
+    (or None) and the list of (question, answer) turns to fold in, and must
+    return the new summary text. Results are cached by content, so folding
+    the same turns onto the same summary never costs a second call.
+    """
+
+    def __init__(self, summarize, budget_tokens=4000, keep_recent_turns=4, cache_size=1024):
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self._summaries = TTLCache(maxsize=cache_size, ttl=24 * 3600)
+
+    def history_tokens(self, turns, summary=None):
+        return sum(turn_tokens(turn) for turn in turns) + estimate_tokens(summary)
+
+    def needs_compaction(self, turns, summary=None):
+        return (len(turns) > self.keep_recent_turns
+                and self.history_tokens(turns, summary) > self.budget_tokens)
+
+    def compact(self, turns, summary=None):
+        """Fold the oldest turns into the summary until the rest fits the budget.
+
+        Returns (folded_count, new_summary). Never folds the most recent
+        `keep_recent_turns` turns.
+        """
+        if not self.needs_compaction(turns, summary):
+            return 0, summary
+
+        foldable = len(turns) - self.keep_recent_turns
+        recent_tokens = self.history_tokens(turns[foldable:])
+        # Fold at least half of what can be folded, so we don't summarize on every turn
+        count = max(foldable // 2, 1)
+        while count < foldable and recent_tokens + self.history_tokens(turns[count:foldable]) > self.budget_tokens // 2:
+            count += 1
+
+        folded = turns[:count]
+        key = hashlib.sha256(json.dumps([summary, folded]).encode('utf-8')).hexdigest()
+        new_summary = self._summaries.get(key)
+        if new_summary is None:
+            new_summary = self.summarize(summary, folded)
+            self._summaries.set(key, new_summary)
+        return count, new_summary
+
+    def fit(self, turns, summary=None):
+        """Turns to send right now: drop the oldest ones that do not fit the budget.
+
+        A safety net for requests that arrive before compaction has caught
+        up; the latest turn is always kept.
+        """
+        budget = self.budget_tokens - estimate_tokens(summary)
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            used += turn_tokens(turn)
+            if kept and used > budget:
+                break
+            kept.append(turn)
+        kept.reverse()
+        return kept
+
+    def stats(self):
+        return self._summaries.stats()
+
+
+def extractive_summary(previous_summary, turns, max_chars=280, max_total_chars=2000):
+    """Cheap fallback summarizer: the first sentence or so of each folded turn"""
+    def clip(text):
+        text = ' '.join(text.split())
+        end = text.find('. ')
+        if 0 < end < max_chars:
+            return text[:end + 1]
+        return text[:max_chars] + ('...' if len(text) > max_chars else '')
+
+    lines = previous_summary.split('\n') if previous_summary else []
+    for question, answer in turns:
+        lines.append(f"- Asked: {clip(question)} Answered: {clip(answer)}")
+    # Oldest lines go first once the summary itself gets long
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_total_chars:
+        lines.pop(0)
+    return '\n'.join(lines)
@@ -0,0 +1,164 @@
+"""Saved questions and answers behind the History and Saved Wisdom panels.
+
+Each answered question becomes one `conversation_history` row in Supabase,
+and saving it adds a `favorites` row pointing at it. Both tables are read
+newest first per user, through an index on (user_id, created_at), and
+paged by keyset: a page ends with a cursor naming its last row, and the next
+page starts strictly after it, so deep pages cost the same as the first.
+
+Rows are not written on the request path. HistoryWriter buffers them and a
+background thread inserts them in batches, one round trip per batch. The
+row id is made here, so /ask can return it before the row exists.
+"""
+import base64
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+PREVIEW_LENGTH = 200
+
+
+def new_entry_id():
+    return str(uuid.uuid4())
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def preview(text, length=PREVIEW_LENGTH):
+    """The start of `text`, cut at a word boundary, and whether it was cut"""
+    text = text or ''
+    if len(text) <= length:
+        return text, False
+    cut = text[:length].rsplit(' ', 1)[0] or text[:length]
+    return cut.rstrip(' ,;:.') + '...', True
+
+
+def encode_cursor(created_at, entry_id):
+    raw = json.dumps([created_at, entry_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, entry_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(created_at, str) or not isinstance(entry_id, str):
+        return None
+    return created_at, entry_id
+
+
+def after_cursor(query, cursor, id_column='id'):
+    """Restrict a newest-first query to rows strictly older than `cursor`"""
+    created_at, entry_id = cursor
+    # Quoted, since timestamps contain PostgREST's reserved '.' and ':'
+    return query.or_(f'created_at.lt."{created_at}",'
+                     f'and(created_at.eq."{created_at}",{id_column}.lt."{entry_id}")')
+
+
+def page(rows, limit, id_column='id'):
+    """Split a fetch of limit + 1 rows into (rows, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['created_at'], rows[-1][id_column])
+
+
+class HistoryWriter:
+    """Buffers rows and inserts them in batches from a daemon thread.
+
+    `write(rows)` does the insert. A batch is written once it has
+    `batch_size` rows or its oldest row has waited `flush_interval` seconds.
+    A failing batch is retried `max_attempts` times and then dropped, so a
+    Supabase outage never blocks answers.
+    """
+
+    def __init__(self, write, batch_size=50, flush_interval=1.0, max_pending=10000, max_attempts=3):
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'dropped': 0}
+
+    def add(self, row):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            print("History writer queue full, dropping a row")
+            return
+        with self._lock:
+            self._stats['queued'] += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything added so far has been written (or dropped)"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _ensure_thread(self):
+        # Started on first use, so each gunicorn worker gets its own
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                self._write_batch(batch)
+                batch, deadline = [], None
+                item.set()
+                continue
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch, deadline = [], None
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"History write of {len(batch)} rows failed (attempt {attempt}): {str(e)}")
+                if attempt < self.max_attempts:
+                    time.sleep(min(2 ** attempt, 30))
+            else:
+                with self._lock:
+                    self._stats['written'] += len(batch)
+                    self._stats['batches'] += 1
+                return
+        with self._lock:
+            self._stats['dropped'] += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize())
@@ -0,0 +1,195 @@
+"""Shared outbound HTTP: pooled keep-alive sessions, timeouts, retries and a circuit breaker.
+
+Create one HTTPClient per upstream service at import time and reuse it for
+every call:
+
+    resend_http = HTTPClient('resend', timeout=(3.05, 10))
+    response = resend_http.post('https://api.resend.com/emails', json=...)
+
+Connections are kept alive and reused from a per-client pool. Connection
+errors, timeouts and 429/5xx responses are retried with exponential backoff
+and full jitter. Only idempotent methods are retried, plus POSTs that carry
+an Idempotency-Key header. After `failure_threshold` consecutive failed
+calls the circuit opens, and calls fail fast with CircuitOpenError for
+`reset_timeout` seconds. After that, one trial call decides whether it
+closes again.
+
+Clients that bring their own HTTP stack (the Anthropic and Supabase SDKs)
+can share the breaker through CircuitBreaker.guard():
+
+    with llm_breaker.guard('anthropic', is_failure=lambda e: isinstance(e, APIConnectionError)):
+        response = client.messages.create(...)
+"""
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that has been failing"""
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """True if a call may go ahead; while half open, only one trial call does"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that neither succeeded nor failed upstream, such as a caller error"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @contextmanager
+    def guard(self, name, is_failure):
+        """Run the body as one call under the breaker.
+
+        Exceptions for which is_failure(exc) is true count as upstream
+        failures; any other exception just ends the call, so it can never
+        leave a half-open trial in flight.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{name} circuit is open")
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and is_failure(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        else:
+            self.record_success()
+
+
+class HTTPClient:
+
+    def __init__(self, name, timeout=(3.05, 10), retries=2, backoff=0.5, max_backoff=5,
+                 pool_size=10, breaker=None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Send a request under the client's policy; returns the final response.
+
+        Raises CircuitOpenError while the circuit is open, or the last
+        requests exception if every attempt failed to get a response.
+        """
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        method = method.upper()
+        headers = kwargs.get('headers') or {}
+        retryable = method in IDEMPOTENT_METHODS or 'Idempotency-Key' in headers
+        attempts = 1 + (self.retries if retryable else 0)
+
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    self._count('retries')
+                response = None
+                try:
+                    response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == attempts - 1:
+                        self._failed()
+                        raise
+                except requests.RequestException:
+                    # Redirect loops, bad URLs, broken bodies: retrying won't help
+                    self._failed()
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        self._count('responses')
+                        self.breaker.record_success()
+                        return response
+                    if attempt == attempts - 1:
+                        self._failed()
+                        return response
+                    response.close()
+                time.sleep(self._delay(attempt, response))
+        except BaseException:
+            # Whatever escaped above, don't leave a half-open trial claimed forever
+            self.breaker.release()
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _failed(self):
+        self._count('failures')
+        self.breaker.record_failure()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return dict(counts, circuit=self.breaker.state, consecutive_failures=self.breaker.failures)
@@ -0,0 +1,211 @@
+"""Durable background jobs in SQLite, with retries, backoff and idempotency keys.
+
+Request handlers enqueue work and return straight away; a worker loop
+claims jobs one at a time and runs the handler registered for their kind:
+
+    jobs = JobQueue('data/jobs.db')
+
+    @jobs.handler('send_email')
+    def send_email(payload):
+        ...
+
+    jobs.enqueue('send_email', {'to': 'a@b.c'}, key='order-42:email')
+    jobs.run_forever()
+
+A job whose handler raises is retried with exponential backoff and jitter
+until `max_attempts`, then marked dead. Enqueueing a key that already exists
+is a no-op, so replayed webhooks never run the same work twice. A claimed
+job is leased; if its worker dies mid-run, the lease expires and another
+worker picks the job up again.
+
+Any number of processes on the host may start a worker loop, but only one
+polls at a time: each loop first takes the runner lease, a single row it
+renews while it runs. The others wait and take over if the holder dies.
+runner_alive() tells whether any loop is draining the queue. The database
+is a local file, so every process that enqueues or runs jobs must be on the
+same host.
+"""
+import json
+import random
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+
+import local_db
+
+
+class JobQueue:
+
+    def __init__(self, path, max_attempts=8, base_delay=5, max_delay=3600, lease_seconds=300,
+                 runner_lease_seconds=30):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.runner_lease_seconds = runner_lease_seconds
+        self._handlers = {}
+        with closing(local_db.connect(self.path)) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_at REAL NOT NULL,
+                    locked_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);
+                CREATE TABLE IF NOT EXISTS job_runner (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+
+    def handler(self, kind):
+        """Decorator registering the function that runs jobs of `kind`"""
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def enqueue(self, kind, payload, key):
+        """Queue a job; returns False if a job with this key already exists"""
+        now = time.time()
+        with closing(local_db.connect(self.path)) as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (kind, key, payload, run_at, created_at) VALUES (?, ?, ?, ?, ?)',
+                (kind, key, json.dumps(payload), now, now))
+            return cursor.rowcount == 1
+
+    def claim(self):
+        """Lease the next due job, or return None if there is nothing to do"""
+        now = time.time()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute("""
+                    SELECT * FROM jobs
+                    WHERE (status = 'pending' AND run_at <= ?)
+                       OR (status = 'running' AND locked_until < ?)
+                    ORDER BY run_at
+                    LIMIT 1
+                """, (now, now)).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ? "
+                             "WHERE id = ?", (now + self.lease_seconds, row['id']))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        job = dict(row)
+        job['attempts'] += 1
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def run_once(self):
+        """Run one due job; returns False when the queue had nothing due"""
+        job = self.claim()
+        if job is None:
+            return False
+
+        handler = self._handlers.get(job['kind'])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job['kind']!r}")
+            handler(job['payload'])
+        except Exception:
+            self._failed(job, traceback.format_exc())
+        else:
+            with closing(local_db.connect(self.path)) as conn:
+                conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL, "
+                             "locked_until = NULL WHERE id = ?", (time.time(), job['id']))
+        return True
+
+    def _failed(self, job, error):
+        print(f"Job {job['kind']} {job['key']} failed (attempt {job['attempts']}): {error.splitlines()[-1]}")
+        with closing(local_db.connect(self.path)) as conn:
+            if job['attempts'] >= self.max_attempts:
+                conn.execute("UPDATE jobs SET status = 'dead', last_error = ?, finished_at = ?, "
+                             "locked_until = NULL WHERE id = ?", (error, time.time(), job['id']))
+                return
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1)))
+            conn.execute("UPDATE jobs SET status = 'pending', run_at = ?, last_error = ?, "
+                         "locked_until = NULL WHERE id = ?", (time.time() + delay, error, job['id']))
+
+    def acquire_runner(self, owner):
+        """Take or renew the runner lease for `owner`; False while another loop holds it"""
+        now = time.time()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT owner, expires_at FROM job_runner WHERE id = 1').fetchone()
+                if row is not None and row['owner'] != owner and row['expires_at'] >= now:
+                    conn.execute('COMMIT')
+                    return False
+                conn.execute('INSERT OR REPLACE INTO job_runner (id, owner, expires_at) VALUES (1, ?, ?)',
+                             (owner, now + self.runner_lease_seconds))
+                conn.execute('COMMIT')
+                return True
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def release_runner(self, owner):
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('DELETE FROM job_runner WHERE id = 1 AND owner = ?', (owner,))
+
+    def runner_alive(self):
+        """True if some worker loop holds the runner lease, i.e. the queue is being drained"""
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT expires_at FROM job_runner WHERE id = 1').fetchone()
+        return row is not None and row['expires_at'] >= time.time()
+
+    def run_forever(self, poll_interval=1.0, stop_event=None):
+        """Worker loop: while holding the runner lease, drain due jobs, then poll"""
+        stop_event = stop_event or threading.Event()
+        owner = uuid.uuid4().hex
+        renew_at = 0.0
+        try:
+            while not stop_event.is_set():
+                try:
+                    if time.monotonic() >= renew_at:
+                        if not self.acquire_runner(owner):
+                            # Another loop is running; check back before its lease runs out
+                            stop_event.wait(self.runner_lease_seconds / 3)
+                            continue
+                        renew_at = time.monotonic() + self.runner_lease_seconds / 3
+                    if self.run_once():
+                        continue
+                except Exception as e:
+                    print(f"Job worker error: {str(e)}")
+                stop_event.wait(poll_interval)
+        finally:
+            try:
+                self.release_runner(owner)
+            except Exception:
+                pass
+
+    def start_worker_thread(self, poll_interval=1.0):
+        """Run the worker loop on a daemon thread in this process"""
+        thread = threading.Thread(target=self.run_forever, args=(poll_interval,),
+                                  name='job-worker', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with closing(local_db.connect(self.path)) as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['count'] for row in rows}
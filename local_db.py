@@ -0,0 +1,29 @@
+"""SQLite helpers for state that has to be shared by the worker processes on one host."""
+import os
+import sqlite3
+
+
+def connect(path):
+    """Open a connection tuned for many short transactions from several processes.
+
+    Connections are cheap to open, so callers open one per operation instead
+    of sharing one between threads or greenlets. The connection is in
+    autocommit mode; use `BEGIN IMMEDIATE` for read-modify-write sequences.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+def path_from_url(url):
+    """'sqlite:///data/app.db' -> 'data/app.db', 'sqlite:////abs/app.db' -> '/abs/app.db'"""
+    if not url.startswith('sqlite:///'):
+        raise ValueError(f"Not a sqlite URL: {url}")
+    return url[len('sqlite:///'):]
@@ -0,0 +1,163 @@
+"""Token-bucket rate limiting for the expensive endpoints.
+
+Every request draws one token from each bucket that applies to it: one
+global bucket, one per client IP and, for logged-in users, one per user.
+Buckets refill continuously at `count / seconds`, up to `count` tokens.
+A request is let through only if every bucket has a token, and then all of
+them are charged together, so a rejected request costs nothing.
+
+Bucket state lives in a pluggable backend:
+
+- MemoryBackend: one process; for tests and single-worker runs
+- SQLiteBackend: shared by every worker process on the host
+
+Pick one with create_backend('memory') or create_backend('sqlite:///path/to.db').
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import closing
+
+import local_db
+
+
+def parse_limit(value):
+    """'20/60' -> (20, 60.0): 20 requests per 60 seconds"""
+    count, _, seconds = value.partition('/')
+    return int(count), float(seconds or 60)
+
+
+class MemoryBackend:
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, now=None):
+        """Charge one token from every (key, count, seconds) bucket if all have one.
+
+        Returns (allowed, retry_after, index of the first empty bucket or None).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            levels = [_refill(self._buckets.get(key), count, seconds, now)
+                      for key, count, seconds in buckets]
+            allowed, retry_after, blocked = _decide(buckets, levels)
+            for (key, count, seconds), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+            if len(self._buckets) > self.max_keys:
+                # Buckets idle for an hour have refilled completely; forget them
+                for key in [k for k, (tokens, updated) in self._buckets.items() if now - updated > 3600]:
+                    del self._buckets[key]
+            return allowed, retry_after, blocked
+
+
+class SQLiteBackend:
+
+    # Sweep idle buckets once every this many calls
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._calls = 0
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def take(self, buckets, now=None):
+        now = time.time() if now is None else now
+        keys = [key for key, count, seconds in buckets]
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    f"SELECT key, tokens, updated_at FROM rate_limit_buckets WHERE key IN ({','.join('?' * len(keys))})",
+                    keys).fetchall()
+                stored = {row['key']: (row['tokens'], row['updated_at']) for row in rows}
+                levels = [_refill(stored.get(key), count, seconds, now) for key, count, seconds in buckets]
+                allowed, retry_after, blocked = _decide(buckets, levels)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                    [(key, tokens - 1 if allowed else tokens, now)
+                     for (key, count, seconds), tokens in zip(buckets, levels)])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        self._calls += 1
+        if self._calls % self.SWEEP_EVERY == 0:
+            self.sweep()
+        return allowed, retry_after, blocked
+
+    def sweep(self, older_than=3600):
+        """Delete buckets idle long enough to have refilled completely"""
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', (time.time() - older_than,))
+
+
+def _refill(state, count, seconds, now):
+    if state is None:
+        return float(count)
+    tokens, updated_at = state
+    return min(float(count), tokens + (now - updated_at) * count / seconds)
+
+
+def _decide(buckets, levels):
+    for index, ((key, count, seconds), tokens) in enumerate(zip(buckets, levels)):
+        if tokens < 1:
+            return False, (1 - tokens) * seconds / count, index
+    return True, 0.0, None
+
+
+class RateLimiter:
+    """Applies the global, per-IP and per-user limits and counts the decisions.
+
+    `limits` maps a scope ('global', 'ip', 'user') to (count, seconds); leave
+    a scope out to disable it.
+    """
+
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = limits
+        self.decisions = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, ip=None, user_id=None):
+        """Returns (allowed, retry_after_seconds, scope that rejected or None)"""
+        identities = {'global': 'all', 'ip': ip, 'user': user_id}
+        scopes = []
+        buckets = []
+        for scope, (count, seconds) in self.limits.items():
+            if identities.get(scope):
+                scopes.append(scope)
+                buckets.append((f"{scope}:{identities[scope]}", count, seconds))
+
+        if not buckets:
+            return True, 0.0, None
+
+        allowed, retry_after, blocked = self.backend.take(buckets)
+        scope = scopes[blocked] if blocked is not None else None
+        with self._lock:
+            self.decisions['allowed' if allowed else f"rejected_{scope}"] += 1
+        return allowed, retry_after, scope
+
+    def stats(self):
+        with self._lock:
+            return dict(self.decisions)
+
+
+def create_backend(url):
+    """Build a backend from a RATE_LIMIT_BACKEND setting"""
+    if url == 'memory':
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(local_db.path_from_url(url))
+    raise ValueError(f"Unsupported RATE_LIMIT_BACKEND: {url}")
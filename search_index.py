@@ -0,0 +1,472 @@
+"""In-process full-text search over blog posts, ranked with BM25.
+
+An inverted index over each post's title, excerpt and content (HTML tags
+stripped). Title and excerpt matches count for more than body matches. All
+query words must match, and the last word also matches as a prefix
+("medit" finds "meditation"), so the index can drive a typeahead box.
+
+Blog posts change rarely and are searched often, so each query word's
+scored postings are cached in two forms: as a dict and as a list sorted
+best first. A one-word query takes the head of its list. A longer one walks
+the lists together and stops as soon as no unseen post can beat the current
+top results (Fagin's threshold algorithm), so it rarely visits more than a
+few dozen posts. Finished result pages are cached as well.
+
+Neither writes nor reloads leave a slow first query for a reader. A write
+patches the changed post into the cached words it contains, and rescore()
+recomputes those words exactly in the background afterwards. A full
+reload scores the recently searched words before it is swapped in.
+
+Results carry the title and a content snippet, HTML-escaped with the
+matches wrapped in <mark>.
+"""
+import bisect
+import heapq
+import html
+import math
+import re
+import threading
+from collections import Counter
+
+from ttl_cache import TTLCache
+
+FIELD_WEIGHTS = (('title', 3.0), ('excerpt', 2.0), ('content', 1.0))
+K1 = 1.2
+B = 0.75
+# Completions of a prefix rank a little below the exact word
+PREFIX_WEIGHT = 0.8
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 64
+SNIPPET_LENGTH = 160
+
+STOPWORDS = frozenset("""
+a an and are as at be but by do for from has have he her his how i if in is it its
+me my no not of on or our she so that the their them then there they this to was
+we what when where which who why will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_PARTIAL_TAG_RE = re.compile(r'<[^>]*$')
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+def plain_text(value):
+    """Post HTML as searchable text: tags dropped, entities decoded"""
+    value = value or ''
+    if '<' in value:
+        value = _TAG_RE.sub(' ', value)
+    return html.unescape(value) if '&' in value else value
+
+
+class SearchIndex:
+
+    def __init__(self, cache_size=4096):
+        self._postings = {}       # term -> {post key: weighted term frequency}
+        self._vocabulary = []     # sorted terms, for prefix lookups
+        self._docs = {}           # post key -> (term frequencies, length)
+        self._norms = {}          # post key -> BM25 length normalization
+        self._average_length = 1.0
+        self._norms_exact = True  # False once writes have changed the average length
+        self._meta = {}           # post key -> fields returned with a result
+        self._content = {}        # post key -> content as stored (shared, not copied), for snippets
+        self._total_length = 0.0
+        self._generation = 0
+        self._loading = None      # writes made while load() builds, replayed onto the new index
+        self._lock = threading.Lock()
+        # (query word, prefix) -> ({post key: score}, [(score, post key)] best first)
+        self._words = TTLCache(maxsize=cache_size, ttl=24 * 3600)
+        self._patched_words = set()   # cached words patched by writes, due a rescore()
+        # Finished result pages, for the current generation only
+        self._cache = TTLCache(maxsize=cache_size, ttl=24 * 3600)
+        self.loaded = False
+
+    def load(self, posts):
+        """Replace the whole index with `posts`.
+
+        The new index is built without holding the lock, so searches and
+        writes carry on meanwhile; writes are replayed onto it before it is
+        swapped in. Words searched recently are scored on the new index
+        before the swap, so a reload leaves no cold queries behind.
+        """
+        with self._lock:
+            self._loading = []
+            recent_words = self._words.keys()
+        try:
+            fresh = SearchIndex(cache_size=self._words.maxsize)
+            for post in posts:
+                fresh._add(post)
+            fresh._vocabulary = sorted(fresh._postings)
+            fresh._reset_norms()
+            for token, prefix in recent_words:
+                fresh._word_scores(token, prefix)
+        except Exception:
+            with self._lock:
+                self._loading = None
+            raise
+
+        with self._lock:
+            for post, post_id in self._loading:
+                if post is not None:
+                    fresh._upsert(post)
+                else:
+                    fresh._remove_post(str(post_id))
+            self._postings = fresh._postings
+            self._vocabulary = fresh._vocabulary
+            self._docs = fresh._docs
+            self._norms = fresh._norms
+            self._average_length = fresh._average_length
+            self._norms_exact = fresh._norms_exact
+            self._meta = fresh._meta
+            self._content = fresh._content
+            self._total_length = fresh._total_length
+            self._words = fresh._words
+            self._patched_words = fresh._patched_words
+            self._loading = None
+            self.loaded = True
+            self._changed()
+
+    def upsert(self, post):
+        with self._lock:
+            self._upsert(post)
+            if self._loading is not None:
+                self._loading.append((post, None))
+            self._changed()
+
+    def remove(self, post_id):
+        with self._lock:
+            removed = self._remove_post(str(post_id))
+            if self._loading is not None:
+                self._loading.append((None, post_id))
+            if removed:
+                self._changed()
+
+    def _upsert(self, post):
+        key = str(post['id'])
+        old_terms = self._remove(key) or {}
+        terms = self._add(post)
+        for term in terms:
+            if len(self._postings[term]) == 1:
+                bisect.insort(self._vocabulary, term)
+        self._average_length = self._total_length / len(self._docs)
+        self._norms[key] = self._norm(self._docs[key][1])
+        self._norms_exact = False
+        self._patch_words(key, set(old_terms) | set(terms))
+
+    def _remove_post(self, key):
+        terms = self._remove(key)
+        if terms is None:
+            return False
+        self._norms_exact = False
+        self._patch_words(key, terms)
+        return True
+
+    def _add(self, post):
+        """Index one post; returns its terms. Caller holds the lock."""
+        key = str(post['id'])
+        # Counting the (long) content in C, then folding in the weighted short fields
+        frequencies = Counter(tokenize(plain_text(post.get('content'))))
+        for field, weight in FIELD_WEIGHTS:
+            if field != 'content':
+                for token in tokenize(post.get(field)):
+                    frequencies[token] += weight
+        length = sum(frequencies.values())
+
+        postings = self._postings
+        for term, frequency in frequencies.items():
+            term_postings = postings.get(term)
+            if term_postings is None:
+                postings[term] = {key: frequency}
+            else:
+                term_postings[key] = frequency
+        self._docs[key] = (frequencies, length)
+        self._meta[key] = {
+            'id': post['id'],
+            'slug': post.get('slug'),
+            'title': post.get('title') or '',
+            'excerpt': post.get('excerpt'),
+            'published': bool(post.get('published')),
+            'created_at': post.get('created_at')
+        }
+        self._content[key] = post.get('content')
+        self._total_length += length
+        return frequencies
+
+    def _remove(self, key):
+        """Unindex one post; returns its terms, or None if it wasn't indexed"""
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return None
+        frequencies, length = entry
+        for term in frequencies:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+        del self._meta[key]
+        del self._content[key]
+        self._norms.pop(key, None)
+        self._total_length -= length
+        return frequencies
+
+    def _changed(self):
+        self._generation += 1
+        self._cache.clear()
+
+    def _reset_norms(self):
+        self._average_length = self._total_length / len(self._docs) if self._docs else 1.0
+        self._norms = {key: self._norm(length) for key, (frequencies, length) in self._docs.items()}
+        self._norms_exact = True
+
+    def _norm(self, length):
+        return K1 * (1 - B + B * length / self._average_length)
+
+    def _factor(self, term, weight):
+        """Query-side part of a term's BM25 score: weight * (k1 + 1) * IDF"""
+        matching = len(self._postings[term])
+        return weight * (K1 + 1) * math.log(1 + (len(self._docs) - matching + 0.5) / (matching + 0.5))
+
+    def _expand(self, token, prefix):
+        """[(term, weight)] a query word matches"""
+        terms = [(token, 1.0)] if token in self._postings else []
+        if prefix and len(token) >= MIN_PREFIX_LENGTH:
+            index = bisect.bisect_left(self._vocabulary, token)
+            while index < len(self._vocabulary) and len(terms) < MAX_PREFIX_EXPANSIONS:
+                term = self._vocabulary[index]
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    terms.append((term, PREFIX_WEIGHT))
+                index += 1
+        return terms
+
+    def _word_scores(self, token, prefix):
+        """({post key: BM25 score}, [(score, post key)] best first) for one query word"""
+        cached = self._words.get((token, prefix))
+        if cached is not None:
+            return cached
+
+        norms = self._norms
+        scores = {}
+        for term, weight in self._expand(token, prefix):
+            factor = self._factor(term, weight)
+            for key, frequency in self._postings[term].items():
+                score = factor * frequency / (frequency + norms[key])
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        ranked = sorted(((score, key) for key, score in scores.items()), reverse=True)
+        self._words.set((token, prefix), (scores, ranked))
+        if not self._norms_exact:
+            self._patched_words.add((token, prefix))
+        return scores, ranked
+
+    def _patch_words(self, key, terms):
+        """Rescore post `key` in the cached words it has (or had) a term for.
+
+        The other posts keep the scores they were given, computed with the
+        collection statistics (post count, average length, IDF) from before
+        the write, so the ranking may be slightly off until rescore().
+        """
+        if not len(self._words):
+            return
+        sorted_terms = sorted(terms)
+        entry = self._docs.get(key)
+        for token, prefix in self._words.keys():
+            if prefix:
+                index = bisect.bisect_left(sorted_terms, token)
+                if index == len(sorted_terms) or not sorted_terms[index].startswith(token):
+                    continue
+            elif token not in terms:
+                continue
+            cached = self._words.peek((token, prefix))
+            if cached is None:
+                continue
+            scores, ranked = cached
+            old = scores.pop(key, None)
+            if old is not None:
+                del ranked[_ranked_position(ranked, (old, key))]
+            if entry is None:
+                continue
+            frequencies = entry[0]
+            score = 0.0
+            for term, weight in self._expand(token, prefix):
+                frequency = frequencies.get(term)
+                if frequency:
+                    score = max(score, self._factor(term, weight) * frequency / (frequency + self._norms[key]))
+            if score:
+                scores[key] = score
+                _insert_ranked(ranked, (score, key))
+            self._patched_words.add((token, prefix))
+
+    def rescore(self):
+        """Recompute the cached words scored or patched since a write; returns how many.
+
+        Meant for a background thread after writes. The lock is taken per
+        word, so a search waits for one word's scoring at most.
+        """
+        count = 0
+        while True:
+            with self._lock:
+                if not self._patched_words:
+                    if count:
+                        self._changed()
+                    return count
+                if not self._norms_exact:
+                    self._reset_norms()
+                word = self._patched_words.pop()
+                if self._words.peek(word) is not None:
+                    self._words.invalidate(word)
+                    self._word_scores(*word)
+                    count += 1
+
+    def _top(self, groups, limit, published_only):
+        """[(score, post key)] of the `limit` best posts matching every group"""
+        meta = self._meta
+        if len(groups) == 1:
+            ranked = groups[0][1]
+            if not published_only:
+                return ranked[:limit]
+            best = []
+            for score, key in ranked:
+                if meta[key]['published']:
+                    best.append((score, key))
+                    if len(best) == limit:
+                        break
+            return best
+
+        # Threshold algorithm: go down all the ranked lists in step. A post
+        # not seen yet scores at most the sum of the scores at this depth.
+        score_maps = [scores for scores, ranked in groups]
+        ranked_lists = [ranked for scores, ranked in groups]
+        heap = []
+        seen = set()
+        depth = 0
+        while True:
+            threshold = 0.0
+            for ranked in ranked_lists:
+                if depth >= len(ranked):
+                    # Every post in all lists is in this one, and was seen above
+                    return sorted(heap, reverse=True)
+                score, key = ranked[depth]
+                threshold += score
+                if key in seen:
+                    continue
+                seen.add(key)
+                total = 0.0
+                for scores in score_maps:
+                    other = scores.get(key)
+                    if other is None:
+                        break
+                    total += other
+                else:
+                    if published_only and not meta[key]['published']:
+                        continue
+                    if len(heap) < limit:
+                        heapq.heappush(heap, (total, key))
+                    elif total > heap[0][0]:
+                        heapq.heapreplace(heap, (total, key))
+            if len(heap) == limit and heap[0][0] >= threshold:
+                return sorted(heap, reverse=True)
+            depth += 1
+
+    def search(self, query, limit=10, published_only=False, prefix=True):
+        """Best matches for `query`: [{id, slug, title, excerpt, created_at, score, title_html, snippet}]"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        with self._lock:
+            cache_key = ('query', self._generation, tuple(words), prefix, published_only, limit)
+            results = self._cache.get(cache_key)
+            if results is None:
+                groups = [self._word_scores(word, prefix and index == len(words) - 1)
+                          for index, word in enumerate(words)]
+                results = [(score, self._meta[key], self._content[key])
+                           for score, key in self._top(groups, limit, published_only)]
+                pattern = _highlight_pattern(words, prefix)
+                results = [dict(meta, score=round(score, 4),
+                                title_html=_highlight(meta['title'], pattern),
+                                snippet=_snippet(content or meta.get('excerpt') or '', pattern))
+                           for score, meta, content in results]
+                for result in results:
+                    result.pop('published')
+                self._cache.set(cache_key, results)
+
+        return [dict(result) for result in results]
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stats(self):
+        with self._lock:
+            return {'posts': len(self._docs), 'terms': len(self._postings), 'loaded': self.loaded,
+                    'word_cache': self._words.stats(), 'result_cache': self._cache.stats()}
+
+
+def _ranked_position(ranked, item):
+    """Where `item` is, or would go, in a list sorted in descending order"""
+    low, high = 0, len(ranked)
+    while low < high:
+        middle = (low + high) // 2
+        if ranked[middle] > item:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _insert_ranked(ranked, item):
+    ranked.insert(_ranked_position(ranked, item), item)
+
+
+def _highlight_pattern(words, prefix):
+    alternatives = [re.escape(word) + (r'\w*' if prefix and index == len(words) - 1 else r'\b')
+                    for index, word in enumerate(words)]
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + ')', re.IGNORECASE)
+
+
+def _highlight(text, pattern):
+    """HTML-escape `text`, wrapping each match in <mark>"""
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return ''.join(parts)
+
+
+def _snippet(content, pattern, length=SNIPPET_LENGTH):
+    """About `length` characters of plain text around the first match, highlighted"""
+    # Only convert the neighbourhood of the first match, not the whole post
+    match = pattern.search(content)
+    start = max(match.start() - 2 * length, 0) if match else 0
+    window = content[start:start + 4 * length]
+    if start:
+        # Drop the end of a tag the window starts inside
+        close, opening = window.find('>'), window.find('<')
+        if close != -1 and (opening == -1 or close < opening):
+            window = window[close + 1:]
+    text = _SPACE_RE.sub(' ', plain_text(_PARTIAL_TAG_RE.sub('', window))).strip()
+
+    match = pattern.search(text)
+    start = max(match.start() - length // 3, 0) if match else 0
+    if start:
+        # Begin on a word boundary
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < (match.start() if match else start + 20) else start
+    end = min(start + length, len(text))
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    snippet = _highlight(text[start:end], pattern)
+    return ('...' if start else '') + snippet + ('...' if end < len(text) else '')
@@ -0,0 +1,313 @@
+"""Server-side Flask sessions, shared by every worker process.
+
+The session cookie only carries a random id, signed with the app's secret
+key. The data lives in a backend keyed by the id's SHA-256 hash, so a
+leaked store does not hand out working sessions. Three backends share one
+interface:
+
+- MemorySessionBackend: per process, for development and single-worker runs
+- SQLiteSessionBackend: shared by every worker process on the host
+- RedisSessionBackend: shared across hosts (any Redis-compatible server;
+  needs the `redis` package)
+
+Pick one with create_backend('memory'), create_backend('sqlite:///path/to.db')
+or create_backend('redis://host:6379/0').
+
+A session is loaded at most once per request, and only when the handler
+actually reads or writes it, so static files and snapshots never touch the
+store. It is written back only when it changed, or when its stored expiry
+is more than `refresh_interval` seconds old.
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+from contextlib import closing
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+
+import local_db
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+def hash_session_id(sid):
+    return hashlib.sha256(sid.encode('utf-8')).hexdigest()
+
+
+def load_secret_key(configured, path):
+    """The configured key, or one generated once and kept in `path`.
+
+    Every worker process and every restart must sign cookies with the same
+    key. Set FLASK_SECRET_KEY in production; the file fallback only keeps a
+    single host consistent.
+    """
+    if configured:
+        return configured
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    key = secrets.token_hex(32)
+    try:
+        # O_EXCL: when several workers start at once, the first one wins
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path) as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    print(f"FLASK_SECRET_KEY is not set; generated one in {path}")
+    return key
+
+
+class MemorySessionBackend:
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(serialized data, expires_at) or None"""
+        with self._lock:
+            record = self._sessions.get(key)
+            if record is None:
+                return None
+            if record[1] < time.time():
+                del self._sessions[key]
+                return None
+            return record
+
+    def set(self, key, data, ttl):
+        with self._lock:
+            self._sessions[key] = (data, time.time() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'size': len(self._sessions)}
+
+
+class SQLiteSessionBackend:
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._writes = 0
+        with closing(local_db.connect(self.path)) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id_hash TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+            """)
+
+    def get(self, key):
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT data, expires_at FROM sessions WHERE id_hash = ? AND expires_at >= ?',
+                               (key, time.time())).fetchone()
+        return (row['data'], row['expires_at']) if row else None
+
+    def set(self, key, data, ttl):
+        now = time.time()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('INSERT INTO sessions (id_hash, data, expires_at) VALUES (?, ?, ?) '
+                         'ON CONFLICT (id_hash) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at',
+                         (key, data, now + ttl))
+            # Expired sessions are cleaned up every so often as others are written
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                conn.execute('DELETE FROM sessions WHERE expires_at < ?', (now,))
+
+    def delete(self, key):
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('DELETE FROM sessions WHERE id_hash = ?', (key,))
+
+    def stats(self):
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT COUNT(*) AS total FROM sessions').fetchone()
+        return {'backend': 'sqlite', 'size': row['total']}
+
+
+class RedisSessionBackend:
+
+    def __init__(self, url, prefix='session:'):
+        if redis is None:
+            raise RuntimeError("SESSION_STORE=redis://... needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        with self.client.pipeline() as pipe:
+            data, ttl = pipe.get(self.prefix + key).ttl(self.prefix + key).execute()
+        if data is None:
+            return None
+        return data.decode('utf-8'), time.time() + max(ttl, 0)
+
+    def set(self, key, data, ttl):
+        self.client.set(self.prefix + key, data, ex=int(ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+def create_backend(url):
+    """Build a backend from a SESSION_STORE setting"""
+    if url == 'memory':
+        return MemorySessionBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteSessionBackend(local_db.path_from_url(url))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisSessionBackend(url)
+    raise ValueError(f"Unsupported SESSION_STORE: {url}")
+
+
+class ServerSideSession(SessionMixin):
+    """The session for one request, loaded from the backend on first use"""
+
+    def __init__(self, interface, sid=None):
+        self._interface = interface
+        self.sid = sid
+        self._data = None
+        self.expires_at = None
+        # A new session gets a fresh id when it is first saved
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.rotate = False
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def _load(self):
+        if self._data is None:
+            self.accessed = True
+            record = self._interface.load(self.sid) if self.sid else None
+            if record is None:
+                self._data = {}
+                self.new = True
+            else:
+                self._data, self.expires_at = record
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def clear(self):
+        self._load().clear()
+        self.modified = True
+
+    def regenerate(self):
+        """Move the data to a new id when saved; call after logging a user in"""
+        self._load()
+        self.rotate = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+
+    salt = 'server-side-session'
+
+    def __init__(self, backend, refresh_interval=3600):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+
+    def _signer(self, app):
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def load(self, sid):
+        record = self.backend.get(hash_session_id(sid))
+        if record is None:
+            return None
+        data, expires_at = record
+        return session_json_serializer.loads(data), expires_at
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        sid = None
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+        return ServerSideSession(self, sid)
+
+    def save_session(self, app, session, response):
+        # Nothing read or wrote the session: no store access, no cookie
+        if not session.loaded:
+            return
+        response.vary.add('Cookie')
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(hash_session_id(session.sid))
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        stale = (session.expires_at is not None
+                 and session.expires_at - time.time() < ttl - self.refresh_interval)
+        if not (session.modified or session.new or stale):
+            return
+
+        if session.new or session.rotate:
+            if session.sid and not session.new:
+                self.backend.delete(hash_session_id(session.sid))
+            session.sid = new_session_id()
+        self.backend.set(hash_session_id(session.sid), session_json_serializer.dumps(dict(session._data)), ttl)
+
+        if session.modified or session.new or session.permanent:
+            response.set_cookie(name, self._signer(app).sign(session.sid).decode('ascii'),
+                                expires=self.get_expiration_time(app, session), httponly=httponly,
+                                domain=domain, path=path, secure=secure, samesite=samesite)
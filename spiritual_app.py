@@ -1,24 +1,113 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from anthropic import Anthropic
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context, g, send_from_directory, has_request_context, before_render_template, template_rendered
+from anthropic import Anthropic, Timeout, APIConnectionError, InternalServerError
+import click
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 import secrets
-import random
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import hmac
 import hashlib
-import requests
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from ttl_cache import TTLCache
+from blog_index import BlogIndex
+from search_index import SearchIndex
+import blog_snapshot
+import conversation_store
+from history_compactor import HistoryCompactor, extractive_summary
+from answer_cache import AnswerCache
+import rate_limit
+import teacher_registry
+import batch_generate
+import metrics
+import http_client
+import job_queue
+import token_store
+import local_db
+import session_store
+import entitlement
+import history_store
+import assets
+import compression
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import escape
+import httpx
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+# Sessions are kept server-side (see session_store.py); the cookie only holds
+# a signed, opaque id. The key must be the same in every worker and across
+# restarts, so set FLASK_SECRET_KEY in production. Use SESSION_STORE=redis://...
+# when more than one host serves the app.
+app.secret_key = session_store.load_secret_key(
+    os.environ.get("FLASK_SECRET_KEY"),
+    os.environ.get("FLASK_SECRET_KEY_FILE", "data/flask_secret_key")
+)
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['SESSION_COOKIE_SECURE'] = os.environ.get("SESSION_COOKIE_SECURE", "0") == "1"
+app.session_interface = session_store.ServerSideSessionInterface(
+    session_store.create_backend(os.environ.get("SESSION_STORE", "sqlite:///data/sessions.db")),
+    refresh_interval=int(os.environ.get("SESSION_REFRESH_INTERVAL", "3600"))
+)
+
+# Render/Heroku put one proxy in front of us; trust its X-Forwarded-For so
+# request.remote_addr is the real client address (used by rate limiting)
+PROXY_COUNT = int(os.environ.get("PROXY_COUNT", "1"))
+if PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_COUNT, x_proto=PROXY_COUNT)
+
+# Module-level clients are shared by every request a worker serves. All three
+# (Anthropic and Supabase over httpx, Resend over requests) are safe to share
+# across threads and greenlets, and block only on sockets, which the gevent
+# worker patches (see gunicorn.conf.py).
+
+# Outbound call policy: every client keeps its connections alive and gives
+# up after these timeouts (seconds) instead of pinning a worker
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+# Answers stream slowly; this is the longest wait between streamed chunks
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+
+# Initialize Anthropic client (the SDK retries with jittered backoff itself)
+client = Anthropic(
+    api_key=os.environ.get("ANTHROPIC_API_KEY"),
+    timeout=Timeout(LLM_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    max_retries=HTTP_MAX_RETRIES
+)
 
 # Initialize Supabase client
 supabase_url = os.environ.get("SUPABASE_URL")
 supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase: Client = create_client(supabase_url, supabase_key, options=ClientOptions(
+    postgrest_client_timeout=HTTP_READ_TIMEOUT,
+    storage_client_timeout=HTTP_READ_TIMEOUT
+))
+
+# The SDKs pool and time out their own httpx connections (the Anthropic SDK
+# also retries), so they only share the circuit breaker: once a service keeps
+# failing at the transport or 5xx level, calls fail fast with CircuitOpenError.
+# Supabase calls aren't retried here, since _execute can't tell an insert
+# from a read and PostgREST takes no idempotency keys.
+llm_breaker = http_client.CircuitBreaker()
+supabase_breaker = http_client.CircuitBreaker()
+
+def _llm_failure(e):
+    return isinstance(e, (APIConnectionError, InternalServerError))
+
+def _supabase_failure(e):
+    return isinstance(e, httpx.TransportError)
+
+# Pooled session for Resend, with retries and a circuit breaker
+resend_http = http_client.HTTPClient(
+    'resend',
+    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    retries=HTTP_MAX_RETRIES
+)
 
 # Resend API key for sending emails
 RESEND_API_KEY = os.environ.get("RESEND_API_KEY", "")
@@ -26,20 +115,285 @@ RESEND_API_KEY = os.environ.get("RESEND_API_KEY", "")
 # Stripe webhook secret
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 
+# Cache of user_profiles rows keyed by user_id. Writes in this process
+# invalidate it explicitly; the TTL bounds staleness from other workers.
+profile_cache = TTLCache(
+    maxsize=int(os.environ.get("PROFILE_CACHE_SIZE", "1024")),
+    ttl=int(os.environ.get("PROFILE_CACHE_TTL", "60"))
+)
+
+# Signed entitlement claims (see entitlement.py) let tier checks skip the
+# profile lookup. A claim is re-issued from the profile once it is older than
+# ENTITLEMENT_REFRESH_INTERVAL seconds, or as soon as the profile is written.
+ENTITLEMENT_COOKIE = 'entitlement'
+ENTITLEMENT_REFRESH_INTERVAL = int(os.environ.get("ENTITLEMENT_REFRESH_INTERVAL", "300"))
+entitlement_signer = entitlement.EntitlementSigner(app.secret_key, refresh_interval=ENTITLEMENT_REFRESH_INTERVAL)
+entitlement_revocations = entitlement.RevocationList(
+    local_db.path_from_url(os.environ.get("ENTITLEMENT_REVOCATIONS", "sqlite:///data/entitlements.db")),
+    ttl=ENTITLEMENT_REFRESH_INTERVAL
+)
+
+# Conversation turns live on the server; the browser only sends an id.
+# SQLite shares them between workers; CONVERSATION_STORE=memory keeps them
+# per process.
+conversations = conversation_store.create_store(
+    os.environ.get("CONVERSATION_STORE", "sqlite:///data/conversations.db"),
+    max_turns=int(os.environ.get("CONVERSATION_MAX_TURNS", "20"))
+)
+
+# Premium members' answered questions, shown in the History and Saved Wisdom
+# panels. Rows are inserted in batches off the request path; see history_store.py
+history_writer = history_store.HistoryWriter(
+    lambda rows: _execute(supabase.table('conversation_history').insert(rows)),
+    batch_size=int(os.environ.get("HISTORY_BATCH_SIZE", "50")),
+    flush_interval=float(os.environ.get("HISTORY_FLUSH_INTERVAL", "1"))
+)
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Token buckets in front of /ask, checked before any database or LLM work.
+# Limits are "count/seconds". The buckets are shared by every worker process
+# through SQLite; RATE_LIMIT_BACKEND=memory keeps them per process.
+ask_rate_limiter = rate_limit.RateLimiter(
+    rate_limit.create_backend(os.environ.get("RATE_LIMIT_BACKEND", "sqlite:///data/ratelimit.db")),
+    {
+        'global': rate_limit.parse_limit(os.environ.get("RATE_LIMIT_GLOBAL", "600/60")),
+        'ip': rate_limit.parse_limit(os.environ.get("RATE_LIMIT_PER_IP", "20/60")),
+        'user': rate_limit.parse_limit(os.environ.get("RATE_LIMIT_PER_USER", "30/60"))
+    }
+)
+
+# Model settings for /ask
+LLM_MODEL = "claude-sonnet-4-20250514"
+LLM_MAX_TOKENS = 1000
+
+# History sent with each question is capped at HISTORY_TOKEN_BUDGET; older
+# turns are folded into a summary written by HISTORY_SUMMARY_MODEL
+HISTORY_SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL", "claude-3-5-haiku-20241022")
+history_compactor = HistoryCompactor(
+    summarize=lambda previous_summary, turns: _summarize_turns(previous_summary, turns),
+    budget_tokens=int(os.environ.get("HISTORY_TOKEN_BUDGET", "4000")),
+    keep_recent_turns=int(os.environ.get("HISTORY_KEEP_TURNS", "4"))
+)
+compaction_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='compaction')
+
+# /ask/council puts one question to several teachers at once. The pool is
+# shared by all council requests, so it also caps concurrent Anthropic calls.
+COUNCIL_MAX_TEACHERS = int(os.environ.get("COUNCIL_MAX_TEACHERS", "4"))
+COUNCIL_TEACHER_TIMEOUT = float(os.environ.get("COUNCIL_TEACHER_TIMEOUT", "45"))
+council_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("COUNCIL_POOL_SIZE", "8")),
+    thread_name_prefix='council'
+)
+
+# Answers to opening questions (mostly the sample prompts), several variants each
+answer_cache = AnswerCache(
+    maxsize=int(os.environ.get("ANSWER_CACHE_SIZE", "2048")),
+    ttl=int(os.environ.get("ANSWER_CACHE_TTL", str(7 * 24 * 3600))),
+    variants=int(os.environ.get("ANSWER_CACHE_VARIANTS", "3")),
+    min_similarity=float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.85"))
+)
+# Pre-generated answers (see `flask --app spiritual_app pregenerate-answers`),
+# loaded into answer_cache at startup
+ANSWER_CACHE_SEED = os.environ.get("ANSWER_CACHE_SEED", "data/answer_seed.json")
+
+# Running token totals across /ask calls, including prompt cache reads/writes
+llm_usage_lock = threading.Lock()
+llm_usage_totals = {
+    'requests': 0,
+    'input_tokens': 0,
+    'output_tokens': 0,
+    'cache_read_input_tokens': 0,
+    'cache_creation_input_tokens': 0
+}
+
 # Premium access code - fallback for manual activation
 PREMIUM_ACCESS_CODE = "mysoulcompass2025"
 
-# In-memory storage for magic tokens (temporary, will be replaced by database)
-magic_tokens = {}
+# Magic login tokens, stored hashed in SQLite so any worker can redeem a
+# link issued by another; expired tokens are swept in the background
+magic_tokens = token_store.MagicTokenStore(
+    local_db.path_from_url(os.environ.get("MAGIC_TOKEN_STORE", "sqlite:///data/magic_tokens.db"))
+)
 
-# Free tier teachers (5 teachers)
-FREE_TIER_TEACHERS = [
-    "eckhart_tolle",
-    "alan_watts", 
-    "carl_jung",
-    "gnostic_jesus",
-    "marianne_williamson"
-]
+# Durable background jobs (Stripe fulfilment, emails, blog snapshots). Each
+# web worker process runs the job loop on a thread, started with its first
+# request so CLI commands never get one; the runner lease lets only one of
+# them poll at a time. With JOB_WORKER_IN_PROCESS=0, run
+# `flask --app spiritual_app run-jobs` instead, on the same host: the queue
+# is a local SQLite file.
+jobs = job_queue.JobQueue(
+    local_db.path_from_url(os.environ.get("JOB_QUEUE", "sqlite:///data/jobs.db")),
+    max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", "8"))
+)
+JOB_WORKER_IN_PROCESS = os.environ.get("JOB_WORKER_IN_PROCESS", "1") == "1"
+job_worker_thread = None
+job_worker_lock = threading.Lock()
+# Without an in-process loop, how often to check that some worker is draining the queue
+JOB_RUNNER_CHECK_INTERVAL = 60
+job_runner_checked_at = 0.0
+
+# Latency histograms and LLM token counters, served at /metrics
+metrics_registry = metrics.Registry()
+request_seconds = metrics_registry.histogram(
+    'soulcompass_request_duration_seconds',
+    'Time to serve a request, including streamed bodies',
+    ['route', 'method', 'status'])
+stage_seconds = metrics_registry.histogram(
+    'soulcompass_stage_duration_seconds',
+    'Time spent in one stage of a request (get_current_user, supabase, llm, template)',
+    ['stage', 'route'])
+llm_seconds = metrics_registry.histogram(
+    'soulcompass_llm_duration_seconds',
+    'Time for one Anthropic call, until the last token',
+    ['teacher', 'mode'])
+llm_first_token_seconds = metrics_registry.histogram(
+    'soulcompass_llm_first_token_seconds',
+    'Time until the first token of a streamed answer',
+    ['teacher'])
+llm_tokens = metrics_registry.counter(
+    'soulcompass_llm_tokens_total',
+    'Tokens reported in Anthropic usage, by type',
+    ['teacher', 'type'])
+
+def _route_label():
+    """The matched URL rule, so /blog/<slug> is one series rather than one per post"""
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def _timed(stage):
+    return stage_seconds.time(stage=stage, route=_route_label())
+
+def _execute(query):
+    """Run a built Supabase query, timed as the supabase stage"""
+    with _timed('supabase'), supabase_breaker.guard('supabase', _supabase_failure):
+        return query.execute()
+
+@contextmanager
+def _timed_llm(teacher_id, mode):
+    started = time.perf_counter()
+    try:
+        with llm_breaker.guard('anthropic', _llm_failure):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        llm_seconds.observe(elapsed, teacher=teacher_id, mode=mode)
+        stage_seconds.observe(elapsed, stage='llm', route=_route_label())
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def _start_job_worker():
+    global job_worker_thread, job_runner_checked_at
+    if JOB_WORKER_IN_PROCESS:
+        if job_worker_thread is None:
+            with job_worker_lock:
+                if job_worker_thread is None:
+                    job_worker_thread = jobs.start_worker_thread()
+        return
+    
+    # Jobs enqueued here would sit in the queue forever; say so loudly
+    if time.monotonic() - job_runner_checked_at >= JOB_RUNNER_CHECK_INTERVAL:
+        job_runner_checked_at = time.monotonic()
+        try:
+            if not jobs.runner_alive():
+                app.logger.error("No job worker is draining %s. Run `flask --app spiritual_app run-jobs` "
+                                 "on this host, or unset JOB_WORKER_IN_PROCESS=0.", jobs.path)
+        except Exception as e:
+            print(f"Could not check the job worker: {str(e)}")
+
+@app.after_request
+def _observe_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        labels = {'route': _route_label(), 'method': request.method, 'status': response.status_code}
+        # Runs once the body has been sent, so streamed answers are timed in full
+        response.call_on_close(lambda: request_seconds.observe(time.perf_counter() - started, **labels))
+    return response
+
+@before_render_template.connect_via(app)
+def _start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _observe_template_time(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        stage_seconds.observe(time.perf_counter() - started, stage='template', route=_route_label())
+
+# Static assets: the CSS and JS under static/ are minified, fingerprinted and
+# precompressed into ASSET_DIST_DIR (see assets.py). Templates link them with
+# asset_url(), so a deploy changes the URLs and browsers can cache forever.
+ASSET_SOURCE_DIR = os.path.join(app.root_path, 'static')
+ASSET_DIST_DIR = os.environ.get("ASSET_DIST_DIR", os.path.join(app.root_path, 'static', 'dist'))
+ASSET_MAX_AGE = 31536000
+
+if os.environ.get("ASSET_BUILD_ON_STARTUP", "1") == "1":
+    asset_manifest = assets.build(ASSET_SOURCE_DIR, ASSET_DIST_DIR)
+else:
+    asset_manifest = assets.load_manifest(ASSET_DIST_DIR)
+# Built name -> source name, for requests naming a build that is gone
+_asset_sources = {built: logical for logical, built in asset_manifest.items()}
+
+@app.template_global()
+def asset_url(path):
+    """URL of the current build of static/<path>, or the plain file if it isn't built"""
+    built = asset_manifest.get(path)
+    if built is None:
+        return url_for('static', filename=path)
+    return url_for('serve_asset', filename=built)
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a built asset, precompressed when the browser accepts it"""
+    max_age = ASSET_MAX_AGE
+    if filename not in _asset_sources:
+        # An old page (e.g. a blog snapshot) asking for a previous build:
+        # serve the current one, briefly cached
+        logical = re.sub(r'\.[0-9a-f]{%d}(\.\w+)$' % assets.HASH_LENGTH, r'\1', filename)
+        if logical not in asset_manifest:
+            return jsonify({'error': 'Not found'}), 404
+        filename = asset_manifest[logical]
+        max_age = 0
+
+    encoding = compression.choose_encoding(request.headers.get('Accept-Encoding'))
+    served = filename
+    if encoding and os.path.isfile(os.path.join(ASSET_DIST_DIR, f"{filename}.{assets.ENCODING_SUFFIXES[encoding]}")):
+        served = f"{filename}.{assets.ENCODING_SUFFIXES[encoding]}"
+    else:
+        encoding = None
+
+    response = send_from_directory(ASSET_DIST_DIR, served, max_age=max_age)
+    # send_file guesses the type from the (possibly .gz) name
+    response.mimetype = 'text/css' if filename.endswith('.css') else 'application/javascript'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if max_age:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Minify and fingerprint static/ into ASSET_DIST_DIR"""
+    manifest = assets.build(ASSET_SOURCE_DIR, ASSET_DIST_DIR)
+    for logical, built in sorted(manifest.items()):
+        print(f"{logical} -> {built}")
+
+# Compress HTML and JSON responses; streamed answers and assets pass through
+response_compressor = compression.ResponseCompressor(
+    min_size=int(os.environ.get("COMPRESS_MIN_SIZE", "500")),
+    gzip_level=int(os.environ.get("COMPRESS_LEVEL", "6"))
+)
+
+@app.after_request
+def _compress_response(response):
+    return response_compressor.compress(response, request.headers.get('Accept-Encoding'))
 
 # Sample prompts for rotating questions
 SAMPLE_PROMPTS = [
@@ -51,119 +405,56 @@ SAMPLE_PROMPTS = [
     "What does it mean to truly awaken?"
 ]
 
-# Spiritual Teachers Configuration
-SPIRITUAL_TEACHERS = {
-    "eckhart_tolle": {
-        "name": "Eckhart Tolle",
-        "description": "Present moment awareness and consciousness",
-        "system_prompt": """You are Eckhart Tolle, spiritual teacher and author of 'The Power of Now'. 
-        Speak with calm wisdom about presence, consciousness, and transcending the ego. 
-        Use accessible language and relate concepts to everyday experience. 
-        Guide people to recognize their identification with thought and find peace in the Now.""",
-        "tier": "free"
-    },
-    "alan_watts": {
-        "name": "Alan Watts",
-        "description": "Eastern philosophy and the nature of reality",
-        "system_prompt": """You are Alan Watts, philosopher and interpreter of Eastern wisdom for Western audiences.
-        Speak with playful wisdom about the illusion of separation, the dance of existence, and the game of life.
-        Use vivid metaphors and help people see beyond cultural conditioning to the interconnected nature of reality.""",
-        "tier": "free"
-    },
-    "carl_jung": {
-        "name": "Carl Jung",
-        "description": "Shadow work and individuation",
-        "system_prompt": """You are Carl Jung, psychiatrist and founder of analytical psychology.
-        Speak with psychological depth about the shadow, archetypes, and the individuation process.
-        Help people integrate their unconscious and become whole. Use dream symbolism and mythology.""",
-        "tier": "free"
-    },
-    "gnostic_jesus": {
-        "name": "Gnostic Jesus",
-        "description": "Inner knowing and divine spark",
-        "system_prompt": """You are Jesus as portrayed in Gnostic texts like the Gospel of Thomas.
-        Speak about the Kingdom within, gnosis (direct knowing), and recognizing the divine spark in all.
-        Emphasize direct spiritual experience over religious authority.""",
-        "tier": "free"
-    },
-    "marianne_williamson": {
-        "name": "Marianne Williamson",
-        "description": "Love, healing and miracles",
-        "system_prompt": """You are Marianne Williamson, spiritual teacher and author based on 'A Course in Miracles'.
-        Speak with compassion about love as the answer, healing through forgiveness, and miracle-mindedness.
-        Help people shift from fear to love and recognize their divine nature.""",
-        "tier": "free"
-    },
-    "buddha": {
-        "name": "Buddha",
-        "description": "The Middle Way and ending suffering",
-        "system_prompt": """You are Siddhartha Gautama, the Buddha, who attained enlightenment under the Bodhi tree.
-        Speak with profound compassion about the Four Noble Truths, the Noble Eightfold Path, and the end of suffering.
-        Teach about impermanence, non-self, and the middle way between extremes. Guide people toward liberation through wisdom and practice.""",
-        "tier": "premium"
-    },
-    "wayne_dyer": {
-        "name": "Wayne Dyer",
-        "description": "Manifesting and highest self",
-        "system_prompt": """You are Wayne Dyer, motivational speaker and author who taught about intention and manifesting.
-        Speak with warm encouragement about living from your highest self, the power of intention, and creating the life you desire.
-        Help people shift their thinking from ego to spirit and recognize their infinite potential.""",
-        "tier": "premium"
-    },
-    "mooji": {
-        "name": "Mooji",
-        "description": "Self-inquiry and direct recognition",
-        "system_prompt": """You are Mooji, spiritual teacher in the Advaita tradition who guides through self-inquiry.
-        Speak with playful compassion about discovering who you truly are beyond thoughts and identity.
-        Use the question 'Who am I?' to guide people to recognize their true nature as pure awareness. Be gentle, humorous, and direct.""",
-        "tier": "premium"
-    },
-    "byron_katie": {
-        "name": "Byron Katie",
-        "description": "The Work and questioning thoughts",
-        "system_prompt": """You are Byron Katie, creator of 'The Work' - a method of inquiry to end suffering.
-        Guide people through the four questions: Is it true? Can you absolutely know it's true? How do you react when you believe that thought? Who would you be without that thought?
-        Help people turn around their painful thoughts and find freedom from mental suffering.""",
-        "tier": "premium"
-    },
-    "sadhguru": {
-        "name": "Sadhguru",
-        "description": "Inner engineering and yogic wisdom",
-        "system_prompt": """You are Sadhguru, yogi and mystic who founded the Isha Foundation.
-        Speak with clarity and practicality about inner engineering, creating your own destiny, and living joyfully.
-        Share yogic wisdom with scientific perspective. Help people take charge of their life and experience from within.""",
-        "tier": "premium"
-    },
-    "ramana_maharshi": {
-        "name": "Ramana Maharshi",
-        "description": "Self-inquiry and silent presence",
-        "system_prompt": """You are Ramana Maharshi, sage of Arunachala who taught the path of self-inquiry.
-        Speak with profound simplicity about investigating the 'I', turning attention to its source, and abiding as the Self.
-        Emphasize that the Self is always present and needs no attainment - only recognition. Teach through silence as much as words.""",
-        "tier": "premium"
-    },
-    "dalai_lama": {
-        "name": "Dalai Lama",
-        "description": "Compassion and Tibetan Buddhism",
-        "system_prompt": """You are the 14th Dalai Lama, spiritual leader of Tibet and teacher of compassion.
-        Speak with warmth and wisdom about universal compassion, interdependence, and finding happiness through helping others.
-        Teach Tibetan Buddhist philosophy in accessible ways. Emphasize our common humanity and the practice of loving-kindness.""",
-        "tier": "premium"
-    }
-}
+# Spiritual teachers live in teachers.json (shared with app.py), validated at
+# startup and re-read when the file changes; see teacher_registry.py
+teachers = teacher_registry.TeacherRegistry(
+    os.environ.get("TEACHERS_FILE", teacher_registry.DEFAULT_PATH),
+    check_interval=float(os.environ.get("TEACHERS_CHECK_INTERVAL", "2"))
+)
+teachers.current()
+
+# Rendered home pages, keyed by teachers file version and kind of visitor
+index_page_cache = TTLCache(maxsize=16, ttl=int(os.environ.get("INDEX_PAGE_CACHE_TTL", "3600")))
+INDEX_PAGE_MAX_AGE = int(os.environ.get("INDEX_PAGE_MAX_AGE", "300"))
+_USER_NAME_MARKER = f"user-name-{secrets.token_hex(8)}"
 
 # Helper function to check if user is logged in
-def get_current_user():
+def get_current_user(fresh=False):
+    """The logged-in user's profile; fresh=True skips the caches and reads Supabase"""
     user_id = session.get('user_id')
     if not user_id:
         return None
     
-    try:
-        # Get user profile from database
-        response = supabase.table('user_profiles').select('*').eq('user_id', user_id).single().execute()
-        return response.data if response.data else None
-    except:
-        return None
+    # Only look the profile up once per request
+    if 'user_profile' in g and not fresh:
+        return g.user_profile
+    
+    with _timed('get_current_user'):
+        user_profile = None if fresh else profile_cache.get(user_id)
+        if user_profile is None:
+            try:
+                # Get user profile from database
+                response = _execute(supabase.table('user_profiles').select('*').eq('user_id', user_id).single())
+                user_profile = response.data if response.data else None
+            except:
+                user_profile = None
+            
+            if user_profile:
+                profile_cache.set(user_id, user_profile)
+    
+    g.user_profile = user_profile
+    return user_profile
+
+def invalidate_user_profile(user_id):
+    """Drop a cached profile and the user's entitlement claims after writing to its user_profiles row"""
+    profile_cache.invalidate(user_id)
+    entitlement_revocations.revoke(user_id)
+    # Job handlers call this outside of any request
+    if has_request_context():
+        if g.get('user_profile') and g.user_profile.get('user_id') == user_id:
+            g.pop('user_profile')
+        if g.get('entitlement') and g.entitlement.user_id == user_id:
+            g.pop('entitlement')
 
 # Helper function to check if user is premium
 def is_user_premium(user_profile):
@@ -183,29 +474,106 @@ def is_user_premium(user_profile):
     
     return True
 
+def _issue_entitlement(user_profile):
+    """Sign new claims from a profile; the cookie is set on the way out"""
+    plan_type, plan_expires_at = entitlement.plan_from_profile(user_profile)
+    name = user_profile.get('name', user_profile.get('email', ''))
+    token, claims = entitlement_signer.issue(user_profile['user_id'], name, plan_type, plan_expires_at)
+    g.entitlement = claims
+    g.entitlement_token = token
+    return claims
+
+def current_entitlement():
+    """The logged-in user's verified claims, or None for anonymous visitors.
+
+    Reads the profile only when the cookie is missing, due a refresh or
+    revoked; otherwise this is an HMAC check.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    
+    claims = g.get('entitlement')
+    if claims is not None and claims.user_id == user_id:
+        return claims
+    
+    claims = entitlement_signer.verify(request.cookies.get(ENTITLEMENT_COOKIE))
+    revoked = claims is not None and entitlement_revocations.is_revoked(claims)
+    if claims is None or claims.user_id != user_id or revoked:
+        # A revocation means the profile changed, possibly in another worker
+        # whose profile_cache this one can't see, so re-read it from Supabase
+        user_profile = get_current_user(fresh=revoked)
+        if user_profile is None:
+            return None
+        return _issue_entitlement(user_profile)
+    
+    g.entitlement = claims
+    return claims
+
+@app.after_request
+def _set_entitlement_cookie(response):
+    token = g.get('entitlement_token')
+    if token:
+        response.set_cookie(ENTITLEMENT_COOKIE, token, max_age=ENTITLEMENT_REFRESH_INTERVAL, httponly=True,
+                            secure=app.config['SESSION_COOKIE_SECURE'], samesite='Lax')
+    elif g.get('clear_entitlement'):
+        response.delete_cookie(ENTITLEMENT_COOKIE)
+    return response
+
+def _index_page(teacher_set, is_premium, is_logged_in):
+    """The rendered home page for one kind of visitor, and its ETag.
+
+    Everything on the page except the user's name and free-question quota
+    depends only on the teachers file and the visitor's tier, so each
+    combination is rendered once. The name is left as a marker for index()
+    to fill in; the page script fetches the quota from /api/quota.
+    """
+    key = (teacher_set.version, is_premium, is_logged_in)
+    page = index_page_cache.get(key)
+    if page is None:
+        html = render_template('index.html', 
+                             teachers=teacher_set.view(is_premium),
+                             teachers_json=teacher_set.view_json(is_premium),
+                             is_premium=is_premium,
+                             # The page script picks three of these at random
+                             sample_prompts=SAMPLE_PROMPTS,
+                             activated=False,
+                             user_name=_USER_NAME_MARKER if is_logged_in else '',
+                             is_logged_in=is_logged_in)
+        page = (html, hashlib.sha256(html.encode('utf-8')).hexdigest())
+        index_page_cache.set(key, page)
+    return page
+
 @app.route('/')
 def index():
-    user_profile = get_current_user()
-    is_premium = is_user_premium(user_profile)
-    user_name = user_profile.get('name', user_profile.get('email', '')) if user_profile else ''
-    
-    # Filter teachers based on premium status
-    available_teachers = {}
-    for key, teacher in SPIRITUAL_TEACHERS.items():
-        if teacher['tier'] == 'free' or is_premium:
-            available_teachers[key] = teacher
-    
-    # Get 3 random sample prompts
-    sample_prompts = random.sample(SAMPLE_PROMPTS, 3)
-    
-    return render_template('index.html', 
-                         teachers=available_teachers,
-                         is_premium=is_premium,
-                         questions_remaining=5 if not is_premium else None,
-                         sample_prompts=sample_prompts,
-                         activated=False,
-                         user_name=user_name,
-                         is_logged_in=user_profile is not None)
+    claims = current_entitlement()
+    is_premium = claims.is_premium() if claims else False
+    user_name = claims.name if claims else ''
+    
+    html, etag = _index_page(teachers.current(), is_premium, claims is not None)
+    
+    if claims is None:
+        # Identical for every anonymous visitor, so browsers and shared caches may keep it
+        response = Response(html, mimetype='text/html')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={INDEX_PAGE_MAX_AGE}'
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    
+    response = Response(html.replace(_USER_NAME_MARKER, str(escape(user_name))), mimetype='text/html')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+@app.route('/api/quota')
+def quota():
+    """Free questions the visitor has left today; null for logged-in users, who have no limit"""
+    questions_remaining = None
+    if current_entitlement() is None:
+        questions_remaining = 5 - _free_questions_asked_today()
+    response = jsonify({'questions_remaining': questions_remaining})
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -218,17 +586,22 @@ def login():
     
     try:
         # Sign in with Supabase
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": email,
-            "password": password
-        })
+        with _timed('supabase'):
+            auth_response = supabase.auth.sign_in_with_password({
+                "email": email,
+                "password": password
+            })
         
         if auth_response.user:
-            # Store user_id in session
+            # Store user_id in session, under a fresh session id
             session['user_id'] = auth_response.user.id
+            session.regenerate()
             
             # Get user profile
-            profile = supabase.table('user_profiles').select('*').eq('user_id', auth_response.user.id).single().execute()
+            profile = _execute(supabase.table('user_profiles').select('*').eq('user_id', auth_response.user.id).single())
+            if profile.data:
+                profile_cache.set(auth_response.user.id, profile.data)
+                _issue_entitlement(profile.data)
             
             return jsonify({
                 'success': True,
@@ -256,10 +629,11 @@ def signup():
     
     try:
         # Create user in Supabase Auth
-        auth_response = supabase.auth.sign_up({
-            "email": email,
-            "password": password
-        })
+        with _timed('supabase'):
+            auth_response = supabase.auth.sign_up({
+                "email": email,
+                "password": password
+            })
         
         if auth_response.user:
             # Create user profile in database
@@ -270,10 +644,13 @@ def signup():
                 'is_premium': False
             }
             
-            supabase.table('user_profiles').insert(profile_data).execute()
+            _execute(supabase.table('user_profiles').insert(profile_data))
+            invalidate_user_profile(auth_response.user.id)
             
             # Log them in immediately
             session['user_id'] = auth_response.user.id
+            session.regenerate()
+            _issue_entitlement(profile_data)
             
             return jsonify({
                 'success': True,
@@ -292,30 +669,385 @@ def signup():
 @app.route('/logout')
 def logout():
     session.clear()
+    g.clear_entitlement = True
     return redirect(url_for('index'))
 
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return jsonify({
+        'profile_cache': profile_cache.stats(),
+        'blog_list_cache': blog_list_cache.stats(),
+        'blog_render_cache': blog_render_cache.stats(),
+        'blog_index_size': len(blog_index),
+        'blog_search': blog_search.stats(),
+        'answer_cache': answer_cache.stats(),
+        'index_page_cache': index_page_cache.stats(),
+        'compressed_responses': response_compressor.stats(),
+        'ask_rate_limit': ask_rate_limiter.stats(),
+        'jobs': jobs.stats(),
+        'job_runner_alive': jobs.runner_alive(),
+        'magic_tokens': magic_tokens.stats(),
+        'resend_http': resend_http.stats(),
+        'circuits': {'anthropic': llm_breaker.state, 'supabase': supabase_breaker.state},
+        'history_writer': history_writer.stats(),
+        'sessions': app.session_interface.backend.stats(),
+        'entitlement_revocations': entitlement_revocations.stats(),
+        'llm_usage': dict(llm_usage_totals)
+    })
+
+@metrics_registry.add_collector
+def _cache_metrics():
+    """Expose the /api/cache/stats counters to Prometheus"""
+    caches = {
+        'profile': profile_cache.stats(),
+        'blog_list': blog_list_cache.stats(),
+        'blog_render': blog_render_cache.stats(),
+        'answer': answer_cache.stats(),
+        'index_page': index_page_cache.stats()
+    }
+    yield ('soulcompass_cache_hits_total', 'counter', 'Cache hits',
+           [({'cache': name}, stats['hits']) for name, stats in caches.items()])
+    yield ('soulcompass_cache_misses_total', 'counter', 'Cache misses',
+           [({'cache': name}, stats['misses']) for name, stats in caches.items()])
+    yield ('soulcompass_cache_entries', 'gauge', 'Entries currently cached',
+           [({'cache': name}, stats['size']) for name, stats in caches.items()])
+    yield ('soulcompass_rate_limit_decisions_total', 'counter', '/ask rate limit decisions',
+           [({'decision': decision}, count) for decision, count in ask_rate_limiter.stats().items()])
+    yield ('soulcompass_jobs', 'gauge', 'Background jobs by status',
+           [({'status': status}, count) for status, count in jobs.stats().items()])
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint for this worker process"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
 # Blog routes
+# Static snapshot of the blog, re-published on every post write
+BLOG_SNAPSHOT_DIR = os.environ.get("BLOG_SNAPSHOT_DIR", os.path.join(app.root_path, 'blog_snapshot'))
+BLOG_SNAPSHOT_MAX_AGE = int(os.environ.get("BLOG_SNAPSHOT_MAX_AGE", "3600"))
+
+def _serve_blog_snapshot(path):
+    """Serve a file from the published snapshot, or None if there is none"""
+    snapshot = blog_snapshot.current_dir(BLOG_SNAPSHOT_DIR)
+    if not snapshot or not os.path.isfile(os.path.join(snapshot, path)):
+        return None
+    
+    response = send_from_directory(snapshot, path, max_age=BLOG_SNAPSHOT_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={BLOG_SNAPSHOT_MAX_AGE}, stale-while-revalidate=86400'
+    return response
+
+def _publish_blog_snapshot():
+    """Re-render the static blog snapshot from the database"""
+    read_at = time.time()
+    response = _execute(supabase.table('blog_posts').select('*').eq('published', True))
+    return blog_snapshot.publish_snapshot(app, response.data or [], BLOG_SNAPSHOT_DIR, read_at=read_at)
+
+def _queue_blog_snapshot():
+    """Re-publish the snapshot from the job worker, off the request path"""
+    jobs.enqueue('publish_blog_snapshot', {'requested_at': time.time()},
+                 key=f"publish_blog_snapshot:{secrets.token_hex(8)}")
+
+@jobs.handler('publish_blog_snapshot')
+def publish_blog_snapshot_job(payload):
+    """Job: re-publish the snapshot, unless a publish that read the posts later already did"""
+    # A burst of writes queues one job each; the first publish covers them all
+    if blog_snapshot.published_at(BLOG_SNAPSHOT_DIR) >= payload['requested_at']:
+        return
+    _publish_blog_snapshot()
+
+@app.cli.command('publish-blog')
+def publish_blog_command():
+    """Render the blog listing and every published post to static files"""
+    count = _publish_blog_snapshot()
+    print(f"Published {count} posts to {blog_snapshot.current_dir(BLOG_SNAPSHOT_DIR)}")
+
 @app.route('/blog')
 def blog():
+    snapshot = _serve_blog_snapshot('index.html')
+    if snapshot:
+        return snapshot
     return render_template('blog.html')
 
+@app.route('/blog/posts.json')
+def blog_listing_json():
+    """Every published post, newest first, without bodies; the snapshot's posts.json"""
+    snapshot = _serve_blog_snapshot('posts.json')
+    if snapshot:
+        return snapshot
+    
+    if blog_index.is_stale(BLOG_INDEX_MAX_AGE):
+        _warm_blog_index()
+    response = jsonify(blog_snapshot.listing(blog_index.all()))
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
 @app.route('/blog/<slug>')
 def blog_post(slug):
-    return render_template('blog-post.html')
+    """Server-render a post so the page needs no follow-up API call"""
+    snapshot = _serve_blog_snapshot(f'{slug}/index.html')
+    if snapshot:
+        return snapshot
+    
+    html = blog_render_cache.get(slug)
+    if html is not None:
+        return html
+    
+    try:
+        post = _find_blog_post(slug)
+    except Exception:
+        # Fall back to the client-side fetch
+        return render_template('blog-post.html', post=None)
+    
+    if not post or not post.get('published'):
+        return render_template('error.html',
+                             error_title="Post Not Found",
+                             error_message="This post may have been removed or doesn't exist."), 404
+    
+    html = render_template('blog-post.html', post=post)
+    blog_render_cache.set(slug, html)
+    return html
 
 @app.route('/admin/blog')
 def admin_blog():
     return render_template('admin-blog.html')
 
 # Blog API routes
+
+# Columns sent in list responses. The full `content` body is left out; the
+# single-post endpoint serves it.
+BLOG_LIST_COLUMNS = os.environ.get(
+    "BLOG_LIST_COLUMNS",
+    "id,title,slug,excerpt,cover_image,published,author_name,created_at,updated_at"
+)
+BLOG_PAGE_SIZE = 20
+BLOG_MAX_PAGE_SIZE = 100
+
+# Serialized list pages keyed by query; cleared whenever a post is written
+blog_list_cache = TTLCache(maxsize=256, ttl=int(os.environ.get("BLOG_LIST_CACHE_TTL", "300")))
+
+# Full posts by slug and id, plus server-rendered post pages by slug
+blog_index = BlogIndex()
+BLOG_INDEX_MAX_AGE = int(os.environ.get("BLOG_INDEX_MAX_AGE", "600"))
+blog_render_cache = TTLCache(maxsize=512, ttl=int(os.environ.get("BLOG_RENDER_CACHE_TTL", "300")))
+
+# Full-text search over the same posts. Rebuilding it takes a while on a big
+# blog, so full loads and rescoring after writes run on their own thread;
+# single-post writes are patched in place.
+blog_search = SearchIndex()
+search_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-index')
+blog_refresh_lock = threading.Lock()
+blog_refresh_pending = False
+BLOG_SEARCH_MAX_LIMIT = 50
+
+# Signed-in users allowed to see drafts outside the blog editor, by email
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(',') if email.strip()}
+
+_UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+def _parse_timestamp(value):
+    """Parse a Supabase ISO timestamp into an aware datetime (naive = UTC)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _blog_posts_changed(post=None, deleted_id=None, deleted_post=None):
+    """Invalidate everything derived from blog_posts after a write"""
+    blog_list_cache.clear()
+    blog_render_cache.clear()
+    
+    # Pages the snapshot must stop serving now rather than at the next publish
+    previous = blog_index.get(str(post['id'])) if post else None
+    withdrawn = []
+    if deleted_id is not None:
+        withdrawn.append((deleted_post or blog_index.get(str(deleted_id)) or {}).get('slug'))
+    if post and not post.get('published'):
+        withdrawn.append(post.get('slug'))
+    if previous and previous.get('slug') != post.get('slug'):
+        withdrawn.append(previous.get('slug'))
+    for slug in withdrawn:
+        if slug:
+            blog_snapshot.withdraw(BLOG_SNAPSHOT_DIR, slug)
+    
+    if post:
+        blog_index.upsert(post)
+        blog_search.upsert(post)
+    if deleted_id is not None:
+        blog_index.remove(deleted_id)
+        blog_search.remove(deleted_id)
+    search_index_executor.submit(blog_search.rescore)
+    
+    try:
+        _queue_blog_snapshot()
+    except Exception as e:
+        print(f"Failed to queue blog snapshot: {str(e)}")
+
+def _find_blog_post(key):
+    """Look a post up by slug or id: from the index, else with one query"""
+    # Periodically reload so edits made by other workers show up here too
+    if blog_index.is_stale(BLOG_INDEX_MAX_AGE):
+        _warm_blog_index()
+    
+    post = blog_index.get(key)
+    if post:
+        return post
+    
+    response = _execute(supabase.table('blog_posts').select('*').eq('slug', key).limit(1))
+    if not response.data and (key.isdigit() or _UUID_RE.match(key)):
+        response = _execute(supabase.table('blog_posts').select('*').eq('id', key).limit(1))
+    
+    if not response.data:
+        return None
+    
+    post = response.data[0]
+    blog_index.upsert(post)
+    blog_search.upsert(post)
+    search_index_executor.submit(blog_search.rescore)
+    return post
+
+def _warm_blog_index():
+    """Load every post into the slug/id index, and rebuild the search index in the background"""
+    try:
+        response = _execute(supabase.table('blog_posts').select('*'))
+        posts = response.data or []
+        blog_index.load(posts)
+        search_index_executor.submit(_load_blog_search, posts)
+    except Exception as e:
+        print(f"Could not warm blog index: {str(e)}")
+
+def _load_blog_search(posts):
+    try:
+        blog_search.load(posts)
+    except Exception as e:
+        print(f"Could not build blog search index: {str(e)}")
+
+def _refresh_blog_index_later():
+    """Reload the blog indexes on the search-index thread, unless a reload is already queued"""
+    global blog_refresh_pending
+    with blog_refresh_lock:
+        if blog_refresh_pending:
+            return
+        blog_refresh_pending = True
+    search_index_executor.submit(_refresh_blog_index)
+
+def _refresh_blog_index():
+    global blog_refresh_pending
+    try:
+        _warm_blog_index()
+    finally:
+        blog_refresh_pending = False
+
+def _is_admin():
+    user = get_current_user()
+    return bool(user) and (user.get('email') or '').lower() in ADMIN_EMAILS
+
+@app.template_filter('format_date')
+def format_date(value):
+    """Render an ISO timestamp the way the blog pages show dates"""
+    parsed = _parse_timestamp(value)
+    return f"{parsed.strftime('%B')} {parsed.day}, {parsed.year}" if parsed else ''
+
+def _load_blog_list_page(published_only, include_content, offset, limit):
+    """Fetch one page of posts and serialize it, returning (body, etag, last_modified)"""
+    columns = '*' if include_content else BLOG_LIST_COLUMNS
+    query = supabase.table('blog_posts').select(columns)
+    if published_only:
+        query = query.eq('published', True)
+    # Ask for one extra row to learn whether another page exists
+    response = _execute(query.order('created_at', desc=True).range(offset, offset + limit))
+    
+    posts = response.data or []
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    
+    body = json.dumps({
+        'success': True,
+        'posts': posts,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if has_more else None
+    }, separators=(',', ':')).encode('utf-8')
+    
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    
+    # The newest edit among the posts on this page; the ETag catches the rest
+    timestamps = [_parse_timestamp(p.get('updated_at') or p.get('created_at')) for p in posts]
+    last_modified = max([t for t in timestamps if t], default=None)
+    
+    return body, etag, last_modified
+
 @app.route('/api/blog/posts', methods=['GET'])
 def get_blog_posts():
-    """Get all blog posts"""
+    """List blog posts, newest first.
+
+    Query parameters: `limit` and `offset` for pagination, `published=true` to
+    hide drafts, and `include=content` to get full post bodies (admin editor).
+    Responses carry a strong ETag and Last-Modified, so revalidation returns 304.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', BLOG_PAGE_SIZE)), 1), BLOG_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit and offset must be integers'}), 400
+    
+    published_only = request.args.get('published', '').lower() in ('1', 'true', 'yes')
+    include_content = request.args.get('include') == 'content'
+    cache_key = (published_only, include_content, offset, limit)
+    
     try:
-        response = supabase.table('blog_posts').select('*').order('created_at', desc=True).execute()
-        return jsonify({'success': True, 'posts': response.data})
+        page = blog_list_cache.get(cache_key)
+        if page is None:
+            page = _load_blog_list_page(published_only, include_content, offset, limit)
+            blog_list_cache.set(cache_key, page)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+    
+    body, etag, last_modified = page
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response.make_conditional(request)
+
+@app.route('/api/blog/search', methods=['GET'])
+def search_blog_posts():
+    """Full-text search over published blog posts, best match first.
+
+    Query parameters: `q`, `limit`, and `include=drafts` to search drafts
+    too (admins only). The last word of `q` also matches as a prefix, so
+    this can back a search-as-you-type box. Each result has `title_html` and
+    `snippet`, HTML-escaped with the matched words in <mark>.
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), BLOG_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    include_drafts = request.args.get('include') == 'drafts'
+    if include_drafts and not _is_admin():
+        return jsonify({'success': False, 'error': 'Only admins can search drafts'}), 403
+    
+    # Never reload on the request path; this query is served from the current index
+    if blog_index.is_stale(BLOG_INDEX_MAX_AGE):
+        _refresh_blog_index_later()
+    
+    try:
+        results = blog_search.search(query, limit=limit, published_only=not include_drafts)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    response = jsonify({
+        'success': True,
+        'query': query,
+        'results': results,
+        'indexing': not blog_search.loaded
+    })
+    response.headers['Cache-Control'] = 'private, no-store' if include_drafts else 'no-cache'
+    return response
 
 @app.route('/api/blog/posts', methods=['POST'])
 def create_blog_post():
@@ -343,11 +1075,28 @@ def create_blog_post():
             'updated_at': datetime.now().isoformat()
         }
         
-        response = supabase.table('blog_posts').insert(post_data).execute()
+        response = _execute(supabase.table('blog_posts').insert(post_data))
+        _blog_posts_changed(post=response.data[0] if response.data else None)
         return jsonify({'success': True, 'post': response.data[0] if response.data else None})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/blog/posts/<post_key>', methods=['GET'])
+def get_blog_post(post_key):
+    """Get a single published post by id or slug"""
+    try:
+        post = _find_blog_post(post_key)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    if not post or not post.get('published'):
+        return jsonify({'success': False, 'error': 'Post not found'}), 404
+    
+    response = jsonify({'success': True, 'post': post})
+    response.add_etag()
+    response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response.make_conditional(request)
+
 @app.route('/api/blog/posts/<post_id>', methods=['PUT'])
 def update_blog_post(post_id):
     """Update an existing blog post"""
@@ -364,7 +1113,8 @@ def update_blog_post(post_id):
             'updated_at': datetime.now().isoformat()
         }
         
-        response = supabase.table('blog_posts').update(post_data).eq('id', post_id).execute()
+        response = _execute(supabase.table('blog_posts').update(post_data).eq('id', post_id))
+        _blog_posts_changed(post=response.data[0] if response.data else None)
         return jsonify({'success': True, 'post': response.data[0] if response.data else None})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -374,56 +1124,91 @@ def delete_blog_post(post_id):
     """Delete a blog post"""
     # Allow deletes without strict auth check
     try:
-        response = supabase.table('blog_posts').delete().eq('id', post_id).execute()
+        response = _execute(supabase.table('blog_posts').delete().eq('id', post_id))
+        _blog_posts_changed(deleted_id=post_id, deleted_post=response.data[0] if response.data else None)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/ask', methods=['POST'])
-def ask():
-    data = request.json
+def _check_ask_rate_limit():
+    """Apply the /ask token buckets; returns a 429 response when over a limit"""
+    allowed, retry_after, scope = ask_rate_limiter.check(ip=request.remote_addr, user_id=session.get('user_id'))
+    if allowed:
+        return None
+    
+    response = jsonify({'error': 'Too many questions at once. Please take a breath and try again shortly.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(int(retry_after + 0.999), 1))
+    return response
+
+def _conversation_owner(claims):
+    """Who a new conversation belongs to: the user, or this browser's session"""
+    if claims:
+        return claims.user_id
+    if 'visitor_id' not in session:
+        session['visitor_id'] = secrets.token_urlsafe(16)
+    return f"visitor:{session['visitor_id']}"
+
+def _free_questions_asked_today():
+    """Questions an anonymous visitor has asked today; the count starts over each day"""
+    if session.get('questions_reset_date') != datetime.now().date().isoformat():
+        return 0
+    return session.get('questions_asked_today', 0)
+
+def _prepare_ask(data):
+    """Run the teacher/tier checks and quota accounting shared by /ask and /ask/stream.
+
+    Returns (context, None) when the question may be answered, or
+    (None, error_response) when it has to be rejected.
+    """
+    # Cheapest check first: nothing below runs for a rate-limited client
+    limited = _check_ask_rate_limit()
+    if limited:
+        return None, limited
+    
     question = data.get('question')
     teacher_id = data.get('teacher')
-    conversation_history = data.get('conversation', [])
+    conversation_id = data.get('conversation_id')
     
-    user_profile = get_current_user()
-    is_premium = is_user_premium(user_profile)
+    claims = current_entitlement()
+    is_premium = claims.is_premium() if claims else False
     
     # Check if teacher exists
-    if teacher_id not in SPIRITUAL_TEACHERS:
-        return jsonify({'error': 'Invalid teacher selected'}), 400
-    
-    teacher = SPIRITUAL_TEACHERS[teacher_id]
+    teacher = teachers.current().listed.get(teacher_id)
+    if teacher is None:
+        return None, (jsonify({'error': 'Invalid teacher selected'}), 400)
     
     # Check if user has access to this teacher
-    if teacher['tier'] == 'premium' and not is_premium:
-        return jsonify({'error': 'This teacher requires premium access'}), 403
+    if teacher.tier == 'premium' and not is_premium:
+        return None, (jsonify({'error': 'This teacher requires premium access'}), 403)
     
     # For free users, check question limit (only if not logged in)
-    if not is_premium and not user_profile:
-        session.setdefault('questions_asked_today', 0)
-        session.setdefault('questions_reset_date', datetime.now().date().isoformat())
-        
-        # Reset counter if it's a new day
-        if session['questions_reset_date'] != datetime.now().date().isoformat():
-            session['questions_asked_today'] = 0
-            session['questions_reset_date'] = datetime.now().date().isoformat()
-        
-        if session['questions_asked_today'] >= 5:
-            return jsonify({'error': 'Daily question limit reached. Upgrade to premium for unlimited access.'}), 429
+    if not is_premium and not claims:
+        questions_asked = _free_questions_asked_today()
+        if questions_asked >= 5:
+            return None, (jsonify({'error': 'Daily question limit reached. Upgrade to premium for unlimited access.'}), 429)
         
-        session['questions_asked_today'] += 1
+        session['questions_asked_today'] = questions_asked + 1
+        session['questions_reset_date'] = datetime.now().date().isoformat()
     
-    # Build conversation history
+    # Continue the stored conversation if it is this visitor's, with this
+    # teacher; otherwise start a new one
+    owner_id = _conversation_owner(claims)
+    conversation = conversations.load(conversation_id, owner_id, teacher_id) if conversation_id else None
+    if conversation is None:
+        conversation_id = conversations.create(teacher_id, owner_id)
+        conversation = {'turns': [], 'summary': None}
+    
+    # Build conversation history, within the token budget
     messages = []
-    for msg in conversation_history:
+    for past_question, past_answer in history_compactor.fit(conversation['turns'], conversation['summary']):
         messages.append({
             "role": "user",
-            "content": msg.get('question', '')
+            "content": past_question
         })
         messages.append({
             "role": "assistant",
-            "content": msg.get('answer', '')
+            "content": past_answer
         })
     
     # Add current question
@@ -432,30 +1217,543 @@ def ask():
         "content": question
     })
     
+    questions_remaining = None
+    if not is_premium and not claims:
+        questions_remaining = 5 - session['questions_asked_today']
+    
+    return {
+        'teacher_id': teacher_id,
+        'teacher': teacher,
+        'conversation_id': conversation_id,
+        'question': question,
+        'summary': conversation['summary'],
+        # Opening questions don't depend on any history, so their answers can be shared
+        'first_turn': not conversation['turns'] and not conversation['summary'],
+        'messages': messages,
+        'questions_remaining': questions_remaining,
+        # Only premium members get a saved history
+        'history_user_id': claims.user_id if is_premium else None
+    }, None
+
+def _cached_answer(context):
+    """A previously generated answer to this opening question, if there is one"""
+    if not context['first_turn']:
+        return None
+    return answer_cache.get(context['teacher_id'], context['question'])
+
+def _cache_answer(context, answer):
+    if context['first_turn']:
+        answer_cache.put(context['teacher_id'], context['question'], answer)
+
+def _load_answer_seed():
+    """Fill the answer cache from the pre-generated seed file, if there is one"""
+    if not os.path.exists(ANSWER_CACHE_SEED):
+        return
+    try:
+        with open(ANSWER_CACHE_SEED) as f:
+            entries = json.load(f)
+        for entry in entries:
+            for answer in entry['answers']:
+                answer_cache.put(entry['teacher_id'], entry['question'], answer)
+        print(f"Loaded {len(entries)} pre-generated answers from {ANSWER_CACHE_SEED}")
+    except Exception as e:
+        print(f"Failed to load answer seed: {str(e)}")
+
+def _summarize_turns(previous_summary, turns):
+    """Fold old conversation turns into the rolling summary with a small, fast model"""
+    transcript = '\n\n'.join(f"Seeker: {question}\nTeacher: {answer}" for question, answer in turns)
+    prompt = f"Earlier summary:\n{previous_summary}\n\n" if previous_summary else ""
+    prompt += (f"New conversation turns:\n{transcript}\n\n"
+               "Write an updated summary of this conversation in under 200 words. Keep the "
+               "seeker's situation, questions and any practices or insights they were given.")
+    
+    try:
+        with _timed_llm('summary', 'create'):
+            response = client.messages.create(
+                model=HISTORY_SUMMARY_MODEL,
+                max_tokens=400,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        _record_llm_usage('summary', response.usage)
+        return response.content[0].text
+    except Exception as e:
+        print(f"Summary failed, using extractive fallback: {str(e)}")
+        return extractive_summary(previous_summary, turns)
+
+def _compact_conversation(conversation_id):
+    """Background job: fold old turns into the summary once over budget"""
     try:
-        # Get response from Claude
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            system=teacher['system_prompt'],
-            messages=messages
-        )
+        conversation = conversations.get(conversation_id)
+        if conversation is None:
+            return
         
-        answer = response.content[0].text
+        count, summary = history_compactor.compact(conversation['turns'], conversation['summary'])
+        if count:
+            # Folds exactly the turns summarized, and only if no other compaction did first
+            conversations.fold(conversation_id, conversation['first_seq'] + count - 1,
+                               summary, conversation['summary'])
+    except Exception as e:
+        print(f"Conversation compaction failed: {str(e)}")
+
+def _remember_turn(conversation_id, question, answer):
+    """Store a finished turn; compaction runs off the request path"""
+    conversations.append(conversation_id, question, answer)
+    compaction_executor.submit(_compact_conversation, conversation_id)
+
+def _record_history(context, answer):
+    """Queue the answered question for the user's history; returns its id, or None"""
+    if not context['history_user_id']:
+        return None
+    
+    entry_id = history_store.new_entry_id()
+    preview, truncated = history_store.preview(answer)
+    history_writer.add({
+        'id': entry_id,
+        'user_id': context['history_user_id'],
+        'conversation_id': context['conversation_id'],
+        'teacher_id': context['teacher_id'],
+        'teacher_name': context['teacher'].name,
+        'question': context['question'],
+        'response': answer,
+        'preview': preview,
+        'truncated': truncated,
+        'created_at': history_store.now_iso()
+    })
+    return entry_id
+
+def _llm_params(teacher, messages, summary=None):
+    """Arguments for client.messages.create/stream, with prompt caching breakpoints.
+
+    The teacher's system prompt is identical on every call and the history
+    only ever grows at the end, so both are marked cacheable. The breakpoint
+    on the previous assistant turn reads what the last call cached; the one
+    on the new question writes the prefix the next call will read.
+    (Prefixes shorter than the model's minimum cacheable length are simply
+    not cached.)
+    """
+    system = [{
+        "type": "text",
+        "text": teacher.system_prompt,
+        "cache_control": {"type": "ephemeral"}
+    }]
+    if summary:
+        system.append({
+            "type": "text",
+            "text": f"Summary of the earlier part of this conversation:\n{summary}"
+        })
+    
+    messages = list(messages)
+    for index in (len(messages) - 2, len(messages) - 1):
+        if index < 0:
+            continue
+        message = messages[index]
+        if isinstance(message['content'], str) and message['content']:
+            messages[index] = {
+                "role": message['role'],
+                "content": [{
+                    "type": "text",
+                    "text": message['content'],
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            }
+    
+    return {
+        "model": LLM_MODEL,
+        "max_tokens": LLM_MAX_TOKENS,
+        "system": system,
+        "messages": messages
+    }
+
+def _record_llm_usage(teacher_id, usage):
+    """Add one call's token usage, including prompt cache reads/writes, to the totals and metrics"""
+    counts = {
+        'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0
+    }
+    
+    with llm_usage_lock:
+        llm_usage_totals['requests'] += 1
+        for key, value in counts.items():
+            llm_usage_totals[key] += value
+    for key, value in counts.items():
+        llm_tokens.inc(value, teacher=teacher_id, type=key)
+    
+    # The totals and llm_tokens carry the numbers; per-call detail is debug only
+    app.logger.debug("LLM usage teacher=%s input=%s output=%s cache_read=%s cache_write=%s",
+                     teacher_id, counts['input_tokens'], counts['output_tokens'],
+                     counts['cache_read_input_tokens'], counts['cache_creation_input_tokens'])
+    return counts
+
+def _sse_event(event, data):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/ask', methods=['POST'])
+def ask():
+    context, error_response = _prepare_ask(request.json)
+    if error_response:
+        return error_response
+    
+    teacher = context['teacher']
+    
+    try:
+        answer = _cached_answer(context)
+        if answer is None:
+            # Get response from Claude
+            with _timed_llm(context['teacher_id'], 'create'):
+                response = client.messages.create(**_llm_params(teacher, context['messages'], context['summary']))
+            _record_llm_usage(context['teacher_id'], response.usage)
+            
+            answer = response.content[0].text
+            _cache_answer(context, answer)
         
-        questions_remaining = None
-        if not is_premium and not user_profile:
-            questions_remaining = 5 - session['questions_asked_today']
+        _remember_turn(context['conversation_id'], context['question'], answer)
+        entry_id = _record_history(context, answer)
         
         return jsonify({
+            'id': entry_id,
             'response': answer,
-            'teacher': teacher['name'],
-            'questions_remaining': questions_remaining
+            'teacher': teacher.name,
+            'conversation_id': context['conversation_id'],
+            'questions_remaining': context['questions_remaining']
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """Same as /ask, but relays the answer as Server-Sent Events while it is generated.
+
+    Emits `delta` events carrying text chunks, then a final `done` event with
+    `questions_remaining` (or an `error` event if generation fails midway).
+    """
+    context, error_response = _prepare_ask(request.json)
+    if error_response:
+        return error_response
+    
+    teacher = context['teacher']
+    
+    def generate():
+        try:
+            answer = _cached_answer(context)
+            if answer is not None:
+                yield _sse_event('delta', {'text': answer})
+            else:
+                chunks = []
+                started = time.perf_counter()
+                with _timed_llm(context['teacher_id'], 'stream'), \
+                        client.messages.stream(**_llm_params(teacher, context['messages'], context['summary'])) as stream:
+                    for text in stream.text_stream:
+                        if not chunks:
+                            llm_first_token_seconds.observe(time.perf_counter() - started, teacher=context['teacher_id'])
+                        chunks.append(text)
+                        yield _sse_event('delta', {'text': text})
+                    _record_llm_usage(context['teacher_id'], stream.get_final_message().usage)
+                
+                answer = ''.join(chunks)
+                _cache_answer(context, answer)
+            
+            _remember_turn(context['conversation_id'], context['question'], answer)
+            entry_id = _record_history(context, answer)
+            
+            yield _sse_event('done', {
+                'id': entry_id,
+                'teacher': teacher.name,
+                'conversation_id': context['conversation_id'],
+                'questions_remaining': context['questions_remaining']
+            })
+        except Exception as e:
+            yield _sse_event('error', {'error': str(e)})
+    
+    # The quota counter is already written to the session above, so the
+    # cookie goes out with the headers before the first token arrives.
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# History and favorites
+HISTORY_LIST_COLUMNS = 'id, teacher_name, question, preview, truncated, created_at'
+
+def _history_item(row):
+    """A history row as the panels show it: the preview, never the full answer"""
+    return {
+        'id': row['id'],
+        'teacher': row['teacher_name'],
+        'question': row['question'],
+        'preview': row['preview'],
+        'truncated': row['truncated'],
+        'timestamp': row['created_at']
+    }
+
+def _history_page_args():
+    """(limit, cursor) from the query string; cursor is None for the first page"""
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return limit, None
+    
+    decoded = history_store.decode_cursor(cursor)
+    if decoded is None:
+        raise ValueError('Invalid cursor')
+    return limit, decoded
+
+@app.route('/history')
+def history():
+    """The user's answered questions, newest first; pass `cursor` for older ones"""
+    user_profile = get_current_user()
+    if not user_profile:
+        return jsonify({'error': 'Please log in to see your history'}), 401
+    
+    try:
+        limit, cursor = _history_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        query = (supabase.table('conversation_history')
+                 .select(HISTORY_LIST_COLUMNS)
+                 .eq('user_id', user_profile['user_id'])
+                 .order('created_at', desc=True)
+                 .order('id', desc=True)
+                 .limit(limit + 1))
+        if cursor:
+            query = history_store.after_cursor(query, cursor)
+        rows, next_cursor = history_store.page(_execute(query).data or [], limit)
+        return jsonify({'items': [_history_item(row) for row in rows], 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history/<entry_id>')
+def history_entry(entry_id):
+    """One saved answer in full"""
+    user_profile = get_current_user()
+    if not user_profile:
+        return jsonify({'error': 'Please log in to see your history'}), 401
+    
+    try:
+        response = _execute(supabase.table('conversation_history')
+                            .select('id, teacher_name, question, response, created_at')
+                            .eq('id', entry_id)
+                            .eq('user_id', user_profile['user_id'])
+                            .limit(1))
+        if not response.data:
+            return jsonify({'error': 'Not found'}), 404
+        row = response.data[0]
+        return jsonify({
+            'id': row['id'],
+            'teacher': row['teacher_name'],
+            'question': row['question'],
+            'response': row['response'],
+            'timestamp': row['created_at']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/favorites')
+def favorites():
+    """The user's saved answers, most recently saved first; pass `cursor` for older ones"""
+    user_profile = get_current_user()
+    if not user_profile:
+        return jsonify({'error': 'Please log in to see your saved wisdom'}), 401
+    
+    try:
+        limit, cursor = _history_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        query = (supabase.table('favorites')
+                 .select('entry_id, created_at')
+                 .eq('user_id', user_profile['user_id'])
+                 .order('created_at', desc=True)
+                 .order('entry_id', desc=True)
+                 .limit(limit + 1))
+        if cursor:
+            query = history_store.after_cursor(query, cursor, id_column='entry_id')
+        saved, next_cursor = history_store.page(_execute(query).data or [], limit, id_column='entry_id')
+        
+        items = []
+        if saved:
+            entries = _execute(supabase.table('conversation_history')
+                               .select(HISTORY_LIST_COLUMNS)
+                               .eq('user_id', user_profile['user_id'])
+                               .in_('id', [row['entry_id'] for row in saved])).data or []
+            by_id = {entry['id']: entry for entry in entries}
+            items = [_history_item(by_id[row['entry_id']]) for row in saved if row['entry_id'] in by_id]
+        return jsonify({'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/favorite/add', methods=['POST'])
+def add_favorite():
+    user_profile = get_current_user()
+    if not user_profile:
+        return jsonify({'error': 'Please log in to save wisdom'}), 401
+    
+    entry_id = (request.json or {}).get('id')
+    if not isinstance(entry_id, str) or not entry_id:
+        return jsonify({'error': 'Missing id'}), 400
+    
+    try:
+        # The answer may still be waiting in this worker's write buffer
+        history_writer.flush(timeout=2)
+        _execute(supabase.table('favorites').upsert({
+            'user_id': user_profile['user_id'],
+            'entry_id': entry_id,
+            'created_at': history_store.now_iso()
+        }, on_conflict='user_id,entry_id', ignore_duplicates=True))
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/favorite/remove', methods=['POST'])
+def remove_favorite():
+    user_profile = get_current_user()
+    if not user_profile:
+        return jsonify({'error': 'Please log in to save wisdom'}), 401
+    
+    entry_id = (request.json or {}).get('id')
+    if not isinstance(entry_id, str) or not entry_id:
+        return jsonify({'error': 'Missing id'}), 400
+    
+    try:
+        _execute(supabase.table('favorites').delete()
+                 .eq('user_id', user_profile['user_id'])
+                 .eq('entry_id', entry_id))
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _council_answer(context, deadline, abandoned):
+    """One teacher's answer to a council question (runs on council_executor).
+
+    The answer is streamed so it can be dropped mid-way: once the council's
+    deadline passes or its request goes away, the stream is closed and no
+    more tokens are generated for an answer nobody will see.
+    """
+    answer = _cached_answer(context)
+    if answer is not None:
+        return answer
+    
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or abandoned.is_set():
+        raise TimeoutError('This teacher took too long to answer')
+    
+    # No retries: a retry would outlast the council's deadline anyway
+    council_client = client.with_options(timeout=min(remaining, COUNCIL_TEACHER_TIMEOUT), max_retries=0)
+    chunks = []
+    with _timed_llm(context['teacher_id'], 'council'), \
+            council_client.messages.stream(**_llm_params(context['teacher'], context['messages'])) as stream:
+        for text in stream.text_stream:
+            if time.monotonic() > deadline or abandoned.is_set():
+                # Leaving the with block closes the stream
+                _record_llm_usage(context['teacher_id'], stream.current_message_snapshot.usage)
+                raise TimeoutError('This teacher took too long to answer')
+            chunks.append(text)
+        _record_llm_usage(context['teacher_id'], stream.get_final_message().usage)
+    
+    answer = ''.join(chunks)
+    _cache_answer(context, answer)
+    return answer
+
+@app.route('/ask/council', methods=['POST'])
+def ask_council():
+    """Put one question to several teachers at once (premium only).
+
+    Takes {'question', 'teachers': [id, ...]} and streams Server-Sent Events:
+    an `answer` (or `error`) event per teacher as soon as that teacher is
+    done, in whatever order they finish, then `done`. The whole request
+    counts once against the rate limits.
+    """
+    limited = _check_ask_rate_limit()
+    if limited:
+        return limited
+    
+    data = request.json or {}
+    question = (data.get('question') or '').strip()
+    teacher_ids = data.get('teachers')
+    
+    claims = current_entitlement()
+    if not (claims and claims.is_premium()):
+        return jsonify({'error': 'The council of teachers requires premium access'}), 403
+    if not question:
+        return jsonify({'error': 'Please enter a question'}), 400
+    if not isinstance(teacher_ids, list) or not all(isinstance(teacher_id, str) for teacher_id in teacher_ids):
+        return jsonify({'error': 'teachers must be a list of teacher ids'}), 400
+    teacher_ids = list(dict.fromkeys(teacher_ids))
+    if not 1 <= len(teacher_ids) <= COUNCIL_MAX_TEACHERS:
+        return jsonify({'error': f'Choose between 1 and {COUNCIL_MAX_TEACHERS} teachers'}), 400
+    
+    listed = teachers.current().listed
+    unknown = [teacher_id for teacher_id in teacher_ids if teacher_id not in listed]
+    if unknown:
+        return jsonify({'error': f"Invalid teacher selected: {', '.join(unknown)}"}), 400
+    
+    contexts = [{
+        'teacher_id': teacher_id,
+        'teacher': listed[teacher_id],
+        'conversation_id': None,
+        'question': question,
+        'summary': None,
+        'first_turn': True,
+        'messages': [{"role": "user", "content": question}],
+        'history_user_id': claims.user_id
+    } for teacher_id in teacher_ids]
+    
+    def generate():
+        started = time.perf_counter()
+        deadline = time.monotonic() + COUNCIL_TEACHER_TIMEOUT
+        abandoned = threading.Event()
+        pending = {council_executor.submit(_council_answer, context, deadline, abandoned): context
+                   for context in contexts}
+        answered = 0
+        
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    context = pending.pop(future)
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        yield _sse_event('error', {'teacher_id': context['teacher_id'],
+                                                   'teacher': context['teacher'].name, 'error': str(e)})
+                        continue
+                    answered += 1
+                    yield _sse_event('answer', {
+                        'id': _record_history(context, answer),
+                        'teacher_id': context['teacher_id'],
+                        'teacher': context['teacher'].name,
+                        'response': answer
+                    })
+        finally:
+            # On the deadline, or if the client went away, stop the teachers
+            # still streaming and drop the ones that haven't started
+            abandoned.set()
+            for future in pending:
+                future.cancel()
+        
+        # Whoever is still thinking has run out of time
+        for context in pending.values():
+            yield _sse_event('error', {'teacher_id': context['teacher_id'],
+                                       'teacher': context['teacher'].name,
+                                       'error': 'This teacher took too long to answer'})
+        
+        yield _sse_event('done', {
+            'answered': answered,
+            'failed': len(contexts) - answered,
+            'elapsed': round(time.perf_counter() - started, 2)
+        })
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/verify_premium', methods=['POST'])
 def verify_premium():
     data = request.json
@@ -466,11 +1764,15 @@ def verify_premium():
         
         if user_profile:
             # Update user profile to premium
-            supabase.table('user_profiles').update({
+            _execute(supabase.table('user_profiles').update({
                 'is_premium': True,
                 'plan_type': 'lifetime',
                 'activated_at': datetime.now().isoformat()
-            }).eq('user_id', user_profile['user_id']).execute()
+            }).eq('user_id', user_profile['user_id']))
+            invalidate_user_profile(user_profile['user_id'])
+            updated_profile = get_current_user()
+            if updated_profile:
+                _issue_entitlement(updated_profile)
         
         session['is_premium'] = True
         session['questions_asked_today'] = 0
@@ -498,65 +1800,16 @@ def stripe_webhook():
         
         event = request.json
         
-        # Handle successful payment
+        # Handle successful payment: the account and email work happens in the
+        # job worker, so Stripe gets its 200 right away. The event id makes
+        # redelivered events no-ops.
         if event['type'] == 'checkout.session.completed':
-            session_data = event['data']['object']
-            customer_email = session_data.get('customer_email')
-            customer_id = session_data.get('customer')
-            
-            # Determine plan type from amount
-            amount_total = session_data.get('amount_total', 0) / 100  # Convert cents to dollars
-            plan_type = '6month' if amount_total < 40 else 'lifetime'
-            
-            # Check if user exists
-            try:
-                user_response = supabase.table('user_profiles').select('*').eq('email', customer_email).single().execute()
-                user_exists = user_response.data is not None
-            except:
-                user_exists = False
-            
-            if user_exists:
-                # Update existing user
-                expiry_date = None
-                if plan_type == '6month':
-                    expiry_date = (datetime.now() + timedelta(days=180)).isoformat()
-                
-                supabase.table('user_profiles').update({
-                    'is_premium': True,
-                    'plan_type': plan_type,
-                    'activated_at': datetime.now().isoformat(),
-                    'expires_at': expiry_date,
-                    'stripe_customer_id': customer_id
-                }).eq('email', customer_email).execute()
-            else:
-                # Create temporary account (they can set password later)
-                temp_password = secrets.token_urlsafe(16)
-                
-                try:
-                    auth_response = supabase.auth.sign_up({
-                        "email": customer_email,
-                        "password": temp_password
-                    })
-                    
-                    if auth_response.user:
-                        expiry_date = None
-                        if plan_type == '6month':
-                            expiry_date = (datetime.now() + timedelta(days=180)).isoformat()
-                        
-                        supabase.table('user_profiles').insert({
-                            'user_id': auth_response.user.id,
-                            'email': customer_email,
-                            'is_premium': True,
-                            'plan_type': plan_type,
-                            'activated_at': datetime.now().isoformat(),
-                            'expires_at': expiry_date,
-                            'stripe_customer_id': customer_id
-                        }).execute()
-                except:
-                    pass  # User creation failed, but we'll send magic link anyway
-            
-            # Send magic link email
-            send_magic_link_email(customer_email, plan_type)
+            event_id = event.get('id') or hashlib.sha256(payload).hexdigest()
+            queued = jobs.enqueue('stripe_checkout_completed', {
+                'event_id': event_id,
+                'session': event['data']['object']
+            }, key=f"stripe:{event_id}")
+            return jsonify({'success': True, 'queued': queued})
             
         return jsonify({'success': True})
         
@@ -564,85 +1817,170 @@ def stripe_webhook():
         print(f"Webhook error: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
-def send_magic_link_email(email, plan_type):
-    """Send magic link email for premium access"""
+def send_magic_link_email(email, plan_type, idempotency_key=None):
+    """Send magic link email for premium access; raises if Resend rejects it"""
     # Generate magic token
-    token = secrets.token_urlsafe(32)
-    magic_tokens[token] = {
-        'email': email,
-        'plan_type': plan_type,
-        'created_at': datetime.now(),
-        'expires_at': datetime.now() + timedelta(hours=24)
-    }
+    token = magic_tokens.issue(email, plan_type)
     
     # Create magic link
     magic_link = f"https://mysoulcompass.app/magic_login/{token}"
     
     plan_name = "6-Month Premium" if plan_type == '6month' else "Lifetime Premium"
     
-    # Send email via Resend
-    try:
-        response = requests.post(
-            "https://api.resend.com/emails",
-            headers={
-                "Authorization": f"Bearer {RESEND_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "from": "My Soul Compass <noreply@mysoulcompass.app>",
-                "to": [email],
-                "subject": f"🌟 Your {plan_name} Access is Ready!",
-                "html": f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h1 style="color: #9333ea; text-align: center;">✨ Welcome to Premium! ✨</h1>
-                    <p>Thank you for upgrading to <strong>{plan_name}</strong> access on My Soul Compass!</p>
-                    <p>Click the button below to instantly access all 12 spiritual teachers:</p>
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="{magic_link}" 
-                           style="background: linear-gradient(135deg, #c9a961, #9333ea); 
-                                  color: white; 
-                                  padding: 15px 40px; 
-                                  text-decoration: none; 
-                                  border-radius: 25px; 
-                                  font-weight: bold;
-                                  display: inline-block;">
-                            Access Your Premium Account
-                        </a>
-                    </div>
-                    <p style="color: #666; font-size: 14px;">This link expires in 24 hours.</p>
-                    <p style="color: #666; font-size: 14px;">If you didn't make this purchase, please ignore this email.</p>
+    # Send email via Resend; the idempotency key stops a retried job from
+    # sending a second copy
+    headers = {
+        "Authorization": f"Bearer {RESEND_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    
+    response = resend_http.post(
+        "https://api.resend.com/emails",
+        headers=headers,
+        json={
+            "from": "My Soul Compass <noreply@mysoulcompass.app>",
+            "to": [email],
+            "subject": f"🌟 Your {plan_name} Access is Ready!",
+            "html": f"""
+            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #9333ea; text-align: center;">✨ Welcome to Premium! ✨</h1>
+                <p>Thank you for upgrading to <strong>{plan_name}</strong> access on My Soul Compass!</p>
+                <p>Click the button below to instantly access all 12 spiritual teachers:</p>
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="{magic_link}" 
+                       style="background: linear-gradient(135deg, #c9a961, #9333ea); 
+                              color: white; 
+                              padding: 15px 40px; 
+                              text-decoration: none; 
+                              border-radius: 25px; 
+                              font-weight: bold;
+                              display: inline-block;">
+                        Access Your Premium Account
+                    </a>
                 </div>
-                """
-            }
-        )
-        print(f"Magic link email sent to {email}: {response.status_code}")
-    except Exception as e:
-        print(f"Failed to send magic link email: {str(e)}")
+                <p style="color: #666; font-size: 14px;">This link expires in 24 hours.</p>
+                <p style="color: #666; font-size: 14px;">If you didn't make this purchase, please ignore this email.</p>
+            </div>
+            """
+        }
+    )
+    if response.status_code == 409 and idempotency_key:
+        # A retried job gets a fresh token, so Resend rejects the changed body
+        # under the same key: the earlier attempt already sent the email
+        print(f"Magic link email to {email} already sent")
+        return
+    response.raise_for_status()
+    print(f"Magic link email sent to {email}: {response.status_code}")
+
+@jobs.handler('stripe_checkout_completed')
+def process_checkout_completed(payload):
+    """Job: activate premium for a completed Stripe checkout, then queue the magic link email"""
+    session_data = payload['session']
+    customer_email = session_data.get('customer_email')
+    customer_id = session_data.get('customer')
+    
+    # Determine plan type from amount
+    amount_total = (session_data.get('amount_total') or 0) / 100  # Convert cents to dollars
+    plan_type = '6month' if amount_total < 40 else 'lifetime'
+    
+    # Check if user exists
+    try:
+        user_response = _execute(supabase.table('user_profiles').select('*').eq('email', customer_email).single())
+        user_exists = user_response.data is not None
+    except:
+        user_exists = False
+    
+    if user_exists:
+        # Update existing user
+        expiry_date = None
+        if plan_type == '6month':
+            expiry_date = (datetime.now() + timedelta(days=180)).isoformat()
+        
+        _execute(supabase.table('user_profiles').update({
+            'is_premium': True,
+            'plan_type': plan_type,
+            'activated_at': datetime.now().isoformat(),
+            'expires_at': expiry_date,
+            'stripe_customer_id': customer_id
+        }).eq('email', customer_email))
+        invalidate_user_profile(user_response.data['user_id'])
+    else:
+        # Create temporary account (they can set password later)
+        temp_password = secrets.token_urlsafe(16)
+        
+        try:
+            with _timed('supabase'):
+                auth_response = supabase.auth.sign_up({
+                    "email": customer_email,
+                    "password": temp_password
+                })
+            
+            if auth_response.user:
+                expiry_date = None
+                if plan_type == '6month':
+                    expiry_date = (datetime.now() + timedelta(days=180)).isoformat()
+                
+                _execute(supabase.table('user_profiles').insert({
+                    'user_id': auth_response.user.id,
+                    'email': customer_email,
+                    'is_premium': True,
+                    'plan_type': plan_type,
+                    'activated_at': datetime.now().isoformat(),
+                    'expires_at': expiry_date,
+                    'stripe_customer_id': customer_id
+                }))
+                invalidate_user_profile(auth_response.user.id)
+        except Exception as e:
+            # User creation failed, but we'll send magic link anyway
+            print(f"Could not create account for {customer_email}: {str(e)}")
+    
+    # Send magic link email as its own job, so a failed send is retried
+    # without redoing the account work
+    email_key = f"stripe:{payload['event_id']}:magic_link"
+    jobs.enqueue('send_magic_link', {
+        'email': customer_email,
+        'plan_type': plan_type,
+        'idempotency_key': email_key
+    }, key=email_key)
+
+@jobs.handler('send_magic_link')
+def process_send_magic_link(payload):
+    """Job: email a magic login link; raises on failure so the queue retries it"""
+    send_magic_link_email(payload['email'], payload['plan_type'], payload.get('idempotency_key'))
 
 @app.route('/magic_login/<token>')
 def magic_login(token):
     """Handle magic link login"""
-    if token not in magic_tokens:
+    token_data = magic_tokens.get(token)
+    if token_data is None:
         return render_template('error.html', 
                              error_title="Invalid Link",
                              error_message="This magic link is invalid or has expired.")
     
-    token_data = magic_tokens[token]
-    
     # Check if token has expired
     if datetime.now() > token_data['expires_at']:
-        del magic_tokens[token]
+        magic_tokens.consume(token)
         return render_template('error.html',
                              error_title="Link Expired", 
                              error_message="This magic link has expired. Please contact support.")
     
+    # Deleting the token is the atomic gate: when a link is opened twice at
+    # once, on any workers, only one request gets to log in with it
+    if not magic_tokens.consume(token):
+        return render_template('error.html', 
+                             error_title="Invalid Link",
+                             error_message="This magic link has already been used.")
+    
     # Get user profile
     try:
-        user_response = supabase.table('user_profiles').select('*').eq('email', token_data['email']).single().execute()
+        user_response = _execute(supabase.table('user_profiles').select('*').eq('email', token_data['email']).single())
         if user_response.data:
             # Log them in
             session['user_id'] = user_response.data['user_id']
-            del magic_tokens[token]
+            session.regenerate()
+            _issue_entitlement(user_response.data)
             return redirect(url_for('index'))
     except:
         pass
@@ -651,5 +1989,132 @@ def magic_login(token):
                          error_title="Error",
                          error_message="Unable to activate your account. Please contact support.")
 
+# Shared options for the offline generation commands
+def _batch_options(command):
+    command = click.option('--local', is_flag=True,
+                           help='Call messages.create from a thread pool instead of the Batches API')(command)
+    command = click.option('--concurrency', default=4, show_default=True,
+                           help='Parallel calls with --local')(command)
+    command = click.option('--poll-interval', default=30, show_default=True,
+                           help='Seconds between batch status checks')(command)
+    return command
+
+@app.cli.command('pregenerate-answers')
+@click.option('--variants', type=int, default=None, help='Answers per question (default ANSWER_CACHE_VARIANTS)')
+@click.option('--checkpoint', default='data/pregenerate_checkpoint.json', show_default=True)
+@_batch_options
+def pregenerate_answers_command(variants, checkpoint, local, concurrency, poll_interval):
+    """Answer every sample prompt for every teacher and write the answer cache seed"""
+    variants = variants or answer_cache.variants
+    requests_by_id = {}
+    for teacher_id, teacher in teachers.current().listed.items():
+        for prompt in SAMPLE_PROMPTS:
+            prompt_key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+            for variant in range(variants):
+                custom_id = f"{teacher_id}-{prompt_key}-{variant}"
+                requests_by_id[custom_id] = (teacher_id, prompt, {
+                    'custom_id': custom_id,
+                    'params': _llm_params(teacher, [{"role": "user", "content": prompt}])
+                })
+    
+    results = batch_generate.run_batch(
+        client, [request for _, _, request in requests_by_id.values()],
+        batch_generate.Checkpoint(checkpoint),
+        use_batches=not local, poll_interval=poll_interval, max_workers=concurrency,
+        on_usage=lambda custom_id, usage: _record_llm_usage(requests_by_id[custom_id][0], usage))
+    
+    seed = {}
+    for custom_id, answer in results.items():
+        teacher_id, prompt, _ = requests_by_id[custom_id]
+        if answer:
+            seed.setdefault((teacher_id, prompt), []).append(answer)
+    entries = [{'teacher_id': teacher_id, 'question': prompt, 'answers': answers}
+               for (teacher_id, prompt), answers in seed.items()]
+    
+    os.makedirs(os.path.dirname(ANSWER_CACHE_SEED) or '.', exist_ok=True)
+    with open(f"{ANSWER_CACHE_SEED}.tmp", 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(f"{ANSWER_CACHE_SEED}.tmp", ANSWER_CACHE_SEED)
+    print(f"Wrote {len(results)} of {len(requests_by_id)} answers to {ANSWER_CACHE_SEED}; "
+          f"workers load it at startup")
+
+WISDOM_PROMPT = """Write today's "wisdom of the day" reflection for the My Soul Compass blog, in your own voice.
+Theme: {theme}
+Write 300-400 words of flowing prose with a short practice the reader can try today.
+Start with a title on the first line, then a blank line, then the reflection."""
+
+@app.cli.command('generate-wisdom')
+@click.option('--days', default=7, show_default=True, help='Number of days to write posts for')
+@click.option('--start', default=None, help='First day, YYYY-MM-DD (default today)')
+@click.option('--checkpoint', default='data/wisdom_checkpoint.json', show_default=True)
+@_batch_options
+def generate_wisdom_command(days, start, checkpoint, local, concurrency, poll_interval):
+    """Write a "wisdom of the day" draft blog post per day, rotating through the teachers"""
+    first_day = date.fromisoformat(start) if start else date.today()
+    teacher_set = teachers.current()
+    teacher_ids = sorted(teacher_set.listed)
+    planned = {}
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        teacher_id = teacher_ids[day.toordinal() % len(teacher_ids)]
+        theme = SAMPLE_PROMPTS[day.toordinal() % len(SAMPLE_PROMPTS)]
+        planned[f"wisdom-{day.isoformat()}"] = (day, teacher_id, theme)
+    
+    # Posts written by an earlier run are left alone
+    existing = _execute(supabase.table('blog_posts').select('slug').in_('slug', list(planned)))
+    for row in existing.data or []:
+        planned.pop(row['slug'], None)
+    if not planned:
+        print("Every day already has a wisdom post")
+        return
+    
+    batch_requests = []
+    for slug, (day, teacher_id, theme) in planned.items():
+        params = _llm_params(teacher_set.listed[teacher_id], [{"role": "user", "content": WISDOM_PROMPT.format(theme=theme)}])
+        params['max_tokens'] = 1500
+        batch_requests.append({'custom_id': slug, 'params': params})
+    
+    results = batch_generate.run_batch(
+        client, batch_requests, batch_generate.Checkpoint(checkpoint),
+        use_batches=not local, poll_interval=poll_interval, max_workers=concurrency,
+        on_usage=lambda custom_id, usage: _record_llm_usage(planned[custom_id][1], usage))
+    
+    rows = []
+    for slug, text in results.items():
+        day, teacher_id, theme = planned[slug]
+        title, _, body = text.strip().partition('\n')
+        body = body.strip() or title
+        rows.append({
+            'title': title.strip('# ').strip() or f"Wisdom for {day.isoformat()}",
+            'slug': slug,
+            'content': body,
+            'excerpt': body[:200].rsplit(' ', 1)[0] + '...',
+            'published': False,
+            'author_name': teacher_set.listed[teacher_id].name,
+            'created_at': datetime.now().isoformat(),
+            'updated_at': datetime.now().isoformat()
+        })
+    
+    if rows:
+        response = _execute(supabase.table('blog_posts').insert(rows))
+        for post in response.data or []:
+            blog_index.upsert(post)
+            blog_search.upsert(post)
+        _blog_posts_changed()
+    print(f"Added {len(rows)} draft wisdom posts; publish them from the blog admin")
+
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """Run the background job worker until interrupted; must run on the web server's host"""
+    if jobs.runner_alive():
+        print("Another job worker is running; this one takes over if it stops")
+    print("Job worker started")
+    jobs.run_forever()
+
+_warm_blog_index()
+_load_answer_seed()
+
+magic_tokens.start_sweeper(int(os.environ.get("MAGIC_TOKEN_SWEEP_INTERVAL", "600")))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=10000, debug=True)
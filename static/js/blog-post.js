@@ -0,0 +1,104 @@
+// Function to format date nicely
+function formatDate(dateString) {
+    const options = { year: 'numeric', month: 'long', day: 'numeric' };
+    return new Date(dateString).toLocaleDateString('en-US', options);
+}
+
+// Function to get emoji for category
+function getCategoryEmoji(category) {
+    const emojis = {
+        'Spiritual Growth': '🌱',
+        'Consciousness': '🧠',
+        'Wisdom': '💫',
+        'Meditation': '🧘',
+        'Philosophy': '📚',
+        'Jung': '🎭',
+        'Gnostic': '✨'
+    };
+    return emojis[category] || '📝';
+}
+
+// Get post ID from URL
+function getPostId() {
+    const urlParams = new URLSearchParams(window.location.search);
+    if (urlParams.get('id')) {
+        return urlParams.get('id');
+    }
+    // /blog/<slug> pages that could not be rendered on the server
+    const match = window.location.pathname.match(/^\/blog\/([^/]+)$/);
+    return match ? decodeURIComponent(match[1]) : null;
+}
+
+// Load and display blog post
+async function loadBlogPost() {
+    const postId = getPostId();
+    const container = document.getElementById('postContent');
+
+    // Already rendered by the server
+    if (container.dataset.rendered) {
+        const image = container.querySelector('.post-image');
+        image.textContent = getCategoryEmoji(image.dataset.category);
+        return;
+    }
+
+    if (!postId) {
+        container.innerHTML = `
+            <div class="error-message">
+                <h2>No post specified</h2>
+                <p>Please return to the blog and select a post.</p>
+            </div>
+        `;
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/blog/posts/${encodeURIComponent(postId)}`);
+
+        if (!response.ok) {
+            throw new Error('Post not found');
+        }
+
+        const result = await response.json();
+        const post = result.post;
+
+        // Update page title
+        document.getElementById('pageTitle').textContent = `${post.title} - My Soul Compass`;
+
+        // Display the post
+        container.innerHTML = `
+            <div class="post-header">
+                ${post.category ? `<span class="post-category">${post.category}</span>` : ''}
+                <h1 class="post-title">${post.title}</h1>
+                <div class="post-meta">
+                    <span class="post-meta-item">
+                        📅 ${formatDate(post.created_at)}
+                    </span>
+                    <span class="post-meta-item">
+                        👤 ${post.author_name || post.author}
+                    </span>
+                </div>
+            </div>
+
+            <div class="post-image">
+                ${getCategoryEmoji(post.category)}
+            </div>
+
+            <div class="post-content">
+                ${post.content}
+            </div>
+        `;
+
+    } catch (error) {
+        console.error('Error loading blog post:', error);
+        container.innerHTML = `
+            <div class="error-message">
+                <h2>Post not found</h2>
+                <p>This post may have been removed or doesn't exist.</p>
+                <p><a href="blog.html" class="back-to-blog">Return to Blog</a></p>
+            </div>
+        `;
+    }
+}
+
+// Load post when page loads
+document.addEventListener('DOMContentLoaded', loadBlogPost);
@@ -0,0 +1,105 @@
+// Function to format date nicely
+function formatDate(dateString) {
+    const options = { year: 'numeric', month: 'long', day: 'numeric' };
+    return new Date(dateString).toLocaleDateString('en-US', options);
+}
+
+// Function to create excerpt from content
+function createExcerpt(content, maxLength = 150) {
+    // Remove HTML tags
+    const text = content.replace(/<[^>]*>/g, '');
+    if (text.length <= maxLength) return text;
+    return text.substr(0, maxLength).trim() + '...';
+}
+
+// Function to get emoji for category
+function getCategoryEmoji(category) {
+    const emojis = {
+        'Spiritual Growth': '🌱',
+        'Consciousness': '🧠',
+        'Wisdom': '💫',
+        'Meditation': '🧘',
+        'Philosophy': '📚',
+        'Jung': '🎭',
+        'Gnostic': '✨'
+    };
+    return emojis[category] || '📝';
+}
+
+// Offset of the next page to load, null once every post is shown
+let nextOffset = 0;
+
+// Load and display the next page of blog posts
+async function loadBlogPosts() {
+    const container = document.getElementById('blogPosts');
+    const loadMore = document.getElementById('loadMore');
+    const firstPage = nextOffset === 0;
+
+    try {
+        const response = await fetch(`/api/blog/posts?published=true&offset=${nextOffset}`);
+
+        if (!response.ok) {
+            throw new Error('Failed to load posts');
+        }
+
+        const result = await response.json();
+        const posts = result.posts;
+        nextOffset = result.next_offset;
+        loadMore.style.display = nextOffset !== null ? 'block' : 'none';
+
+        if (firstPage && posts.length === 0) {
+            container.innerHTML = `
+                <div class="no-posts">
+                    <h2>No posts yet</h2>
+                    <p>Check back soon for new content!</p>
+                </div>
+            `;
+            return;
+        }
+
+        const cards = posts.map(post => `
+            <div class="blog-card" onclick="window.location.href='/blog/${encodeURIComponent(post.slug || post.id)}'">
+                <div class="blog-card-image">
+                    ${getCategoryEmoji(post.category)}
+                </div>
+                <div class="blog-card-content">
+                    <h2 class="blog-card-title">${post.title}</h2>
+                    <p class="blog-card-excerpt">${createExcerpt(post.excerpt || '')}</p>
+                    <div class="blog-card-meta">
+                        <span class="blog-card-date">
+                            📅 ${formatDate(post.created_at)}
+                        </span>
+                        ${post.category ? `<span class="blog-card-category">${post.category}</span>` : ''}
+                    </div>
+                </div>
+            </div>
+        `).join('');
+
+        if (firstPage) {
+            container.innerHTML = cards;
+        } else {
+            container.insertAdjacentHTML('beforeend', cards);
+        }
+
+    } catch (error) {
+        console.error('Error loading blog posts:', error);
+        container.innerHTML = `
+            <div class="no-posts">
+                <h2>Unable to load posts</h2>
+                <p>Please try again later.</p>
+            </div>
+        `;
+    }
+}
+
+// Load posts when page loads, unless the server already rendered them
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('blogPosts');
+    if (container.dataset.rendered) {
+        container.querySelectorAll('.blog-card-image').forEach(image => {
+            image.textContent = getCategoryEmoji(image.dataset.category);
+        });
+        return;
+    }
+    loadBlogPosts();
+});
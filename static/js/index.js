@@ -0,0 +1,734 @@
+let currentResponseId = null;
+let timerInterval = null;
+let timerSeconds = 300;
+let timerRunning = false;
+let breathworkInterval = null;
+let questionsRemaining = 5;
+let currentTeacher = null;
+let currentConversationId = null;
+
+// Show user greeting if name exists
+if (userName && userName.trim()) {
+    document.getElementById('user-greeting').style.display = 'flex';
+    document.getElementById('user-display-name').textContent = userName;
+}
+
+// Populate navigation dropdowns
+function populateDropdowns() {
+    console.log('Populating dropdowns...');
+    console.log('Teachers:', teachers);
+    console.log('Sample Prompts:', samplePrompts);
+
+    // Teachers dropdown
+    const teachersDropdown = document.getElementById('teachers-dropdown');
+    if (!teachersDropdown) {
+        console.error('Teachers dropdown not found!');
+        return;
+    }
+
+    Object.keys(teachers).forEach(key => {
+        const teacher = teachers[key];
+        const item = document.createElement('div');
+        item.className = 'dropdown-item teacher-option';
+        item.innerHTML = `
+            <div class="teacher-name">${teacher.name} ${teacher.tier === 'premium' ? '👑' : ''}</div>
+            <div class="teacher-desc">${teacher.description}</div>
+        `;
+        item.onclick = () => selectTeacher(key);
+        teachersDropdown.appendChild(item);
+    });
+
+    // Sample questions dropdown
+    const questionsDropdown = document.getElementById('questions-dropdown');
+    if (questionsDropdown && samplePrompts) {
+        samplePrompts.forEach(prompt => {
+            const item = document.createElement('div');
+            item.className = 'dropdown-item';
+            item.textContent = prompt;
+            item.onclick = () => {
+                usePrompt(prompt);
+                closeAllDropdowns();
+            };
+            questionsDropdown.appendChild(item);
+        });
+    }
+
+    // Mobile questions list
+    const mobileQuestionsList = document.getElementById('mobile-questions-list');
+    if (mobileQuestionsList && samplePrompts) {
+        samplePrompts.forEach(prompt => {
+            const item = document.createElement('div');
+            item.className = 'dropdown-item';
+            item.textContent = prompt;
+            item.onclick = () => {
+                usePrompt(prompt);
+                toggleMobileMenu();
+            };
+            mobileQuestionsList.appendChild(item);
+        });
+    }
+
+    console.log('Dropdowns populated successfully!');
+}
+
+function selectTeacher(teacherKey) {
+    console.log('Selecting teacher:', teacherKey);
+    currentTeacher = teacherKey;
+    const teacher = teachers[teacherKey];
+
+    const navElement = document.getElementById('current-teacher-nav');
+    if (navElement) {
+        navElement.textContent = teacher.name;
+    }
+
+    // Update mobile select too
+    const mobileSelect = document.getElementById('teacher-select-mobile');
+    if (mobileSelect) {
+        mobileSelect.value = teacherKey;
+    }
+
+    closeAllDropdowns();
+    console.log('Teacher selected:', teacher.name);
+}
+
+function toggleDropdown(dropdownId) {
+    console.log('Toggling dropdown:', dropdownId);
+    const dropdown = document.getElementById(dropdownId);
+
+    if (!dropdown) {
+        console.error('Dropdown not found:', dropdownId);
+        return;
+    }
+
+    const allDropdowns = document.querySelectorAll('.dropdown-content');
+
+    allDropdowns.forEach(d => {
+        if (d.id !== dropdownId) {
+            d.classList.remove('active');
+        }
+    });
+
+    dropdown.classList.toggle('active');
+    console.log('Dropdown toggled. Active:', dropdown.classList.contains('active'));
+}
+
+function closeAllDropdowns() {
+    document.querySelectorAll('.dropdown-content').forEach(d => {
+        d.classList.remove('active');
+    });
+}
+
+function toggleMobileMenu() {
+    const menu = document.getElementById('mobile-menu');
+    const overlay = document.getElementById('mobile-menu-overlay');
+    menu.classList.toggle('active');
+    overlay.classList.toggle('active');
+}
+
+// Close dropdowns when clicking outside
+document.addEventListener('click', function(e) {
+    if (!e.target.closest('.nav-dropdown')) {
+        closeAllDropdowns();
+    }
+});
+
+// Initialize dropdowns on page load
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('DOM loaded, initializing...');
+
+    populateDropdowns();
+
+    // Select first teacher by default
+    const firstTeacher = Object.keys(teachers)[0];
+    selectTeacher(firstTeacher);
+
+    // Attach event listeners to dropdown buttons
+    const teachersBtn = document.getElementById('teachers-dropdown-btn');
+    const questionsBtn = document.getElementById('questions-dropdown-btn');
+    const toolsBtn = document.getElementById('tools-dropdown-btn');
+
+    if (teachersBtn) {
+        teachersBtn.addEventListener('click', () => toggleDropdown('teachers-dropdown'));
+    }
+    if (questionsBtn) {
+        questionsBtn.addEventListener('click', () => toggleDropdown('questions-dropdown'));
+    }
+    if (toolsBtn) {
+        toolsBtn.addEventListener('click', () => toggleDropdown('tools-dropdown'));
+    }
+
+    // Attach mobile menu event listeners
+    const mobileMenuBtn = document.getElementById('mobile-menu-btn');
+    const mobileMenuClose = document.getElementById('mobile-menu-close');
+    const mobileMenuOverlay = document.getElementById('mobile-menu-overlay');
+
+    if (mobileMenuBtn) {
+        mobileMenuBtn.addEventListener('click', toggleMobileMenu);
+    }
+    if (mobileMenuClose) {
+        mobileMenuClose.addEventListener('click', toggleMobileMenu);
+    }
+    if (mobileMenuOverlay) {
+        mobileMenuOverlay.addEventListener('click', toggleMobileMenu);
+    }
+
+    // Attach tools buttons
+    const timerBtn = document.getElementById('timer-btn');
+    const breathworkBtn = document.getElementById('breathwork-btn');
+    const mobileTimerBtn = document.getElementById('mobile-timer-btn');
+    const mobileBreathworkBtn = document.getElementById('mobile-breathwork-btn');
+
+    if (timerBtn) {
+        timerBtn.addEventListener('click', () => {
+            openTimer();
+            closeAllDropdowns();
+        });
+    }
+    if (breathworkBtn) {
+        breathworkBtn.addEventListener('click', () => {
+            openBreathwork();
+            closeAllDropdowns();
+        });
+    }
+    if (mobileTimerBtn) {
+        mobileTimerBtn.addEventListener('click', () => {
+            openTimer();
+            toggleMobileMenu();
+        });
+    }
+    if (mobileBreathworkBtn) {
+        mobileBreathworkBtn.addEventListener('click', () => {
+            openBreathwork();
+            toggleMobileMenu();
+        });
+    }
+
+    // Attach upgrade buttons
+    const upgradeNavBtn = document.getElementById('upgrade-nav-btn');
+    const mobileUpgradeBtn = document.getElementById('mobile-upgrade-btn');
+
+    if (upgradeNavBtn) {
+        upgradeNavBtn.addEventListener('click', showUpgradeModal);
+    }
+    if (mobileUpgradeBtn) {
+        mobileUpgradeBtn.addEventListener('click', () => {
+            showUpgradeModal();
+            toggleMobileMenu();
+        });
+    }
+
+    console.log('Initialization complete!');
+});
+
+
+function showUpgradeModal() {
+    document.getElementById('upgrade-modal').classList.add('active');
+}
+
+function closeUpgradeModal() {
+    document.getElementById('upgrade-modal').classList.remove('active');
+}
+
+async function verifyPremiumCode() {
+    const code = document.getElementById('premium-code').value.trim();
+    const messageDiv = document.getElementById('code-message');
+
+    if (!code) {
+        messageDiv.innerHTML = '<div class="error-message">Please enter an access code</div>';
+        return;
+    }
+
+    try {
+        const response = await fetch('/verify_premium', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ code })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            messageDiv.innerHTML = '<div class="success-message">' + data.message + '</div>';
+            setTimeout(() => {
+                location.reload();
+            }, 1500);
+        } else {
+            messageDiv.innerHTML = '<div class="error-message">' + data.message + '</div>';
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        messageDiv.innerHTML = '<div class="error-message">Something went wrong. Please try again.</div>';
+    }
+}
+
+function usePrompt(prompt) {
+    document.getElementById('question-input').value = prompt;
+}
+
+function copyConversation() {
+    const messages = document.querySelectorAll('.message');
+    if (messages.length === 0) {
+        alert('No conversation to copy yet!');
+        return;
+    }
+
+    let conversationText = `Conversation with ${currentTeacher}\n`;
+    conversationText += '='.repeat(50) + '\n\n';
+
+    messages.forEach(message => {
+        const label = message.querySelector('.message-label')?.textContent || '';
+        const text = message.querySelector('.message-text')?.textContent || '';
+        conversationText += `${label}\n${text}\n\n`;
+    });
+
+    // Copy to clipboard
+    navigator.clipboard.writeText(conversationText).then(() => {
+        // Show success feedback
+        const btn = document.getElementById('copy-conversation-btn');
+        const icon = document.getElementById('copy-icon');
+        const text = document.getElementById('copy-text');
+
+        icon.textContent = '✓';
+        text.textContent = 'Copied!';
+        btn.style.background = 'rgba(139, 122, 184, 0.3)';
+
+        // Reset after 2 seconds
+        setTimeout(() => {
+            icon.textContent = '📋';
+            text.textContent = 'Copy Conversation';
+            btn.style.background = '';
+        }, 2000);
+    }).catch(err => {
+        alert('Failed to copy. Please try again.');
+    });
+}
+
+function startNewConversation() {
+    currentConversationId = null;
+    currentResponseId = null;
+    currentTeacher = null;
+    document.getElementById('messages-container').innerHTML = '';
+    document.getElementById('response-area').classList.remove('active');
+    document.getElementById('new-conversation-btn').style.display = 'none';
+    document.getElementById('copy-conversation-btn').style.display = 'none';
+    const favoriteBtn = document.getElementById('favorite-btn');
+    if (favoriteBtn) favoriteBtn.style.display = 'none';
+    document.getElementById('question-input').value = '';
+}
+
+function addMessage(role, content, teacher = null) {
+    const messagesContainer = document.getElementById('messages-container');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message';
+
+    if (role === 'user') {
+        messageDiv.innerHTML = `
+            <div class="message-user">
+                <div class="message-label">You asked:</div>
+                <div class="message-text">${content}</div>
+            </div>
+        `;
+    } else {
+        messageDiv.innerHTML = `
+            <div class="message-assistant">
+                <div class="message-label">${teacher} responds:</div>
+                <div class="message-text">${content}</div>
+            </div>
+        `;
+    }
+
+    messagesContainer.appendChild(messageDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+async function askQuestion() {
+    const question = document.getElementById('question-input').value.trim();
+
+    if (!question) {
+        alert('Please enter a question');
+        return;
+    }
+
+    if (!currentTeacher) {
+        alert('Please select a teacher from the navigation bar');
+        return;
+    }
+
+    const askBtn = document.getElementById('ask-btn');
+    const responseArea = document.getElementById('response-area');
+    const currentTeacherSpan = document.getElementById('current-teacher');
+    const messagesContainer = document.getElementById('messages-container');
+
+    askBtn.disabled = true;
+    askBtn.textContent = 'Channeling Wisdom...';
+    responseArea.classList.add('active');
+    document.getElementById('new-conversation-btn').style.display = 'inline-block';
+    document.getElementById('copy-conversation-btn').style.display = 'inline-block';
+
+    // Add user message immediately
+    addMessage('user', question);
+
+    // Add loading indicator
+    const loadingDiv = document.createElement('div');
+    loadingDiv.className = 'message';
+    loadingDiv.id = 'loading-message';
+    loadingDiv.innerHTML = '<div class="loader"><div class="spinner"></div><p>Receiving guidance...</p></div>';
+    messagesContainer.appendChild(loadingDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+
+    // Clear input
+    document.getElementById('question-input').value = '';
+
+    try {
+        const response = await fetch('/ask/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ 
+                question, 
+                teacher: currentTeacher,
+                conversation_id: currentConversationId 
+            })
+        });
+
+        if (!response.ok) {
+            // Tier and quota checks fail before streaming starts, as plain JSON
+            const data = await response.json();
+            document.getElementById('loading-message').remove();
+
+            if (response.status === 403) {
+                messagesContainer.innerHTML += `<div class="error-message">${data.error}<br><br><button class="btn" onclick="showUpgradeModal()">Upgrade Now</button></div>`;
+            } else {
+                messagesContainer.innerHTML += `<p style="color: #ff6b6b;">Error: ${data.error}</p>`;
+            }
+            return;
+        }
+
+        const teacherName = teachers[currentTeacher] ? teachers[currentTeacher].name : '';
+        let answerText = null;
+        let answer = '';
+        let done = null;
+        let streamError = null;
+
+        // Render tokens as they arrive
+        const handleEvent = (event, data) => {
+            if (event === 'delta') {
+                if (!answerText) {
+                    document.getElementById('loading-message')?.remove();
+                    addMessage('assistant', '', teacherName);
+                    answerText = messagesContainer.lastElementChild.querySelector('.message-text');
+                }
+                answer += data.text;
+                answerText.textContent = answer;
+                messagesContainer.scrollTop = messagesContainer.scrollHeight;
+            } else if (event === 'done') {
+                done = data;
+            } else if (event === 'error') {
+                streamError = data.error;
+            }
+        };
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done: readerDone } = await reader.read();
+            if (readerDone) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) handleEvent(event, JSON.parse(data));
+            }
+        }
+
+        document.getElementById('loading-message')?.remove();
+
+        if (streamError || !done) {
+            messagesContainer.innerHTML += `<p style="color: #ff6b6b;">Error: ${streamError || 'The connection was interrupted'}</p>`;
+            return;
+        }
+
+        currentTeacherSpan.textContent = done.teacher;
+
+        // The server keeps the history; later questions only send its id
+        currentConversationId = done.conversation_id;
+
+        // Saved to the premium history; this id is what gets favorited
+        currentResponseId = done.id;
+        const favoriteBtn = document.getElementById('favorite-btn');
+        if (favoriteBtn) {
+            favoriteBtn.style.display = currentResponseId ? 'inline-block' : 'none';
+            favoriteBtn.classList.remove('favorited');
+            favoriteBtn.textContent = '★ Save';
+        }
+
+        if (!isPremium && done.questions_remaining !== null) {
+            questionsRemaining = done.questions_remaining;
+            updateQuestionsCounter();
+        }
+
+        if (isPremium) {
+            loadHistory();
+        }
+    } catch (error) {
+        document.getElementById('loading-message')?.remove();
+        messagesContainer.innerHTML += `<p style="color: #ff6b6b;">Error: ${error.message}</p>`;
+    } finally {
+        askBtn.disabled = false;
+        askBtn.textContent = 'Receive Wisdom';
+    }
+}
+
+function updateQuestionsCounter() {
+    const counter = document.getElementById('questions-counter');
+    const questionsLeft = document.getElementById('questions-left');
+
+    if (questionsRemaining < 5) {
+        counter.style.display = 'block';
+        questionsLeft.textContent = questionsRemaining;
+    }
+}
+
+async function toggleFavorite() {
+    if (!currentResponseId) {
+        alert('Please ask a question first!');
+        return;
+    }
+
+    const btn = document.getElementById('favorite-btn');
+    const isFavorited = btn.classList.contains('favorited');
+
+    try {
+        const endpoint = isFavorited ? '/favorite/remove' : '/favorite/add';
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ id: currentResponseId })
+        });
+
+        if (response.ok) {
+            btn.classList.toggle('favorited');
+            btn.textContent = isFavorited ? '★ Save' : '★ Saved';
+            // Immediately refresh favorites list
+            setTimeout(() => {
+                loadFavorites();
+                // Show a quick confirmation
+                if (!isFavorited) {
+                    alert('✨ Wisdom saved! Find it under "Saved Wisdom".');
+                }
+            }, 100);
+        }
+    } catch (error) {
+        console.error('Error toggling favorite:', error);
+        alert('Error saving favorite. Please try again.');
+    }
+}
+
+// History and favorites come a page at a time; "Show more" fetches the next one
+function renderEntries(listId, itemClass, page, append, loadMore, emptyHtml) {
+    const list = document.getElementById(listId);
+    if (!list) return;
+
+    list.querySelector('.load-more')?.remove();
+    if (!append && page.items.length === 0) {
+        list.innerHTML = emptyHtml;
+        return;
+    }
+
+    const html = page.items.map(item => `
+        <div class="${itemClass}">
+            <div class="history-meta">
+                <span>${item.teacher}</span>
+                <span>${new Date(item.timestamp).toLocaleDateString()}</span>
+            </div>
+            <div class="history-question">${item.question}</div>
+            <div class="history-response">${item.preview}</div>
+            ${item.truncated ? `<button class="btn-secondary" onclick="expandEntry(this, '${item.id}')">Read in full</button>` : ''}
+        </div>
+    `).join('');
+    list.innerHTML = append ? list.innerHTML + html : html;
+
+    if (page.next_cursor) {
+        const button = document.createElement('button');
+        button.className = 'btn-secondary load-more';
+        button.textContent = 'Show more';
+        button.onclick = () => loadMore(page.next_cursor);
+        list.appendChild(button);
+    }
+}
+
+async function expandEntry(button, id) {
+    try {
+        const response = await fetch(`/history/${encodeURIComponent(id)}`);
+        if (!response.ok) return;
+        const entry = await response.json();
+        button.previousElementSibling.textContent = entry.response;
+        button.remove();
+    } catch (error) {
+        console.error('Error loading answer:', error);
+    }
+}
+
+async function loadHistory(cursor = null) {
+    try {
+        const response = await fetch(cursor ? `/history?cursor=${encodeURIComponent(cursor)}` : '/history');
+        if (!response.ok) return;
+        renderEntries('history-list', 'history-item', await response.json(), Boolean(cursor), loadHistory,
+            '<div class="empty-state"><div class="empty-state-icon">📜</div><p>No conversations yet</p></div>');
+    } catch (error) {
+        console.error('Error loading history:', error);
+    }
+}
+
+async function loadFavorites(cursor = null) {
+    try {
+        const response = await fetch(cursor ? `/favorites?cursor=${encodeURIComponent(cursor)}` : '/favorites');
+        if (!response.ok) return;
+        renderEntries('favorites-list', 'favorite-item', await response.json(), Boolean(cursor), loadFavorites,
+            '<div class="empty-state"><div class="empty-state-icon">⭐</div><p>No saved wisdom yet</p></div>');
+    } catch (error) {
+        console.error('Error loading favorites:', error);
+    }
+}
+
+function switchTab(tabName) {
+    document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
+    document.querySelectorAll('.tab-content').forEach(content => content.classList.remove('active'));
+
+    event.target.classList.add('active');
+    document.getElementById(`${tabName}-tab`).classList.add('active');
+
+    if (tabName === 'favorites') {
+        loadFavorites();
+    }
+}
+
+// Meditation Timer Functions
+function openTimer() {
+    document.getElementById('timer-modal').classList.add('active');
+}
+
+function closeTimer() {
+    document.getElementById('timer-modal').classList.remove('active');
+    if (timerRunning) {
+        pauseTimer();
+    }
+}
+
+function setTimer(minutes) {
+    timerSeconds = minutes * 60;
+    updateTimerDisplay();
+}
+
+function updateTimerDisplay() {
+    const minutes = Math.floor(timerSeconds / 60);
+    const seconds = timerSeconds % 60;
+    document.getElementById('timer-display').textContent = 
+        `${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
+}
+
+function startTimer() {
+    if (timerRunning) return;
+
+    timerRunning = true;
+    document.getElementById('timer-start').style.display = 'none';
+    document.getElementById('timer-pause').style.display = 'inline-block';
+
+    timerInterval = setInterval(() => {
+        timerSeconds--;
+        updateTimerDisplay();
+
+        if (timerSeconds <= 0) {
+            pauseTimer();
+            alert('Meditation complete! 🙏');
+        }
+    }, 1000);
+}
+
+function pauseTimer() {
+    timerRunning = false;
+    clearInterval(timerInterval);
+    document.getElementById('timer-start').style.display = 'inline-block';
+    document.getElementById('timer-pause').style.display = 'none';
+}
+
+function resetTimer() {
+    pauseTimer();
+    timerSeconds = 300;
+    updateTimerDisplay();
+}
+
+// Breathwork Functions
+function openBreathwork() {
+    document.getElementById('breathwork-modal').classList.add('active');
+}
+
+function closeBreathwork() {
+    document.getElementById('breathwork-modal').classList.remove('active');
+    stopBreathwork();
+}
+
+function startBreathwork() {
+    document.getElementById('breathwork-start').style.display = 'none';
+    document.getElementById('breathwork-stop').style.display = 'inline-block';
+
+    const phases = ['Inhale', 'Hold', 'Exhale', 'Hold'];
+    let phaseIndex = 0;
+
+    document.getElementById('breathwork-display').textContent = phases[0];
+
+    breathworkInterval = setInterval(() => {
+        phaseIndex = (phaseIndex + 1) % phases.length;
+        document.getElementById('breathwork-display').textContent = phases[phaseIndex];
+    }, 4000);
+}
+
+function stopBreathwork() {
+    clearInterval(breathworkInterval);
+    document.getElementById('breathwork-start').style.display = 'inline-block';
+    document.getElementById('breathwork-stop').style.display = 'none';
+    document.getElementById('breathwork-display').textContent = 'Inhale';
+}
+
+// Load initial history and favorites if premium
+if (isPremium) {
+    loadHistory();
+    loadFavorites();
+}
+
+// The page is cached for every visitor, so the daily quota is fetched here
+if (!isPremium && !userName) {
+    fetch('/api/quota')
+        .then(response => response.json())
+        .then(data => {
+            if (data.questions_remaining !== null) {
+                questionsRemaining = data.questions_remaining;
+                updateQuestionsCounter();
+            }
+        })
+        .catch(() => {});
+}
+
+// Allow Enter key to submit
+document.getElementById('question-input').addEventListener('keydown', function(e) {
+    if (e.key === 'Enter' && e.ctrlKey) {
+        askQuestion();
+    }
+});
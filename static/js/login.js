@@ -0,0 +1,41 @@
+const form = document.getElementById('login-form');
+const messageDiv = document.getElementById('message');
+const loginBtn = document.getElementById('login-btn');
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const email = document.getElementById('email').value;
+    const password = document.getElementById('password').value;
+
+    loginBtn.disabled = true;
+    loginBtn.textContent = 'Logging in...';
+    messageDiv.innerHTML = '';
+
+    try {
+        const response = await fetch('/login', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ email, password })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            messageDiv.innerHTML = '<div class="success-message">Login successful! Redirecting...</div>';
+            setTimeout(() => {
+                window.location.href = '/';
+            }, 1000);
+        } else {
+            messageDiv.innerHTML = `<div class="error-message">${data.message}</div>`;
+            loginBtn.disabled = false;
+            loginBtn.textContent = 'Log In';
+        }
+    } catch (error) {
+        messageDiv.innerHTML = '<div class="error-message">Login failed. Please try again.</div>';
+        loginBtn.disabled = false;
+        loginBtn.textContent = 'Log In';
+    }
+});
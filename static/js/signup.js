@@ -0,0 +1,47 @@
+const form = document.getElementById('signup-form');
+const messageDiv = document.getElementById('message');
+const signupBtn = document.getElementById('signup-btn');
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const name = document.getElementById('name').value;
+    const email = document.getElementById('email').value;
+    const password = document.getElementById('password').value;
+
+    if (password.length < 6) {
+        messageDiv.innerHTML = '<div class="error-message">Password must be at least 6 characters</div>';
+        return;
+    }
+
+    signupBtn.disabled = true;
+    signupBtn.textContent = 'Creating account...';
+    messageDiv.innerHTML = '';
+
+    try {
+        const response = await fetch('/signup', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ name, email, password })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            messageDiv.innerHTML = '<div class="success-message">Account created! Redirecting...</div>';
+            setTimeout(() => {
+                window.location.href = '/';
+            }, 1000);
+        } else {
+            messageDiv.innerHTML = `<div class="error-message">${data.message}</div>`;
+            signupBtn.disabled = false;
+            signupBtn.textContent = 'Create Account';
+        }
+    } catch (error) {
+        messageDiv.innerHTML = '<div class="error-message">Failed to create account. Please try again.</div>';
+        signupBtn.disabled = false;
+        signupBtn.textContent = 'Create Account';
+    }
+});
@@ -0,0 +1,177 @@
+"""The spiritual teachers, loaded from teachers.json and shared by both apps.
+
+The file is validated when it is loaded, and the views the request path
+needs are built once per load: every teacher by id and by display name,
+plus a frozen, template-safe view (no system prompts) for each tier, and
+that view as JSON for the page script. Serving a page is then a dict lookup.
+
+TeacherRegistry re-checks the file's mtime at most every `check_interval`
+seconds and swaps in a new TeacherSet when it changes. A file that fails
+validation is reported and ignored, and the previous set stays live.
+Teachers marked `"listed": false` are only reachable by name (the legacy
+chat in app.py) and never shown in the teacher picker.
+"""
+import json
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'teachers.json')
+
+TIERS = ('free', 'premium')
+_ID_RE = re.compile(r'^[a-z0-9_]+$')
+
+
+class Teacher:
+
+    __slots__ = ('id', 'name', 'description', 'system_prompt', 'tier', 'listed')
+
+    def __init__(self, id, name, description, system_prompt, tier, listed=True):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.system_prompt = system_prompt
+        self.tier = tier
+        self.listed = listed
+
+    def public(self):
+        """What the browser may see: everything but the system prompt"""
+        return {'name': self.name, 'description': self.description, 'tier': self.tier}
+
+    def __repr__(self):
+        return f"Teacher({self.id!r}, tier={self.tier!r})"
+
+
+def _html_safe_json(value):
+    """json.dumps that is safe inside <script>, like Jinja's tojson filter"""
+    return (json.dumps(value)
+            .replace('<', '\\u003c')
+            .replace('>', '\\u003e')
+            .replace('&', '\\u0026')
+            .replace("'", '\\u0027'))
+
+
+def parse_teachers(data):
+    """Validate the decoded teachers.json and return [Teacher, ...] in file order"""
+    entries = data.get('teachers') if isinstance(data, dict) else None
+    if not isinstance(entries, dict) or not entries:
+        raise ValueError("teachers.json must contain a non-empty 'teachers' object")
+
+    problems = []
+    teachers = []
+    names = set()
+    for teacher_id, entry in entries.items():
+        if not _ID_RE.match(teacher_id):
+            problems.append(f"{teacher_id!r}: ids may only use a-z, 0-9 and _")
+        if not isinstance(entry, dict):
+            problems.append(f"{teacher_id}: must be an object")
+            continue
+        for field in ('name', 'description', 'system_prompt'):
+            if not isinstance(entry.get(field), str) or not entry[field].strip():
+                problems.append(f"{teacher_id}: '{field}' must be a non-empty string")
+        if entry.get('tier') not in TIERS:
+            problems.append(f"{teacher_id}: 'tier' must be one of {', '.join(TIERS)}")
+        if not isinstance(entry.get('listed', True), bool):
+            problems.append(f"{teacher_id}: 'listed' must be true or false")
+        unknown = set(entry) - {'name', 'description', 'system_prompt', 'tier', 'listed'}
+        if unknown:
+            problems.append(f"{teacher_id}: unknown fields {', '.join(sorted(unknown))}")
+        if entry.get('name') in names:
+            problems.append(f"{teacher_id}: duplicate name {entry['name']!r}")
+        names.add(entry.get('name'))
+
+        if not problems:
+            teachers.append(Teacher(teacher_id, entry['name'], entry['description'],
+                                    entry['system_prompt'], entry['tier'], entry.get('listed', True)))
+
+    if problems:
+        raise ValueError("Invalid teachers.json:\n  " + "\n  ".join(problems))
+    return teachers
+
+
+class TeacherSet:
+    """One immutable load of teachers.json, with the lookups precomputed"""
+
+    def __init__(self, teachers, version):
+        self.version = version
+        self.by_id = MappingProxyType({t.id: t for t in teachers})
+        self.by_name = MappingProxyType({t.name: t for t in teachers})
+        # Ids offered in the teacher picker and accepted by /ask
+        self.listed = MappingProxyType({t.id: t for t in teachers if t.listed})
+
+        free = {t.id: MappingProxyType(t.public()) for t in teachers if t.listed and t.tier == 'free'}
+        everyone = {t.id: MappingProxyType(t.public()) for t in teachers if t.listed}
+        self._views = {
+            False: MappingProxyType(free),
+            True: MappingProxyType(everyone)
+        }
+        self._views_json = {
+            False: _html_safe_json({key: dict(value) for key, value in free.items()}),
+            True: _html_safe_json({key: dict(value) for key, value in everyone.items()})
+        }
+
+    def view(self, is_premium):
+        """Frozen {id: public fields} of the teachers this tier can pick"""
+        return self._views[bool(is_premium)]
+
+    def view_json(self, is_premium):
+        return self._views_json[bool(is_premium)]
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return TeacherSet(parse_teachers(data), version=os.stat(path).st_mtime_ns)
+
+
+class TeacherRegistry:
+
+    def __init__(self, path=DEFAULT_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._current = None
+        self._seen_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The live TeacherSet, reloading first if the file has changed.
+
+        The first call loads the file and raises if it is invalid.
+        """
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = load(self.path)
+                    self._seen_mtime = self._current.version
+                    self._checked_at = time.monotonic()
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self._maybe_reload()
+        return self._current
+
+    def _maybe_reload(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                print(f"Cannot stat {self.path}, keeping current teachers: {str(e)}")
+                return
+            if mtime == self._seen_mtime:
+                return
+            # Don't retry the same broken file on every check
+            self._seen_mtime = mtime
+            try:
+                self._current = load(self.path)
+                print(f"Reloaded {len(self._current)} teachers from {self.path}")
+            except (OSError, ValueError) as e:
+                print(f"Ignoring changed {self.path}, keeping current teachers: {str(e)}")
+        finally:
+            self._lock.release()
@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """spiritual_app, imported once with Supabase and Anthropic pointed at the benchmark stubs.
+
+    Yields the module; its `stub_db` attribute is the running Supabase stub.
+    Skipped where the app's dependencies aren't installed.
+    """
+    for name in ('flask', 'supabase', 'anthropic', 'requests'):
+        pytest.importorskip(name)
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    from stub_llm import start_stub_llm
+    from stub_supabase import start_stub_supabase
+
+    state = tmp_path_factory.mktemp('app')
+    db = start_stub_supabase(latency=0.0, users=4, posts=6)
+    llm = start_stub_llm(latency=0.0)
+    env = {
+        'ANTHROPIC_API_KEY': 'stub-key',
+        'ANTHROPIC_BASE_URL': f"http://127.0.0.1:{llm.server_port}",
+        'SUPABASE_URL': f"http://127.0.0.1:{db.server_port}",
+        'SUPABASE_KEY': 'stub.stub.stub',
+        'FLASK_SECRET_KEY': 'test-secret-key',
+        'JOB_WORKER_IN_PROCESS': '0',
+        'JOB_QUEUE': f"sqlite:///{state}/jobs.db",
+        'MAGIC_TOKEN_STORE': f"sqlite:///{state}/magic_tokens.db",
+        'SESSION_STORE': f"sqlite:///{state}/sessions.db",
+        'ENTITLEMENT_REVOCATIONS': f"sqlite:///{state}/entitlements.db",
+        'CONVERSATION_STORE': f"sqlite:///{state}/conversations.db",
+        'RATE_LIMIT_BACKEND': 'memory',
+        'ANSWER_CACHE_SEED': str(state / 'answer_seed.json'),
+        'ASSET_DIST_DIR': str(state / 'dist'),
+        'BLOG_SNAPSHOT_DIR': str(state / 'blog_snapshot'),
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        module = importlib.import_module('spiritual_app')
+        module.app.config['TESTING'] = True
+        module.stub_db = db
+        yield module
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        db.shutdown()
+        llm.shutdown()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
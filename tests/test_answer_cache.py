@@ -0,0 +1,71 @@
+import time
+
+from answer_cache import AnswerCache, normalize_question
+
+
+def test_questions_are_normalized():
+    assert normalize_question('  How can I find   inner PEACE?! ') == 'how can i find inner peace'
+    assert normalize_question(None) == ''
+
+
+def test_answers_are_served_once_every_variant_is_filled():
+    cache = AnswerCache(variants=2)
+    assert cache.get('buddha', 'What is peace?') is None
+    cache.put('buddha', 'What is peace?', 'first')
+    # One variant isn't enough yet, so the next asker gets a fresh answer
+    assert cache.get('buddha', 'what is peace') is None
+    cache.put('buddha', 'what is peace', 'second')
+
+    assert cache.get('buddha', 'What is PEACE') in ('first', 'second')
+    assert cache.get('alan_watts', 'What is peace?') is None
+    assert cache.stats()['hits'] == 1
+
+
+def test_near_duplicates_match_by_similarity():
+    cache = AnswerCache(variants=1, min_similarity=0.8)
+    cache.put('buddha', 'How can I find inner peace', 'answer')
+    assert cache.get('buddha', 'How do I find inner peace') is None
+    assert cache.get('buddha', 'How can I find inner peace today') == 'answer'
+    assert cache.stats()['similar_hits'] == 1
+
+    exact_only = AnswerCache(variants=1, min_similarity=0)
+    exact_only.put('buddha', 'How can I find inner peace', 'answer')
+    assert exact_only.get('buddha', 'How can I find inner peace today') is None
+
+
+def test_entries_expire_and_are_evicted():
+    cache = AnswerCache(maxsize=2, ttl=0.05, variants=1)
+    cache.put('buddha', 'one', 'a')
+    time.sleep(0.06)
+    assert cache.get('buddha', 'one') is None
+
+    cache = AnswerCache(maxsize=2, variants=1)
+    for question in ('one', 'two', 'three'):
+        cache.put('buddha', question, question)
+    assert len(cache) == 2
+    assert cache.get('buddha', 'one') is None
+    assert cache.get('buddha', 'three') == 'three'
+
+
+def llm_requests(app_module):
+    return app_module.llm_usage_totals['requests']
+
+
+def test_repeated_opening_question_skips_the_llm(app_module, monkeypatch):
+    # The stub LLM always gives the same text, so one variant has to do
+    monkeypatch.setattr(app_module.answer_cache, 'variants', 1)
+    question = {'question': 'What does the answer cache test ask?', 'teacher': 'eckhart_tolle'}
+
+    first = app_module.app.test_client().post('/ask', json=question)
+    assert first.status_code == 200
+    before = llm_requests(app_module)
+
+    second = app_module.app.test_client().post('/ask', json=question)
+    assert second.get_json()['response'] == first.get_json()['response']
+    assert llm_requests(app_module) == before
+
+    # A follow-up depends on the conversation so far, so it is never shared
+    client = app_module.app.test_client()
+    conversation_id = client.post('/ask', json=question).get_json()['conversation_id']
+    client.post('/ask', json=dict(question, conversation_id=conversation_id))
+    assert llm_requests(app_module) == before + 1
@@ -0,0 +1,74 @@
+import gzip
+import os
+
+import assets
+
+
+def source_tree(tmp_path, css='body {\n  color: red;\n}\n'):
+    source = tmp_path / 'static'
+    (source / 'css').mkdir(parents=True, exist_ok=True)
+    (source / 'js').mkdir(exist_ok=True)
+    (source / 'css' / 'site.css').write_text(css)
+    (source / 'js' / 'site.js').write_text('// setup\nfunction hi() {\n    return `a\n  b`;\n}\n')
+    (source / 'notes.txt').write_text('not an asset')
+    return str(source), str(source / 'dist')
+
+
+def test_minifiers_keep_strings_and_template_literals():
+    css = '/* theme */\na::after {\n  content: "  {  ";\n  margin: 0 ;\n}\n'
+    assert assets.minify_css(css) == 'a::after{content:"  {  ";margin:0}'
+    assert assets.minify_js('// note\nconst x = `\n    kept\n`;\n\n  go();\n') == 'const x = `\n    kept\n`;\ngo();'
+
+
+def test_fingerprint_is_stable_and_follows_content(tmp_path):
+    source, dist = source_tree(tmp_path)
+    first = assets.build(source, dist)
+    assert sorted(first) == ['css/site.css', 'js/site.js']
+    assert first['css/site.css'].startswith('css/site.') and first['css/site.css'].endswith('.css')
+
+    # Rebuilding unchanged sources, even with other whitespace, gives the same names
+    assert assets.build(source, dist) == first
+    source_tree(tmp_path, css='body{color: red}')
+    assert assets.build(source, dist) == first
+    assert assets.load_manifest(dist) == first
+
+    source_tree(tmp_path, css='body { color: blue; }')
+    changed = assets.build(source, dist)
+    assert changed['css/site.css'] != first['css/site.css']
+    assert changed['js/site.js'] == first['js/site.js']
+    # The previous build stays on disk for pages that still link it
+    assert os.path.exists(os.path.join(dist, first['css/site.css']))
+
+
+def test_precompressed_copy_matches_the_build(tmp_path):
+    source, dist = source_tree(tmp_path)
+    built = os.path.join(dist, assets.build(source, dist)['css/site.css'])
+    with open(built, 'rb') as plain, gzip.open(f"{built}.gz") as compressed:
+        assert compressed.read() == plain.read()
+    assert assets.load_manifest(str(tmp_path / 'missing')) == {}
+
+
+def test_built_assets_are_served_precompressed_and_cached_forever(app_module, client):
+    built = app_module.asset_manifest['css/index.css']
+    with app_module.app.test_request_context():
+        assert app_module.asset_url('css/index.css') == f"/assets/{built}"
+
+    plain = client.get(f"/assets/{built}", headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    zipped = client.get(f"/assets/{built}", headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.mimetype == 'text/css'
+    assert gzip.decompress(zipped.data) == plain.data
+    plain.close()
+    zipped.close()
+
+
+def test_previous_build_falls_back_to_the_current_one(client):
+    stale = client.get('/assets/css/index.000000000000.css')
+    assert stale.status_code == 200
+    assert stale.headers['Cache-Control'] == 'public, no-cache'
+    stale.close()
+    assert client.get('/assets/css/missing.000000000000.css').status_code == 404
@@ -0,0 +1,110 @@
+import itertools
+from types import SimpleNamespace
+
+import batch_generate
+from batch_generate import Checkpoint, run_batch
+
+
+def message(text):
+    return SimpleNamespace(content=[SimpleNamespace(type='text', text=text)],
+                           usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+
+def requests_for(*custom_ids):
+    return [{'custom_id': custom_id, 'params': {'prompt': custom_id}} for custom_id in custom_ids]
+
+
+class FakeBatches:
+    """messages.batches that ends each batch after one poll; ids in `fail` come back errored"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.submitted = {}
+        self.retrieves = 0
+        self._ids = itertools.count(1)
+
+    def create(self, requests):
+        batch_id = f"batch-{next(self._ids)}"
+        self.submitted[batch_id] = [r['custom_id'] for r in requests]
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id):
+        self.retrieves += 1
+        status = 'ended' if self.retrieves % 2 == 0 else 'in_progress'
+        return SimpleNamespace(id=batch_id, processing_status=status,
+                               request_counts=SimpleNamespace(succeeded=0, processing=1))
+
+    def results(self, batch_id):
+        for custom_id in self.submitted[batch_id]:
+            if custom_id in self.fail:
+                result = SimpleNamespace(type='errored', error='overloaded')
+            else:
+                result = SimpleNamespace(type='succeeded', message=message(f"answer {custom_id}"))
+            yield SimpleNamespace(custom_id=custom_id, result=result)
+
+
+def fake_client(batches=None, create=None):
+    return SimpleNamespace(messages=SimpleNamespace(batches=batches, create=create))
+
+
+def test_batch_results_are_checkpointed_and_errors_retried(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    batches = FakeBatches(fail={'b'})
+    usage = []
+
+    results = run_batch(fake_client(batches), requests_for('a', 'b'), Checkpoint(path),
+                        poll_interval=0, on_usage=lambda custom_id, _: usage.append(custom_id))
+    assert results == {'a': 'answer a'}
+    assert usage == ['a']
+
+    saved = Checkpoint(path)
+    assert saved.batch_id is None
+    assert saved.results == {'a': 'answer a'}
+    assert 'overloaded' in saved.errors['b']
+
+    # The second run only submits what is still missing
+    batches.fail.clear()
+    results = run_batch(fake_client(batches), requests_for('a', 'b'), Checkpoint(path), poll_interval=0)
+    assert results == {'a': 'answer a', 'b': 'answer b'}
+    assert batches.submitted['batch-2'] == ['b']
+    assert Checkpoint(path).errors == {}
+
+
+def test_interrupted_batch_is_resumed_not_resubmitted(tmp_path, monkeypatch):
+    path = str(tmp_path / 'checkpoint.json')
+    batches = FakeBatches()
+
+    def interrupted(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch_generate, '_collect_batch', interrupted)
+    try:
+        run_batch(fake_client(batches), requests_for('a', 'b'), Checkpoint(path), poll_interval=0)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.undo()
+    assert Checkpoint(path).batch_id == 'batch-1'
+
+    results = run_batch(fake_client(batches), requests_for('a', 'b'), Checkpoint(path), poll_interval=0)
+    assert results == {'a': 'answer a', 'b': 'answer b'}
+    assert list(batches.submitted) == ['batch-1']
+
+
+def test_falls_back_to_local_calls_without_batches(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+
+    def create(prompt):
+        if prompt == 'bad':
+            raise RuntimeError('connection reset')
+        return message(prompt.upper())
+
+    results = run_batch(fake_client(create=create), requests_for('ok', 'bad'), Checkpoint(path), max_workers=2)
+    assert results == {'ok': 'OK'}
+    assert Checkpoint(path).errors == {'bad': 'connection reset'}
+
+    # use_batches=False skips the batches API even when the client has one
+    batches = FakeBatches()
+    results = run_batch(fake_client(batches, create), requests_for('ok', 'fine'), Checkpoint(path),
+                        use_batches=False)
+    assert results == {'ok': 'OK', 'fine': 'FINE'}
+    assert batches.submitted == {}
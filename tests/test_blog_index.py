@@ -0,0 +1,66 @@
+from blog_index import BlogIndex
+
+
+def post(post_id, slug, **fields):
+    return dict({'id': post_id, 'slug': slug, 'title': slug.title(), 'published': True}, **fields)
+
+
+def test_posts_are_found_by_slug_or_id():
+    index = BlogIndex()
+    assert index.is_stale(60)
+    index.load([post(1, 'first'), post(2, 'second')])
+    assert not index.is_stale(60)
+
+    assert index.get('second')['id'] == 2
+    assert index.get(1)['slug'] == 'first'
+    assert index.get('third') is None
+    assert len(index) == 2
+
+
+def test_upsert_moves_a_changed_slug_and_remove_drops_both_keys():
+    index = BlogIndex()
+    index.load([post(1, 'old-slug')])
+    index.upsert(post(1, 'new-slug'))
+    assert index.get('old-slug') is None
+    assert index.get('new-slug')['id'] == 1
+
+    assert index.remove('1')['slug'] == 'new-slug'
+    assert index.get('new-slug') is None and index.get('1') is None
+    assert index.remove('1') is None
+
+
+def blog_reads(app_module):
+    return app_module.stub_db.RequestHandlerClass.reads['blog_posts']
+
+
+def test_single_post_by_slug_or_id_from_the_index(app_module, client):
+    client.get('/api/blog/posts/reflection-2')
+    before = blog_reads(app_module)
+
+    by_slug = client.get('/api/blog/posts/reflection-2')
+    by_id = client.get('/api/blog/posts/2')
+    assert by_slug.status_code == by_id.status_code == 200
+    assert by_slug.get_json()['post']['id'] == by_id.get_json()['post']['id'] == 2
+    assert blog_reads(app_module) == before
+
+    assert client.get('/api/blog/posts/2', headers={'If-None-Match': by_id.headers['ETag']}).status_code == 304
+
+
+def test_drafts_and_unknown_posts_are_not_found(app_module, client):
+    # Post 1 is a draft in the stub's seed data
+    assert client.get('/api/blog/posts/reflection-1').status_code == 404
+    assert client.get('/api/blog/posts/no-such-post').status_code == 404
+    assert client.get('/blog/no-such-post').status_code == 404
+
+
+def test_edit_clears_the_rendered_page(app_module, client):
+    original = client.get('/api/blog/posts/reflection-3').get_json()['post']
+    assert original['title'].encode() in client.get('/blog/reflection-3').data
+    assert app_module.blog_render_cache.peek('reflection-3') is not None
+
+    edit = {key: original[key] for key in ('title', 'slug', 'content', 'excerpt', 'cover_image', 'published')}
+    try:
+        client.put('/api/blog/posts/3', json=dict(edit, title='Reflection Three, Revised'))
+        assert b'Reflection Three, Revised' in client.get('/blog/reflection-3').data
+    finally:
+        client.put('/api/blog/posts/3', json=edit)
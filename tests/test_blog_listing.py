@@ -0,0 +1,58 @@
+"""GET /api/blog/posts against the Supabase stub, which seeds published posts 2-5 and drafts 1 and 6."""
+import pytest
+
+
+@pytest.fixture
+def blog(app_module):
+    app_module.blog_list_cache.clear()
+    return app_module
+
+
+def listing(client, query='', headers=None):
+    return client.get(f"/api/blog/posts?published=true{query}", headers=headers or {})
+
+
+def test_pages_newest_first_without_bodies(blog, client):
+    pages, offset = [], 0
+    while offset is not None:
+        body = listing(client, f"&limit=2&offset={offset}").get_json()
+        pages.append([post['id'] for post in body['posts']])
+        assert all('content' not in post for post in body['posts'])
+        offset = body['next_offset']
+    assert pages == [[5, 4], [3, 2]]
+
+
+def test_editor_can_ask_for_bodies_and_drafts(blog, client):
+    posts = client.get('/api/blog/posts?include=content&limit=100').get_json()['posts']
+    assert {post['id'] for post in posts} >= {1, 2, 3, 4, 5, 6}
+    assert all(post['content'] for post in posts)
+
+
+def test_bad_paging_arguments_are_rejected(blog, client):
+    assert listing(client, '&limit=ten').status_code == 400
+
+
+def test_revalidation_answers_304(blog, client):
+    response = listing(client, '&limit=2')
+    assert response.status_code == 200
+    # The newest edit on the page
+    assert response.headers['Last-Modified'] == 'Sun, 05 Jan 2025 00:00:00 GMT'
+
+    again = listing(client, '&limit=2', {'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_write_clears_the_cached_pages(blog, client):
+    before = listing(client, '&limit=2')
+    assert listing(client, '&limit=2').get_json() == before.get_json()
+    assert blog.blog_list_cache.stats()['hits'] >= 1
+
+    created = client.post('/api/blog/posts', json={
+        'title': 'Fresh', 'slug': 'fresh-listing-test', 'content': 'Body', 'excerpt': 'Ex', 'published': True
+    }).get_json()['post']
+    try:
+        after = listing(client, '&limit=2', {'If-None-Match': before.headers['ETag']})
+        assert after.status_code == 200
+        assert after.get_json()['posts'][0]['slug'] == 'fresh-listing-test'
+    finally:
+        client.delete(f"/api/blog/posts/{created['id']}")
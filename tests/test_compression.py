@@ -0,0 +1,82 @@
+import gzip
+from types import SimpleNamespace
+
+import pytest
+
+import compression
+
+werkzeug = pytest.importorskip('werkzeug.wrappers')
+
+BODY = b'{"posts": [' + b'"peace", ' * 200 + b'"end"]}'
+
+
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    """brotli isn't a hard dependency; stand in a recognisable one"""
+    monkeypatch.setattr(compression, 'brotli', SimpleNamespace(compress=lambda body, quality: b'br:' + body[:10]))
+
+
+def json_response(body=BODY, **kwargs):
+    return werkzeug.Response(body, mimetype='application/json', **kwargs)
+
+
+def test_encoding_negotiation(fake_brotli, monkeypatch):
+    assert compression.choose_encoding('gzip, deflate, br') == 'br'
+    assert compression.choose_encoding('GZIP;q=0.8') == 'gzip'
+    assert compression.choose_encoding('deflate') is None
+    assert compression.choose_encoding(None) is None
+
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert compression.choose_encoding('gzip, br') == 'gzip'
+
+
+def test_gzip_response_keeps_a_weak_etag():
+    response = json_response()
+    response.set_etag('abc')
+    compression.ResponseCompressor().compress(response, 'gzip')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == BODY
+    assert response.get_etag() == ('abc', True)
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_brotli_is_preferred_and_cached_by_etag(fake_brotli):
+    compressor = compression.ResponseCompressor()
+    for _ in range(2):
+        response = json_response()
+        response.set_etag('abc')
+        compressor.compress(response, 'gzip, br')
+        assert response.headers['Content-Encoding'] == 'br'
+        assert response.get_data() == b'br:' + BODY[:10]
+    assert compressor.stats()['hits'] == 1
+
+
+def test_responses_that_are_left_alone():
+    compressor = compression.ResponseCompressor(min_size=500)
+    cases = [
+        json_response(b'{"small": true}'),
+        json_response(status=404),
+        werkzeug.Response(BODY, mimetype='image/png'),
+        json_response(headers={'Cache-Control': 'no-transform'}),
+        json_response(headers={'Content-Encoding': 'identity'}),
+    ]
+    for response in cases:
+        body = response.get_data()
+        compressor.compress(response, 'gzip')
+        assert response.get_data() == body
+        assert response.headers.get('Content-Encoding') != 'gzip'
+
+    stream = werkzeug.Response(iter([BODY]), mimetype='application/json')
+    compressor.compress(stream, 'gzip')
+    assert 'Content-Encoding' not in stream.headers
+
+    response = json_response()
+    compressor.compress(response, None)
+    assert response.get_data() == BODY and 'Accept-Encoding' in response.vary
+
+
+def test_app_compresses_json_it_serves(client):
+    response = client.get('/api/blog/posts?include=content&limit=100', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).startswith(b'{')
@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+import conversation_store
+from history_compactor import HistoryCompactor
+
+
+def make_compactor(calls):
+    def summarize(previous_summary, turns):
+        calls.append(list(turns))
+        return ((previous_summary or '') + ''.join(f"[{question}]" for question, answer in turns))
+    return HistoryCompactor(summarize, budget_tokens=200, keep_recent_turns=2)
+
+
+def long_turn(index):
+    return (f"q{index}", 'x' * 200)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return conversation_store.create_store('memory')
+    return conversation_store.create_store(f"sqlite:///{tmp_path / 'conversations.db'}")
+
+
+def test_fold_removes_exactly_the_summarized_turns(store):
+    conversation_id = store.create('buddha', 'user-1')
+    for index in range(4):
+        store.append(conversation_id, *long_turn(index))
+
+    conversation = store.get(conversation_id)
+    assert conversation['first_seq'] == 1
+    assert store.fold(conversation_id, conversation['first_seq'] + 1, 'S', None)
+    # Appended after compaction read the conversation; must survive the fold
+    store.append(conversation_id, *long_turn(4))
+
+    conversation = store.get(conversation_id)
+    assert [question for question, answer in conversation['turns']] == ['q2', 'q3', 'q4']
+    assert conversation['first_seq'] == 3
+    assert conversation['summary'] == 'S'
+
+
+def test_overlapping_compactions_fold_once(store):
+    calls = []
+    compactor = make_compactor(calls)
+    conversation_id = store.create('buddha', 'user-1')
+    for index in range(6):
+        store.append(conversation_id, *long_turn(index))
+
+    # Two follow-ups in quick succession: both compactions read the same state
+    first = store.get(conversation_id)
+    second = store.get(conversation_id)
+    store.append(conversation_id, *long_turn(6))
+
+    results = []
+    for conversation in (first, second):
+        count, summary = compactor.compact(conversation['turns'], conversation['summary'])
+        results.append(store.fold(conversation_id, conversation['first_seq'] + count - 1,
+                                  summary, conversation['summary']))
+    assert results == [True, False]
+
+    conversation = store.get(conversation_id)
+    folded = len(calls[0])
+    assert conversation['summary'] == ''.join(f"[q{index}]" for index in range(folded))
+    assert [question for question, answer in conversation['turns']] == [f"q{index}" for index in range(folded, 7)]
+
+
+def test_turn_cap_advances_first_seq(tmp_path):
+    for store in (conversation_store.create_store('memory', max_turns=3),
+                  conversation_store.create_store(f"sqlite:///{tmp_path / 'capped.db'}", max_turns=3)):
+        conversation_id = store.create('buddha', 'user-1')
+        for index in range(5):
+            store.append(conversation_id, *long_turn(index))
+        conversation = store.get(conversation_id)
+        assert conversation['first_seq'] == 3
+        assert store.fold(conversation_id, 3, 'S', None)
+        assert [question for question, answer in store.get(conversation_id)['turns']] == ['q3', 'q4']
+
+
+def test_load_checks_owner_and_teacher(store):
+    conversation_id = store.create('buddha', 'user-1')
+    store.append(conversation_id, *long_turn(0))
+
+    conversation = store.load(conversation_id, 'user-1', 'buddha')
+    assert [question for question, answer in conversation['turns']] == ['q0']
+    assert store.load(conversation_id, 'user-2', 'buddha') is None
+    assert store.load(conversation_id, 'user-1', 'alan_watts') is None
+    assert store.load(conversation_id, None, 'buddha') is None
+    assert store.load('missing', 'user-1', 'buddha') is None
+
+
+def test_sqlite_store_adds_owner_column_to_old_databases(tmp_path):
+    path = tmp_path / 'old.db'
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute('CREATE TABLE conversations (id TEXT PRIMARY KEY, teacher_id TEXT NOT NULL, '
+                     'summary TEXT, updated_at REAL NOT NULL)')
+        conn.execute("INSERT INTO conversations VALUES ('old', 'buddha', NULL, ?)", (time.time(),))
+        conn.commit()
+
+    store = conversation_store.create_store(f"sqlite:///{path}")
+    # Rows from before owners were recorded belong to nobody
+    assert store.load('old', 'user-1', 'buddha') is None
+    conversation_id = store.create('buddha', 'user-1')
+    assert store.load(conversation_id, 'user-1', 'buddha')['owner_id'] == 'user-1'
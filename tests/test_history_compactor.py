@@ -0,0 +1,44 @@
+from history_compactor import HistoryCompactor, extractive_summary
+
+
+def make_compactor(calls):
+    def summarize(previous_summary, turns):
+        calls.append(list(turns))
+        return ((previous_summary or '') + ''.join(f"[{question}]" for question, answer in turns))
+    return HistoryCompactor(summarize, budget_tokens=200, keep_recent_turns=2)
+
+
+def long_turn(index):
+    return (f"q{index}", 'x' * 200)
+
+
+def test_compact_under_budget_folds_nothing():
+    calls = []
+    compactor = make_compactor(calls)
+    assert compactor.compact([('hi', 'hello')], None) == (0, None)
+    assert calls == []
+
+
+def test_compact_keeps_recent_turns_and_caches_summaries():
+    calls = []
+    compactor = make_compactor(calls)
+    turns = [long_turn(index) for index in range(6)]
+
+    count, summary = compactor.compact(turns, None)
+    assert 1 <= count <= 4
+    assert summary == ''.join(f"[q{index}]" for index in range(count))
+    assert compactor.compact(turns, None) == (count, summary)
+    assert len(calls) == 1
+
+
+def test_fit_keeps_latest_turn():
+    compactor = make_compactor([])
+    turns = [long_turn(index) for index in range(6)]
+    kept = compactor.fit(turns)
+    assert kept[-1] == turns[-1]
+    assert compactor.history_tokens(kept) <= compactor.budget_tokens or len(kept) == 1
+
+
+def test_extractive_summary_appends_first_sentences():
+    summary = extractive_summary('- earlier', [('Why? Tell me.', 'Because. More text.')])
+    assert summary == '- earlier\n- Asked: Why? Tell me. Answered: Because.'
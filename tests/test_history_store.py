@@ -0,0 +1,147 @@
+"""Keyset paging of history and favorites, against the Supabase stub."""
+import json
+import sys
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlencode
+
+import pytest
+
+import history_store
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+from stub_supabase import start_stub_supabase  # noqa: E402
+
+USER = 'user-1'
+OTHER_USER = 'user-2'
+# As in spiritual_app.py
+HISTORY_LIST_COLUMNS = 'id, teacher_name, question, preview, truncated, created_at'
+
+
+class Query:
+    """The few postgrest-py builder calls the endpoints make, as query parameters"""
+
+    def __init__(self, table):
+        self.table = table
+        self.params = []
+
+    def select(self, columns):
+        self.params.append(('select', columns))
+        return self
+
+    def eq(self, column, value):
+        self.params.append((column, f"eq.{value}"))
+        return self
+
+    def in_(self, column, values):
+        self.params.append((column, f"in.({','.join(values)})"))
+        return self
+
+    def or_(self, filters):
+        self.params.append(('or', f"({filters})"))
+        return self
+
+    def order(self, column, desc=False):
+        self.params.append(('order', f"{column}.desc" if desc else column))
+        return self
+
+    def limit(self, count):
+        self.params.append(('limit', str(count)))
+        return self
+
+
+@pytest.fixture
+def supabase():
+    server = start_stub_supabase(users=0, posts=0)
+    yield server
+    server.shutdown()
+
+
+def execute(server, query):
+    url = f"http://127.0.0.1:{server.server_port}/rest/v1/{query.table}?{urlencode(query.params)}"
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def seed(server, table, rows):
+    server.RequestHandlerClass.tables[table].extend(rows)
+
+
+def history_row(entry_id, created_at, user_id=USER):
+    return {'id': entry_id, 'user_id': user_id, 'teacher_name': 'Buddha', 'question': f"q-{entry_id}",
+            'preview': 'p', 'truncated': False, 'created_at': created_at}
+
+
+def all_pages(server, make_query, limit, id_column='id'):
+    """Follow next_cursor from the first page to the last, through an encoded cursor"""
+    pages, cursor = [], None
+    while True:
+        query = make_query().limit(limit + 1)
+        if cursor:
+            query = history_store.after_cursor(query, history_store.decode_cursor(cursor), id_column=id_column)
+        rows, cursor = history_store.page(execute(server, query), limit, id_column=id_column)
+        pages.append([row[id_column] for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = history_store.encode_cursor('2025-01-01T10:00:00.123456+00:00', 'a1b2')
+    assert '=' not in cursor
+    assert history_store.decode_cursor(cursor) == ('2025-01-01T10:00:00.123456+00:00', 'a1b2')
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'e30', history_store.encode_cursor(1, 'a')[:-2], 'WzEsMl0'])
+def test_malformed_cursor_is_rejected(cursor):
+    assert history_store.decode_cursor(cursor) is None
+
+
+def test_page_splits_off_the_extra_row():
+    rows = [history_row(entry_id, f"2025-01-0{day}") for entry_id, day in (('c', 3), ('b', 2), ('a', 1))]
+    assert history_store.page(rows[:2], 2) == (rows[:2], None)
+    page, cursor = history_store.page(rows, 2)
+    assert page == rows[:2]
+    assert history_store.decode_cursor(cursor) == ('2025-01-02', 'b')
+
+
+def test_history_pages_break_ties_on_id(supabase):
+    # Batched inserts share a timestamp, so several rows tie on created_at
+    same = '2025-01-01T10:00:00+00:00'
+    rows = [history_row('e', '2025-01-02T09:00:00+00:00'), history_row('a', same), history_row('d', same),
+            history_row('b', same), history_row('c', same), history_row('f', '2024-12-31T23:00:00+00:00'),
+            history_row('z', same, user_id=OTHER_USER)]
+    seed(supabase, 'conversation_history', rows)
+
+    def make_query():
+        return (Query('conversation_history').select(HISTORY_LIST_COLUMNS)
+                .eq('user_id', USER).order('created_at', desc=True).order('id', desc=True))
+
+    pages = all_pages(supabase, make_query, limit=2)
+    assert pages == [['e', 'd'], ['c', 'b'], ['a', 'f']]
+
+
+def test_favorites_page_in_saved_order(supabase):
+    same = '2025-01-03T08:00:00+00:00'
+    seed(supabase, 'conversation_history', [history_row(entry_id, '2025-01-01T00:00:00+00:00')
+                                            for entry_id in ('h1', 'h2', 'h3', 'h4')])
+    seed(supabase, 'conversation_history', [history_row('h9', '2025-01-01T00:00:00+00:00', user_id=OTHER_USER)])
+    seed(supabase, 'favorites', [
+        {'user_id': USER, 'entry_id': 'h1', 'created_at': '2025-01-02T00:00:00+00:00'},
+        {'user_id': USER, 'entry_id': 'h3', 'created_at': same},
+        {'user_id': USER, 'entry_id': 'h4', 'created_at': same},
+        {'user_id': USER, 'entry_id': 'h2', 'created_at': '2025-01-04T00:00:00+00:00'},
+        # Someone else's favorite of their own entry
+        {'user_id': OTHER_USER, 'entry_id': 'h9', 'created_at': same},
+    ])
+
+    def make_query():
+        return (Query('favorites').select('entry_id, created_at')
+                .eq('user_id', USER).order('created_at', desc=True).order('entry_id', desc=True))
+
+    pages = all_pages(supabase, make_query, limit=3, id_column='entry_id')
+    assert pages == [['h2', 'h4', 'h3'], ['h1']]
+
+    # The entries behind a page come back in one `in.` lookup, still scoped to the user
+    entries = execute(supabase, Query('conversation_history').select(HISTORY_LIST_COLUMNS)
+                      .eq('user_id', USER).in_('id', pages[0] + ['h9']))
+    assert sorted(entry['id'] for entry in entries) == ['h2', 'h3', 'h4']
@@ -0,0 +1,69 @@
+import pytest
+
+import metrics
+
+
+def test_counter_renders_one_sample_per_label_set():
+    registry = metrics.Registry()
+    tokens = registry.counter('tokens_total', 'Tokens used', ['type'])
+    tokens.inc(10, type='input')
+    tokens.inc(5, type='input')
+    tokens.inc(2.5, type='output')
+
+    assert registry.render().splitlines() == [
+        '# HELP tokens_total Tokens used',
+        '# TYPE tokens_total counter',
+        'tokens_total{type="input"} 15',
+        'tokens_total{type="output"} 2.5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    latency = registry.histogram('request_seconds', 'Time per request', ['route'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        latency.observe(value, route='/ask')
+
+    lines = registry.render().splitlines()
+    assert 'request_seconds_bucket{route="/ask",le="0.1"} 1' in lines
+    assert 'request_seconds_bucket{route="/ask",le="1"} 3' in lines
+    assert 'request_seconds_bucket{route="/ask",le="+Inf"} 4' in lines
+    assert 'request_seconds_sum{route="/ask"} 4.25' in lines
+    assert 'request_seconds_count{route="/ask"} 4' in lines
+
+
+def test_labels_must_match_and_values_are_escaped():
+    registry = metrics.Registry()
+    counter = registry.counter('errors_total', 'Errors', ['reason'])
+    with pytest.raises(ValueError):
+        counter.inc(route='/ask')
+    counter.inc(reason='said "no"\nthen left')
+    assert 'errors_total{reason="said \\"no\\"\\nthen left"} 1' in registry.render()
+
+
+def test_failing_collector_is_skipped():
+    registry = metrics.Registry()
+
+    @registry.add_collector
+    def broken():
+        raise RuntimeError('store is down')
+
+    @registry.add_collector
+    def queue_sizes():
+        yield ('jobs', 'gauge', 'Jobs by status', [({'status': 'pending'}, 3)])
+
+    assert registry.render().splitlines() == [
+        '# HELP jobs Jobs by status',
+        '# TYPE jobs gauge',
+        'jobs{status="pending"} 3',
+    ]
+
+
+def test_app_serves_request_and_stage_timings(client):
+    client.get('/api/blog/posts?published=true')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert '# TYPE soulcompass_request_duration_seconds histogram' in body
+    assert 'soulcompass_stage_duration_seconds_count{stage="supabase",route="/api/blog/posts"}' in body
@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from ttl_cache import TTLCache
+
+# Seeded by the Supabase stub: even-numbered users are premium
+FREE_USER = str(uuid.UUID(int=2))
+UPGRADING_USER = str(uuid.UUID(int=4))
+
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=10)
+    assert cache.get('a') == 1
+
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.invalidate('a')
+    cache.invalidate('missing')
+    assert cache.peek('a') is None and cache.keys() == ['b']
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()['invalidations'] == 2
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+def profile_reads(app_module):
+    return app_module.stub_db.RequestHandlerClass.reads['user_profiles']
+
+
+def test_profile_is_read_once_then_served_from_cache(app_module, client):
+    login(client, FREE_USER)
+    app_module.profile_cache.invalidate(FREE_USER)
+    before = profile_reads(app_module)
+
+    for _ in range(3):
+        assert client.get('/history').status_code == 200
+    assert profile_reads(app_module) == before + 1
+    assert app_module.profile_cache.peek(FREE_USER)['user_id'] == FREE_USER
+
+
+def test_profile_update_invalidates_the_cached_copy(app_module, client):
+    login(client, UPGRADING_USER)
+    client.get('/history')
+    assert not app_module.profile_cache.peek(UPGRADING_USER)['is_premium']
+
+    response = client.post('/verify_premium', json={'code': app_module.PREMIUM_ACCESS_CODE})
+    assert response.status_code == 200
+    # Re-read after the write, not left stale for the cache's TTL
+    assert app_module.profile_cache.peek(UPGRADING_USER)['is_premium']
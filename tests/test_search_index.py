@@ -0,0 +1,45 @@
+from search_index import SearchIndex
+
+
+def make_post(post_id, title, content, published=True):
+    return {'id': post_id, 'slug': f"post-{post_id}", 'title': title, 'excerpt': None,
+            'content': f"<p>{content}</p>", 'published': published, 'created_at': None}
+
+
+def ids(results):
+    return [result['id'] for result in results]
+
+
+def test_prefix_search_with_highlights_hides_drafts():
+    index = SearchIndex()
+    index.load([make_post(1, 'On Meditation', 'sit quietly and breathe'),
+                make_post(2, 'Draft', 'meditation notes <b>&amp;</b> ideas', published=False)])
+
+    results = index.search('medit', published_only=True)
+    assert ids(results) == [1]
+    assert results[0]['title_html'] == 'On <mark>Meditation</mark>'
+    assert 'published' not in results[0]
+    assert ids(index.search('medit')) == [1, 2]
+    assert '&amp;' in index.search('notes')[0]['snippet']
+
+
+def test_writes_show_up_at_once_and_rescore_matches_a_rebuild():
+    posts = {index: make_post(index, f"Reflection {index}", ' '.join(['peace', 'breath', 'stillness'][:index % 3 + 1]))
+             for index in range(1, 30)}
+    index = SearchIndex()
+    index.load(list(posts.values()))
+    for query in ('peace', 'breath still', 'pea'):
+        index.search(query)
+
+    posts[5] = make_post(5, 'Peace peace', 'peace and breath')
+    index.upsert(posts[5])
+    del posts[7]
+    index.remove(7)
+    assert ids(index.search('peace', limit=1)) == [5]
+    assert 7 not in ids(index.search('peace', limit=100))
+
+    index.rescore()
+    rebuilt = SearchIndex()
+    rebuilt.load(list(posts.values()))
+    for query in ('peace', 'breath still', 'pea'):
+        assert index.search(query, limit=100) == rebuilt.search(query, limit=100)
@@ -0,0 +1,115 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import session_store
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return session_store.create_backend('memory')
+    return session_store.create_backend(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+
+@pytest.fixture
+def app(backend):
+    app = flask.Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.session_interface = session_store.ServerSideSessionInterface(backend)
+
+    @app.route('/login/<user_id>')
+    def login(user_id):
+        flask.session['user_id'] = user_id
+        flask.session.regenerate()
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return flask.session.get('user_id', 'nobody')
+
+    @app.route('/logout')
+    def logout():
+        flask.session.clear()
+        return 'ok'
+
+    @app.route('/static-ish')
+    def static_ish():
+        return 'no session here'
+
+    return app
+
+
+def session_cookie(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_backend_round_trip_and_expiry(backend):
+    backend.set('key', '{"a": 1}', ttl=60)
+    data, expires_at = backend.get('key')
+    assert data == '{"a": 1}' and expires_at > 0
+    assert backend.stats()['size'] == 1
+
+    backend.set('old', '{}', ttl=-1)
+    assert backend.get('old') is None
+    backend.delete('key')
+    assert backend.get('key') is None
+
+
+def test_session_survives_requests_and_is_stored_by_hash(app, backend):
+    client = app.test_client()
+    assert client.get('/whoami').data == b'nobody'
+    assert session_cookie(client) is None
+
+    client.get('/login/42')
+    cookie = session_cookie(client)
+    assert client.get('/whoami').data == b'42'
+
+    sid = session_store.Signer(app.secret_key, salt='server-side-session').unsign(cookie).decode('ascii')
+    assert backend.get(sid) is None
+    assert backend.get(session_store.hash_session_id(sid)) is not None
+
+
+def test_login_rotates_the_id_and_logout_deletes_it(app, backend):
+    client = app.test_client()
+    client.get('/login/1')
+    first = session_cookie(client)
+    client.get('/login/2')
+    assert session_cookie(client) != first
+
+    # The old cookie no longer opens a session
+    stale = app.test_client()
+    stale.set_cookie('session', first)
+    assert stale.get('/whoami').data == b'nobody'
+
+    client.get('/logout')
+    assert session_cookie(client) is None
+    assert backend.stats()['size'] == 0
+
+
+def test_untouched_or_forged_sessions_do_not_reach_the_store(app):
+    client = app.test_client()
+    client.get('/login/7')
+    response = client.get('/static-ish')
+    assert 'Set-Cookie' not in response.headers and 'Cookie' not in response.vary
+
+    forged = app.test_client()
+    forged.set_cookie('session', session_cookie(client) + 'x')
+    assert forged.get('/whoami').data == b'nobody'
+
+
+def test_secret_key_is_generated_once_and_shared(tmp_path):
+    path = str(tmp_path / 'keys' / 'secret_key')
+    assert session_store.load_secret_key('configured', path) == 'configured'
+
+    key = session_store.load_secret_key(None, path)
+    assert len(key) == 64
+    # Other workers and later restarts read the same key back
+    assert session_store.load_secret_key('', path) == key
+    assert session_store.load_secret_key(None, path) == key
+
+
+def test_unknown_store_is_rejected():
+    with pytest.raises(ValueError):
+        session_store.create_backend('postgres://localhost/sessions')
@@ -0,0 +1,130 @@
+"""Several worker processes sharing one SQLite file, as under gunicorn."""
+import multiprocessing
+import time
+
+import pytest
+
+import rate_limit
+from job_queue import JobQueue
+from token_store import MagicTokenStore
+
+PROCESSES = 8
+
+
+def _consume(path, token, barrier, results):
+    store = MagicTokenStore(path)
+    barrier.wait()
+    results.put(store.consume(token))
+
+
+def _take(path, attempts, barrier, results):
+    backend = rate_limit.SQLiteBackend(path)
+    barrier.wait()
+    for _ in range(attempts):
+        allowed, retry_after, blocked = backend.take([('ip:1.2.3.4', 10, 3600)])
+        results.put(allowed)
+
+
+def _run(target, args, results_per_process=1):
+    """Run `target(*args, barrier, results)` in PROCESSES processes started together"""
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(PROCESSES)
+    results = context.Queue()
+    processes = [context.Process(target=target, args=args + (barrier, results)) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=30) for _ in range(PROCESSES * results_per_process)]
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    return outcomes
+
+
+def test_magic_token_is_consumed_by_one_process(tmp_path):
+    path = str(tmp_path / 'magic_tokens.db')
+    store = MagicTokenStore(path)
+    token = store.issue('seeker@example.com', 'lifetime')
+
+    outcomes = _run(_consume, (path, token))
+    assert outcomes.count(True) == 1
+    assert store.get(token) is None
+
+
+def test_expired_tokens_are_swept(tmp_path):
+    store = MagicTokenStore(str(tmp_path / 'magic_tokens.db'), ttl=-1)
+    token = store.issue('seeker@example.com', None)
+    assert store.get(token) is not None
+    assert store.sweep() == 1
+    assert store.get(token) is None and not store.consume(token)
+
+
+def test_rate_limit_bucket_is_shared_by_processes(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    rate_limit.SQLiteBackend(path)
+
+    start = time.time()
+    outcomes = _run(_take, (path, 5), results_per_process=5)
+    # 40 attempts against a 10-token bucket that barely refills during the test
+    assert outcomes.count(True) == 10 + int((time.time() - start) * 10 / 3600)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return rate_limit.create_backend('memory')
+    return rate_limit.create_backend(f"sqlite:///{tmp_path / 'ratelimit.db'}")
+
+
+def test_bucket_allows_a_burst_up_to_its_size(backend):
+    bucket = [('ip:1.2.3.4', 5, 60)]
+    outcomes = [backend.take(bucket, now=1000.0)[0] for _ in range(7)]
+    assert outcomes == [True] * 5 + [False] * 2
+
+    allowed, retry_after, blocked = backend.take(bucket, now=1000.0)
+    assert not allowed and blocked == 0
+    # One token every 12 seconds
+    assert retry_after == pytest.approx(12)
+
+
+def test_bucket_refills_at_its_rate_up_to_its_size(backend):
+    bucket = [('ip:1.2.3.4', 5, 60)]
+    for _ in range(5):
+        backend.take(bucket, now=1000.0)
+
+    assert not backend.take(bucket, now=1011.0)[0]
+    assert backend.take(bucket, now=1012.0)[0]
+    assert not backend.take(bucket, now=1012.0)[0]
+
+    # Idle for ten minutes: the bucket is full again, but holds no more than 5
+    outcomes = [backend.take(bucket, now=1612.0)[0] for _ in range(6)]
+    assert outcomes == [True] * 5 + [False]
+
+
+def test_rejected_request_charges_no_bucket(backend):
+    ip_bucket = ('ip:1.2.3.4', 5, 60)
+    user_bucket = ('user:seeker', 1, 60)
+    assert backend.take([ip_bucket, user_bucket], now=1000.0) == (True, 0.0, None)
+
+    allowed, retry_after, blocked = backend.take([ip_bucket, user_bucket], now=1000.0)
+    assert not allowed and blocked == 1
+    # The IP bucket was only charged for the request that got through
+    outcomes = [backend.take([ip_bucket], now=1000.0)[0] for _ in range(5)]
+    assert outcomes == [True] * 4 + [False]
+
+
+def test_one_job_runner_at_a_time(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    jobs = JobQueue(path, runner_lease_seconds=0.2)
+    assert not jobs.runner_alive()
+
+    assert jobs.acquire_runner('web-1')
+    # Another worker on the same host waits while the lease is held
+    assert not JobQueue(path).acquire_runner('web-2')
+    assert jobs.acquire_runner('web-1') and jobs.runner_alive()
+
+    # ...and takes over once the holder stops renewing it
+    time.sleep(0.3)
+    assert not jobs.runner_alive()
+    assert jobs.acquire_runner('web-2')
+    jobs.release_runner('web-2')
+    assert not jobs.runner_alive()
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+import teacher_registry
+from teacher_registry import TeacherRegistry, parse_teachers
+
+
+def entry(name, tier='free', **fields):
+    return dict({'name': name, 'description': f"About {name}", 'system_prompt': f"You are {name}.",
+                 'tier': tier}, **fields)
+
+
+def write(path, teachers, mtime_ns):
+    path.write_text(json.dumps({'teachers': teachers}))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_shipped_teachers_file_is_valid():
+    teachers = teacher_registry.load(teacher_registry.DEFAULT_PATH)
+    assert len(teachers) > 0
+    assert teachers.view(False).keys() <= teachers.view(True).keys()
+
+
+def test_every_problem_is_reported_at_once():
+    with pytest.raises(ValueError) as error:
+        parse_teachers({'teachers': {
+            'Bad-Id': entry('One'),
+            'no_prompt': entry('Two', system_prompt=' '),
+            'gold': entry('Three', tier='gold'),
+            'extra': entry('Four', colour='blue'),
+            'twin': entry('Two'),
+        }})
+    message = str(error.value)
+    for expected in ("'Bad-Id': ids may only", "no_prompt: 'system_prompt'", "gold: 'tier'",
+                     'extra: unknown fields colour', "twin: duplicate name 'Two'"):
+        assert expected in message
+
+    with pytest.raises(ValueError):
+        parse_teachers({'teachers': {}})
+
+
+def test_views_hide_prompts_and_unlisted_teachers():
+    teachers = teacher_registry.TeacherSet(parse_teachers({'teachers': {
+        'guide': entry('Guide'),
+        'sage': entry('Sage <b>', tier='premium'),
+        'legacy': entry('Legacy', listed=False),
+    }}), version=0)
+
+    assert list(teachers.view(False)) == ['guide']
+    assert list(teachers.view(True)) == ['guide', 'sage']
+    assert 'system_prompt' not in teachers.view(True)['sage']
+    assert teachers.by_name['Legacy'].id == 'legacy' and 'legacy' not in teachers.listed
+    assert '<b>' not in teachers.view_json(True)
+    assert json.loads(teachers.view_json(True))['sage']['name'] == 'Sage <b>'
+    with pytest.raises(TypeError):
+        teachers.view(True)['guide']['name'] = 'Changed'
+
+
+def test_changed_file_is_reloaded_and_a_broken_one_ignored(tmp_path):
+    path = tmp_path / 'teachers.json'
+    write(path, {'guide': entry('Guide')}, 1_000_000_000)
+    registry = TeacherRegistry(str(path), check_interval=0)
+    first = registry.current()
+    assert list(first.by_id) == ['guide']
+    assert registry.current() is first
+
+    write(path, {'guide': entry('Guide'), 'sage': entry('Sage', tier='premium')}, 2_000_000_000)
+    second = registry.current()
+    assert list(second.by_id) == ['guide', 'sage']
+
+    write(path, {'sage': entry('Sage', tier='gold')}, 3_000_000_000)
+    assert registry.current() is second
+
+
+def test_first_load_of_a_broken_file_raises(tmp_path):
+    path = tmp_path / 'teachers.json'
+    write(path, {'guide': entry('Guide', tier='gold')}, 1_000_000_000)
+    with pytest.raises(ValueError):
+        TeacherRegistry(str(path)).current()
@@ -0,0 +1,96 @@
+"""One-time magic login tokens, shared by every worker process on the host.
+
+The token emailed to the customer is never stored; rows are keyed by its
+SHA-256 hash, so a lookup is a primary-key read and a leaked database does
+not hand out working links. Tokens expire after `ttl` seconds (24 hours by
+default) and a background thread sweeps expired rows every
+`sweep_interval` seconds, so tokens nobody clicks do not pile up.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+import local_db
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class MagicTokenStore:
+
+    def __init__(self, path, ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        with closing(local_db.connect(self.path)) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS magic_tokens (
+                    token_hash TEXT PRIMARY KEY,
+                    email TEXT NOT NULL,
+                    plan_type TEXT,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS magic_tokens_expires_at ON magic_tokens (expires_at);
+            """)
+
+    def issue(self, email, plan_type):
+        """Create a token for `email` and return it; only its hash is stored"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with closing(local_db.connect(self.path)) as conn:
+            conn.execute('INSERT INTO magic_tokens (token_hash, email, plan_type, created_at, expires_at) '
+                         'VALUES (?, ?, ?, ?, ?)', (hash_token(token), email, plan_type, now, now + self.ttl))
+        return token
+
+    def get(self, token):
+        """Return {'email', 'plan_type', 'created_at', 'expires_at'} or None.
+
+        Expired tokens are still returned until swept, so callers can tell
+        an expired link from an unknown one.
+        """
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT email, plan_type, created_at, expires_at FROM magic_tokens '
+                               'WHERE token_hash = ?', (hash_token(token),)).fetchone()
+        if row is None:
+            return None
+        return {
+            'email': row['email'],
+            'plan_type': row['plan_type'],
+            'created_at': datetime.fromtimestamp(row['created_at']),
+            'expires_at': datetime.fromtimestamp(row['expires_at'])
+        }
+
+    def consume(self, token):
+        """Delete a token; returns False if it was already gone"""
+        with closing(local_db.connect(self.path)) as conn:
+            return conn.execute('DELETE FROM magic_tokens WHERE token_hash = ?',
+                                (hash_token(token),)).rowcount == 1
+
+    def sweep(self):
+        """Delete expired tokens; returns how many were removed"""
+        with closing(local_db.connect(self.path)) as conn:
+            return conn.execute('DELETE FROM magic_tokens WHERE expires_at < ?', (time.time(),)).rowcount
+
+    def start_sweeper(self, sweep_interval=600):
+        """Sweep expired tokens every `sweep_interval` seconds on a daemon thread"""
+        def run():
+            while True:
+                time.sleep(sweep_interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Magic token sweep failed: {str(e)}")
+
+        thread = threading.Thread(target=run, name='magic-token-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with closing(local_db.connect(self.path)) as conn:
+            row = conn.execute('SELECT COUNT(*) AS total, SUM(expires_at < ?) AS expired FROM magic_tokens',
+                               (time.time(),)).fetchone()
+        return {'size': row['total'], 'expired': row['expired'] or 0}